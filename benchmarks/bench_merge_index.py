@@ -0,0 +1,100 @@
+"""
+結合セル解決のベンチマーク\n
+- 時間割のように結合セルが大量にあるシート（既定: 50,000個）を想定し，\n
+  全結合セルを毎回走査する従来の方法と，MergeIndex + ラベルグリッドの方法を比較する\n
+
+使用例::
+
+    python benchmarks/bench_merge_index.py --merges 50000 --window A1:H40
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from common.merges import MergeIndex, label_grid
+from table_latex.converter import parse_cell_range
+
+
+def generate_merges(count, num_cols=40, seed=0):
+    """重ならない結合セル範囲を行方向に敷き詰めて生成する（1x2, 2x1, 2x3などのタイル）"""
+    rnd = random.Random(seed)
+    merges = []
+    row = 1
+    while len(merges) < count:
+        height = rnd.choice([1, 2, 2, 3])
+        col = 1
+        while col <= num_cols and len(merges) < count:
+            width = rnd.choice([1, 2, 3])
+            if width * height > 1 and col + width - 1 <= num_cols:
+                merges.append((row, col, row + height - 1, col + width - 1))
+            col += width
+        row += height
+    return merges
+
+
+def legacy_resolve(merges, min_row, max_row, min_col, max_col):
+    """従来の方法: 全結合セルを走査し，結合セル内の全セルを二重ループで埋める"""
+    num_rows = max_row - min_row + 1
+    num_cols = max_col - min_col + 1
+    cell_status = [[0] * num_cols for _ in range(num_rows)]
+    cell_origin = {}
+    for min_r_m, min_c_m, max_r_m, max_c_m in merges:
+        if max_r_m < min_row or min_r_m > max_row or max_c_m < min_col or min_c_m > max_col:
+            continue
+        for r_abs in range(min_r_m, max_r_m + 1):
+            for c_abs in range(min_c_m, max_c_m + 1):
+                if min_row <= r_abs <= max_row and min_col <= c_abs <= max_col:
+                    rel_r, rel_c = r_abs - min_row, c_abs - min_col
+                    if r_abs == min_r_m and c_abs == min_c_m:
+                        cell_status[rel_r][rel_c] = 1
+                    elif cell_status[rel_r][rel_c] == 0:
+                        cell_status[rel_r][rel_c] = -1
+                    cell_origin[(rel_r, rel_c)] = (min_r_m, min_c_m)
+    return cell_status, cell_origin
+
+
+def indexed_resolve(index, min_row, max_row, min_col, max_col):
+    ranges = index.overlapping_ranges(min_row, max_row, min_col, max_col)
+    return label_grid(ranges, min_row, max_row, min_col, max_col)
+
+
+def best_of(repeat, func, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="結合セル解決のベンチマーク")
+    parser.add_argument('--merges', type=int, default=50000, help="結合セルの数")
+    parser.add_argument('--window', action='append',
+                        help="変換する範囲（複数指定可，既定: A1:H40 と シート全体）")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    merges = generate_merges(args.merges)
+    last_row = max(merged[2] for merged in merges)
+    windows = args.window or ['A1:H40', f'A1:AN{last_row}']
+
+    start = time.perf_counter()
+    index = MergeIndex(merges)
+    build = time.perf_counter() - start
+    print(f"結合セル {len(merges):,} 個 / {last_row:,} 行, インデックス構築 {build * 1000:.1f} ms")
+
+    for window in windows:
+        bounds = parse_cell_range(window)
+        legacy = best_of(args.repeat, legacy_resolve, merges, *bounds)
+        indexed = best_of(args.repeat, indexed_resolve, index, *bounds)
+        print(f"{window:>12}: 従来 {legacy * 1000:9.2f} ms / インデックス {indexed * 1000:9.2f} ms "
+              f"({legacy / indexed:6.1f} 倍)")
+
+
+if __name__ == '__main__':
+    main()
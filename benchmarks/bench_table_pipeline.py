@@ -0,0 +1,256 @@
+"""
+表変換パイプライン全体のベンチマーク\n
+- 行数・列数・結合セルの密度・文字列の割合・数式の割合を指定して合成したブックを変換し，\n
+  読み込み / 結合セル解決 / 値の文字列化 / 罫線計算 / LaTeX生成 の段階ごとに時間を計測する\n
+- 結果はJSONで保存し，--compare で前回の結果と比較して遅くなった段階を検出する\n
+
+使用例::
+
+    python benchmarks/bench_table_pipeline.py --output bench.json
+    python benchmarks/bench_table_pipeline.py --rows 50000 --cols 12 --merge-density 0.2 --formula-ratio 0.1
+    python benchmarks/bench_table_pipeline.py --compare bench.json --threshold 1.2
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from openpyxl import Workbook
+from openpyxl.utils.cell import get_column_letter
+from openpyxl.worksheet.cell_range import CellRange
+
+from common import latex_escape, number_format
+from common.reader import read_sheet_range
+from table_latex.converter import border_line_commands, render_grid, resolve_merges
+
+STAGES = ('load', 'merge', 'values', 'borders', 'emit')
+MERGE_SHAPES = ((1, 2), (2, 1), (2, 2), (1, 3), (3, 1), (2, 3))  # (行数, 列数)
+WORDS = ('売上', '合計', 'A&B', 'x_1', '50%', '東京', 'Sample', '#1', 'TeX', '～')
+
+# 既定のケース（--rows などを指定しなかった場合）
+DEFAULT_CASES = [
+    {'name': 'small', 'rows': 1000, 'cols': 10},
+    {'name': 'tall', 'rows': 50000, 'cols': 8},
+    {'name': 'wide', 'rows': 2000, 'cols': 60},
+    {'name': 'merge_heavy', 'rows': 10000, 'cols': 20, 'merge_density': 0.4},
+    {'name': 'text_heavy', 'rows': 10000, 'cols': 10, 'string_ratio': 0.9},
+    {'name': 'formula_heavy', 'rows': 10000, 'cols': 10, 'formula_ratio': 0.3},
+]
+CASE_DEFAULTS = {'merge_density': 0.05, 'string_ratio': 0.3, 'formula_ratio': 0.0, 'seed': 0}
+
+
+def case_params(case):
+    params = dict(CASE_DEFAULTS)
+    params.update(case)
+    params.setdefault('name', f"r{params['rows']}_c{params['cols']}")
+    return params
+
+
+def generate_merges(rows, cols, density, rnd):
+    """
+    -> [(min_row, min_col, max_row, max_col), ...]\n
+    - 重ならない結合セルを，シートのおよそdensityの割合のセルを覆うように配置する\n
+    """
+    average_area = sum(h * w for h, w in MERGE_SHAPES) / len(MERGE_SHAPES)
+    start_probability = density / average_area
+    occupied = set()
+    merges = []
+    for r in range(2, rows + 1):  # 1行目は見出し
+        for c in range(1, cols + 1):
+            if (r, c) in occupied or rnd.random() >= start_probability:
+                continue
+            height, width = rnd.choice(MERGE_SHAPES)
+            if r + height - 1 > rows or c + width - 1 > cols:
+                continue
+            cells = [(r + dr, c + dc) for dr in range(height) for dc in range(width)]
+            if any(cell in occupied for cell in cells):
+                continue
+            occupied.update(cells)
+            merges.append((r, c, r + height - 1, c + width - 1))
+    return merges
+
+
+def generate_workbook(path, rows, cols, merge_density=0.05, string_ratio=0.3, formula_ratio=0.0, seed=0, **_):
+    """
+    合成したブックを書き出す（シート名 'Bench'）\n
+    - 結合セルは左上のセルにだけ値を入れる\n
+    - 数式は同じ行の左隣の数値を参照する（キャッシュ値なしで保存されるので，値の表示では評価器が計算する）\n
+    """
+    rnd = random.Random(seed)
+    merges = generate_merges(rows, cols, merge_density, rnd)
+    covered = {}
+    for m_min_r, m_min_c, m_max_r, m_max_c in merges:
+        for r in range(m_min_r, m_max_r + 1):
+            for c in range(m_min_c, m_max_c + 1):
+                covered[r, c] = (r, c) == (m_min_r, m_min_c)
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Bench')
+    for merged in merges:
+        worksheet.merged_cells.add(CellRange(min_row=merged[0], min_col=merged[1],
+                                             max_row=merged[2], max_col=merged[3]))
+    worksheet.append([f"列{c}" for c in range(1, cols + 1)])
+    for r in range(2, rows + 1):
+        row = []
+        for c in range(1, cols + 1):
+            if not covered.get((r, c), True):
+                row.append(None)  # 結合セルの左上以外
+                continue
+            draw = rnd.random()
+            if draw < formula_ratio and c > 1:
+                row.append(f"={get_column_letter(c - 1)}{r}*2+1")
+            elif draw < formula_ratio + string_ratio:
+                row.append(rnd.choice(WORDS))
+            else:
+                row.append(round(rnd.uniform(-1000, 1000), rnd.choice((0, 1, 2, 6))))
+        worksheet.append(row)
+    workbook.save(path)
+    return len(merges)
+
+
+def clear_memos():
+    """文字列化のメモ化をクリアして，毎回同じ条件で計測する"""
+    latex_escape.escape_latex.cache_clear()
+    latex_escape._format_cell_value.cache_clear()
+    latex_escape._latex_cell_value.cache_clear()
+    number_format.compile_number_format.cache_clear()
+
+
+def time_stages(path, rows, cols, show_value=True):
+    """-> {段階: 秒}（1回分）"""
+    timings = {}
+    clear_memos()
+
+    start = time.perf_counter()
+    grid = read_sheet_range(path, 'Bench', 1, rows, 1, cols, data_only=show_value, cache=None)
+    timings['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    owners = resolve_merges(grid)
+    timings['merge'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for r, row_values in enumerate(grid.rows):
+        for value, number_format in zip(row_values, grid.rows.format_row(r)):
+            latex_escape.latex_cell_value(value, number_format)
+    timings['values'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    border_line_commands(owners)
+    timings['borders'] = time.perf_counter() - start
+
+    clear_memos()
+    start = time.perf_counter()
+    render_grid(grid, 'bench', 'tab:bench', 'H', add_borders=True)
+    timings['emit'] = time.perf_counter() - start
+    return timings
+
+
+def run_case(case, workdir, repeat):
+    params = case_params(case)
+    path = os.path.join(workdir, "{name}_{rows}x{cols}_m{merge_density}_s{string_ratio}_f{formula_ratio}_{seed}.xlsx"
+                        .format(**params))
+    if not os.path.exists(path):
+        generate_workbook(path, **params)
+
+    best = {}
+    for _ in range(repeat):
+        for stage, elapsed in time_stages(path, params['rows'], params['cols']).items():
+            best[stage] = min(best.get(stage, float('inf')), elapsed)
+    best['total'] = best['load'] + best['emit']  # emitは結合セル解決・罫線計算を含む
+    result = {
+        'name': params['name'],
+        'params': params,
+        'cells': params['rows'] * params['cols'],
+        'file_bytes': os.path.getsize(path),
+        'stages': best,
+    }
+    return result
+
+
+def compare(results, baseline, threshold):
+    """
+    -> 遅くなった (ケース, 段階, 倍率) のリスト\n
+    - 同じ名前のケースの同じ段階を比較する（ごく短い段階は誤差が大きいので1ms未満は除く）\n
+    """
+    previous = {case['name']: case for case in baseline.get('cases', [])}
+    regressions = []
+    for case in results:
+        old = previous.get(case['name'])
+        if old is None:
+            continue
+        for stage, elapsed in case['stages'].items():
+            before = old['stages'].get(stage)
+            if not before or max(before, elapsed) < 1e-3:
+                continue
+            ratio = elapsed / before
+            print(f"  {case['name']:>14} {stage:>8}: {before * 1000:9.1f} ms -> {elapsed * 1000:9.1f} ms "
+                  f"({ratio:5.2f} 倍){'  ← 遅くなりました' if ratio > threshold else ''}")
+            if ratio > threshold:
+                regressions.append((case['name'], stage, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="表変換パイプラインのベンチマーク")
+    parser.add_argument('--rows', type=int, help="行数（指定すると既定のケースの代わりにこの1ケースを計測）")
+    parser.add_argument('--cols', type=int, default=10, help="列数")
+    parser.add_argument('--merge-density', type=float, default=CASE_DEFAULTS['merge_density'],
+                        help="結合セルが覆うセルの割合")
+    parser.add_argument('--string-ratio', type=float, default=CASE_DEFAULTS['string_ratio'], help="文字列の割合")
+    parser.add_argument('--formula-ratio', type=float, default=CASE_DEFAULTS['formula_ratio'], help="数式の割合")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="各ケースの計測回数（最短時間を採用）")
+    parser.add_argument('--workdir', help="合成したブックの保存先（既定: 一時ディレクトリ，指定すると再利用する）")
+    parser.add_argument('--output', help="結果を書き出すJSONファイル")
+    parser.add_argument('--compare', help="比較する前回の結果(JSON)")
+    parser.add_argument('--threshold', type=float, default=1.2, help="この倍率より遅くなった段階を報告する")
+    args = parser.parse_args(argv)
+
+    if args.rows:
+        cases = [{'rows': args.rows, 'cols': args.cols, 'merge_density': args.merge_density,
+                  'string_ratio': args.string_ratio, 'formula_ratio': args.formula_ratio, 'seed': args.seed}]
+    else:
+        cases = DEFAULT_CASES
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        workdir = args.workdir or temp_dir
+        os.makedirs(workdir, exist_ok=True)
+        results = []
+        for case in cases:
+            result = run_case(case, workdir, args.repeat)
+            results.append(result)
+            stages = ' '.join(f"{stage} {result['stages'][stage] * 1000:8.1f}" for stage in STAGES + ('total',))
+            print(f"{result['name']:>14} {result['cells']:>9,} セル: {stages} (ms)")
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'cases': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"{args.compare} との比較:")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} 件の段階が {args.threshold} 倍より遅くなりました", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+TikZのグラフ生成のベンチマーク（Qtを起動しない）\n
+- 点の数・データセット数・軸の種類を指定して合成したPlotSpecをrender_plotで生成し，時間を計測する\n
+- --profile でcProfileの上位の関数を表示する\n
+
+使用例::
+
+    python benchmarks/bench_tikz_render.py --points 100000 --datasets 3
+    python benchmarks/bench_tikz_render.py --points 20000 --scale loglog --profile
+"""
+import argparse
+import cProfile
+import os
+import pstats
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from tikz_plot.render import SCALE_TYPES, DatasetSpec, PlotSpec, SpecialPoint, Tangent, render_plot
+
+
+def make_spec(points, datasets, scale_type, seed=0):
+    """測定値のデータセット（線・点・棒を順に）と，接線付きの数式のデータセットを1つ持つPlotSpec"""
+    rnd = random.Random(seed)
+    plot_types = ['line', 'scatter', 'line_scatter', 'bar']
+    specs = []
+    for i in range(datasets):
+        x = [k * 0.01 for k in range(1, points + 1)]
+        y = [rnd.uniform(-1.0, 100.0) for _ in range(points)]
+        specs.append(DatasetSpec(f"データ{i + 1}", x, y, color=(rnd.randrange(256), 0, 128),
+                                 plot_type=plot_types[i % len(plot_types)],
+                                 special_points=[SpecialPoint(x[points // 2], y[points // 2], 'red', 'X,Y座標（値も表示）')]))
+    specs.append(DatasetSpec("理論値", source='formula', equation='x^2', tangent=Tangent(1.5, show_equation=True)))
+    return PlotSpec(specs, x_max=points * 0.01, y_max=100, scale_type=scale_type, x_tick_step=points * 0.001,
+                    y_tick_step=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TikZのグラフ生成のベンチマーク")
+    parser.add_argument('--points', type=int, default=50_000, help="データセットあたりの点の数")
+    parser.add_argument('--datasets', type=int, default=3, help="測定値のデータセット数")
+    parser.add_argument('--scale', choices=SCALE_TYPES, default='normal', help="軸の種類")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--profile', action='store_true', help="cProfileの結果を表示する")
+    args = parser.parse_args()
+
+    spec = make_spec(args.points, args.datasets, args.scale)
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.runcall(render_plot, spec)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+        return
+
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = render_plot(spec)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    total_points = args.points * args.datasets
+    print(f"点: {total_points:,}  軸: {args.scale}  出力: {len(result.latex):,} 文字  警告: {len(result.warnings)} 件")
+    print(f"render_plot: {best * 1000:.1f} ms（{best / total_points * 1e6:.2f} µs/点）")
+
+
+if __name__ == '__main__':
+    main()
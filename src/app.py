@@ -1,6 +1,7 @@
 import sys
 import os
 import platform
+import multiprocessing
 
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QTabWidget, 
                              QVBoxLayout, QWidget, QStatusBar, QMenuBar, QAction)
@@ -141,7 +142,7 @@ def apply_simple_dark_theme(app):
             border: 2px solid #2c3036;
         }
         
-        QTextEdit, QPlainTextEdit {
+        QTextEdit, QPlainTextEdit, LatexResultView {
             background-color: #282c34;
             color: #e6e8ec;
             border: 2px solid #3e4147;
@@ -151,12 +152,12 @@ def apply_simple_dark_theme(app):
             selection-color: #ffffff;
         }
         
-        QTextEdit:hover, QPlainTextEdit:hover {
+        QTextEdit:hover, QPlainTextEdit:hover, LatexResultView:hover {
             background-color: #32363e;
             border: 2px solid #61afef;
         }
         
-        QTextEdit:focus, QPlainTextEdit:focus {
+        QTextEdit:focus, QPlainTextEdit:focus, LatexResultView:focus {
             background-color: #32363e;
             border: 2px solid #61afef;
         }
@@ -586,6 +587,8 @@ class TeXcellentConverterApp(QMainWindow):
 
 
 if __name__ == '__main__':
+    # 一括出力のプロセスプール用．exe化したアプリでワーカーがアプリ自体を起動し直さないようにする
+    multiprocessing.freeze_support()
     setup_qt_plugins()
     
     app = QApplication(sys.argv)
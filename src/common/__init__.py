@@ -0,0 +1 @@
+# Shared helpers for both tabs
\ No newline at end of file
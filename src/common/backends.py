@@ -0,0 +1,282 @@
+"""
+表計算ファイルの読み込みバックエンド\n
+- 形式(xlsx, xls, ods, csv)ごとに利用できるリーダーを登録し，open_workbook()で開く\n
+- 1つの形式に複数のバックエンドがある場合は，BACKENDSの順で先頭の利用可能なものを使う\n
+- ベンチマークは要求されたときだけ実行する．結果(形式 -> バックエンド名)はJSONに保存でき，\n
+  use_backends()で読み込むとその選択を使う（プロセスプールのワーカーにはinitializerで渡す）\n
+
+ベンチマークの実行（srcディレクトリで実行）::
+
+    python -m common.backends
+    python -m common.backends --save backends.json
+"""
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCHMARK_ROWS = 2000   # ベンチマーク用のサンプルの行数
+BENCHMARK_COLS = 8      # ベンチマーク用のサンプルの列数
+BENCHMARK_REPEAT = 3    # 各バックエンドの計測回数（最短時間を採用）
+
+OLE_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'  # 旧形式(.xls)のファイル先頭
+
+
+class UnsupportedFileError(ValueError):
+    """
+    対応していない・壊れたファイル\n
+    - 表変換(table_latex.converter)ではWorkbookLoadErrorとして報告される\n
+    """
+
+
+class ReaderBackend:
+    """
+    読み込みバックエンド\n
+    - module.class_name がBookReaderのサブクラス（ファイルパスを受け取って開く）\n
+    - requires: 必要な外部パッケージ（インストールされていなければ使用しない）\n
+    """
+
+    def __init__(self, name, formats, module, class_name, requires=()):
+        self.name = name
+        self.formats = formats
+        self.module = module
+        self.class_name = class_name
+        self.requires = requires
+
+    def __repr__(self):
+        return f"ReaderBackend({self.name!r})"
+
+    def available(self):
+        return all(importlib.util.find_spec(package) is not None for package in self.requires)
+
+    def open(self, file_path):
+        reader_class = getattr(importlib.import_module(self.module), self.class_name)
+        return reader_class(file_path)
+
+
+# 形式ごとの優先順（ベンチマークをしない場合は先頭の利用可能なものを使う）
+BACKENDS = [
+    ReaderBackend('xlsx-stream', ('xlsx',), 'common.xlsx', 'XlsxWorkbook'),
+    ReaderBackend('xlsx-openpyxl', ('xlsx',), 'common.openpyxl_book', 'OpenpyxlWorkbook', requires=('openpyxl',)),
+    ReaderBackend('xls-xlrd', ('xls',), 'common.xls', 'XlsWorkbook', requires=('xlrd',)),
+    ReaderBackend('ods-stdlib', ('ods',), 'common.ods', 'OdsWorkbook'),
+    ReaderBackend('csv', ('csv',), 'common.csv_book', 'CsvWorkbook'),
+]
+
+EXTENSION_FORMATS = {
+    '.xlsx': 'xlsx', '.xlsm': 'xlsx',
+    '.xls': 'xls',
+    '.ods': 'ods',
+    '.csv': 'csv', '.tsv': 'csv', '.txt': 'csv',
+}
+
+_selected = {}  # 形式 -> use_backends()で指定されたバックエンド（ベンチマークの結果など）
+_selected_lock = threading.Lock()
+
+
+def file_format(file_path):
+    """
+    -> 'xlsx', 'xls', 'ods', 'csv' のいずれか\n
+    - 拡張子よりもファイルの中身（ZIPの構成・OLEの署名）を優先する\n
+    - 署名が一致しないファイルは，拡張子が.csv/.tsv/.txtの場合だけCSVとして読む\n
+      （壊れた.xlsxなどをCSVとして解釈しないよう，それ以外はUnsupportedFileErrorを送出する）\n
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(len(OLE_SIGNATURE))
+    if head == OLE_SIGNATURE:
+        return 'xls'
+    if zipfile.is_zipfile(file_path):
+        with zipfile.ZipFile(file_path) as archive:
+            names = set(archive.namelist())
+        if 'content.xml' in names and 'mimetype' in names:
+            return 'ods'
+        return 'xlsx'
+    extension = os.path.splitext(file_path)[1].lower()
+    if EXTENSION_FORMATS.get(extension) == 'csv':
+        return 'csv'
+    if extension in EXTENSION_FORMATS:
+        raise UnsupportedFileError(f"{os.path.basename(file_path)} は{extension}形式のファイルとして読み込めません"
+                                   "（ファイルが壊れているか，形式が異なります）")
+    raise UnsupportedFileError(f"{os.path.basename(file_path)} は対応していない形式のファイルです"
+                               f"（対応形式: {', '.join(sorted(EXTENSION_FORMATS))}）")
+
+
+def backends_for(fmt):
+    """形式に対応する利用可能なバックエンド（優先順）"""
+    return [backend for backend in BACKENDS if fmt in backend.formats and backend.available()]
+
+
+def _write_sample(fmt, path):
+    """
+    ベンチマーク用のサンプルファイルを作成する（作成できない形式はFalse）\n
+    - 文字列・数値・結合セルを含む BENCHMARK_ROWS x BENCHMARK_COLS の表\n
+    """
+    if fmt == 'xlsx':
+        from openpyxl import Workbook
+        workbook = Workbook()
+        worksheet = workbook.active
+        for r in range(1, BENCHMARK_ROWS + 1):
+            worksheet.append([f"s{(r * c) % 97}" if c % 2 else r * c * 0.5 for c in range(1, BENCHMARK_COLS + 1)])
+        for r in range(2, BENCHMARK_ROWS, 50):
+            worksheet.merge_cells(start_row=r, start_column=1, end_row=r + 2, end_column=2)
+        workbook.save(path)
+        return True
+    if fmt == 'csv':
+        with open(path, 'w', encoding='utf-8') as f:
+            for r in range(1, BENCHMARK_ROWS + 1):
+                f.write(','.join(f"s{(r * c) % 97}" if c % 2 else str(r * c * 0.5)
+                                 for c in range(1, BENCHMARK_COLS + 1)) + '\n')
+        return True
+    return False
+
+
+def time_backend(backend, file_path, repeat=BENCHMARK_REPEAT):
+    """
+    -> 秒（失敗した場合はNone）\n
+    - 先頭シートの全行と結合セルを読む時間の最短値\n
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            with backend.open(file_path) as book:
+                sheet_name = book.sheet_names[0]
+                for _ in book.iter_rows(sheet_name):
+                    pass
+                for _ in book.iter_merged_ranges(sheet_name):
+                    pass
+        except Exception:
+            return None
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark_format(fmt, file_path=None):
+    """
+    -> [(バックエンド, 秒またはNone), ...]\n
+    - file_pathを省略すると組み込みのサンプルで計測する\n
+    """
+    candidates = backends_for(fmt)
+    if file_path is not None:
+        return [(backend, time_backend(backend, file_path)) for backend in candidates]
+    with tempfile.TemporaryDirectory() as directory:
+        sample = os.path.join(directory, f"sample.{fmt}")
+        if not _write_sample(fmt, sample):
+            return [(backend, None) for backend in candidates]
+        return [(backend, time_backend(backend, sample)) for backend in candidates]
+
+
+def benchmark_selection(formats=None):
+    """
+    -> {形式: 最も速かったバックエンド名}\n
+    - 候補が複数ある形式だけを組み込みのサンプルで計測する（数秒かかる）\n
+    """
+    if formats is None:
+        formats = sorted({fmt for backend in BACKENDS for fmt in backend.formats})
+    selection = {}
+    for fmt in formats:
+        if len(backends_for(fmt)) < 2:
+            continue
+        timings = [(elapsed, index, backend.name)
+                   for index, (backend, elapsed) in enumerate(benchmark_format(fmt)) if elapsed is not None]
+        if timings:
+            selection[fmt] = min(timings)[2]
+    return selection
+
+
+def use_backends(selection):
+    """
+    形式ごとに使うバックエンドを指定する\n
+    - selection: {形式: バックエンド名}（benchmark_selection()の結果など）．指定のない形式は既定の順で選ぶ\n
+    - ProcessPoolExecutorのinitializerにも使える\n
+    """
+    backends = {fmt: get_backend(name) for fmt, name in (selection or {}).items()}
+    with _selected_lock:
+        _selected.clear()
+        _selected.update(backends)
+
+
+def selected_backends():
+    """-> use_backends()で指定中の {形式: バックエンド名}（ワーカーに渡す用）"""
+    with _selected_lock:
+        return {fmt: backend.name for fmt, backend in _selected.items()}
+
+
+def load_backend_selection(path):
+    """--saveで保存したベンチマークの結果(JSON)を読み込んで使う"""
+    with open(path, encoding='utf-8') as f:
+        use_backends(json.load(f))
+
+
+def select_backend(fmt):
+    """
+    -> 形式に使うバックエンド\n
+    - use_backends()で指定があればそれを，なければBACKENDSの順で先頭の利用可能なものを使う（計測はしない）\n
+    """
+    with _selected_lock:
+        selected = _selected.get(fmt)
+    if selected is not None and selected.available():
+        return selected
+    candidates = backends_for(fmt)
+    if not candidates:
+        raise ValueError(f"{fmt} 形式を読み込めるバックエンドがありません")
+    return candidates[0]
+
+
+def get_backend(name):
+    for backend in BACKENDS:
+        if backend.name == name:
+            return backend
+    raise KeyError(f"バックエンド {name} はありません")
+
+
+def open_workbook(file_path, backend=None):
+    """
+    -> BookReader\n
+    - backend: バックエンド名（省略時は形式から自動で選ぶ）\n
+    """
+    if backend is None:
+        selected = select_backend(file_format(file_path))
+    else:
+        selected = get_backend(backend)
+    return selected.open(file_path)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="読み込みバックエンドのベンチマーク")
+    parser.add_argument('files', nargs='*', help="計測に使うファイル（省略時は組み込みのサンプル）")
+    parser.add_argument('--save', help="組み込みのサンプルで選んだバックエンドをJSONに保存する"
+                                       "（一括変換の --backends で指定する）")
+    args = parser.parse_args(argv)
+
+    if args.save:
+        selection = benchmark_selection()
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(selection, f, ensure_ascii=False, indent=2)
+        for fmt, name in selection.items():
+            print(f"[{fmt}] {name}")
+        print(f"{args.save} に保存しました")
+        return 0
+
+    targets = [(file_format(path), path) for path in args.files] or [
+        (fmt, None) for fmt in sorted({fmt for backend in BACKENDS for fmt in backend.formats})]
+    for fmt, path in targets:
+        print(f"[{fmt}] {path or '組み込みサンプル'}")
+        for backend, elapsed in benchmark_format(fmt, path):
+            result = "計測不可" if elapsed is None else f"{elapsed * 1000:9.1f} ms"
+            print(f"  {backend.name:<16} {result}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+読み込みバックエンド共通のブックの基底クラス\n
+- 各形式のリーダー(xlsx, xls, ods, csv)はこのクラスを継承し，同じ方法で行・結合セルを返す\n
+- 形式によって持たない情報（名前の定義・テーブル・dimension・表示形式）は空を返す\n
+"""
+
+
+class BookReader:
+    """
+    読み取り専用のブック\n
+    - sheets: [(シート名, 形式ごとの識別子), ...]（ブック内の順番）\n
+    - iter_rows / iter_merged_ranges はサブクラスで実装する\n
+    - with文で使用するか，使用後にclose()を呼ぶこと\n
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.sheets = []
+        self.defined_names = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        pass
+
+    @property
+    def sheet_names(self):
+        return [name for name, _ in self.sheets]
+
+    def _sheet_key(self, sheet_name):
+        """シート名 -> 形式ごとの識別子（存在しない場合はKeyError）"""
+        for name, key in self.sheets:
+            if name == sheet_name:
+                return key
+        raise KeyError(f"Worksheet {sheet_name} does not exist.")
+
+    def iter_rows(self, sheet_name, min_row=1, max_row=None, min_col=1, max_col=None, data_only=True,
+                  formats=None, uncached=None, formulas=None):
+        """
+        -> (行番号, {列番号: 値}) のイテレータ\n
+        - 範囲内の値のある行だけを，行番号の昇順で返す\n
+        - formats: 辞書を渡すと，表示形式がGeneral以外のセルの {(行, 列): 表示形式} を追加する\n
+        - uncached: 集合を渡すと，data_only=Trueでキャッシュ値のない数式セルの (行, 列) を追加する\n
+        - formulas: 辞書を渡すと，data_only=Trueの同じ走査で数式セルの {(行, 列): 「=数式」} を追加する\n
+          （値の表示と数式の表示を1回の解析で得る．数式を保持しない形式では何も追加しない）\n
+        """
+        raise NotImplementedError
+
+    def iter_merged_ranges(self, sheet_name):
+        """-> (min_row, min_col, max_row, max_col) のイテレータ"""
+        return iter(())
+
+    def iter_occupied_columns(self, sheet_name, min_row=1, max_row=None, min_col=1, max_col=None):
+        """-> (行番号, [値のある列番号, ...]) のイテレータ"""
+        for row, values in self.iter_rows(sheet_name, min_row, max_row, min_col, max_col, data_only=False):
+            cols = sorted(col for col, value in values.items() if value is not None and value != '')
+            if cols:
+                yield row, cols
+
+    def sheet_dimension(self, sheet_name):
+        """保存されている使用範囲(min_row, max_row, min_col, max_col)，なければNone"""
+        return None
+
+    def sheet_tables(self, sheet_name):
+        """シート内のテーブル [{'name', 'display_name', 'ref'}, ...]"""
+        return []
+
+
+def in_column_range(col, min_col, max_col):
+    return col >= min_col and (max_col is None or col <= max_col)
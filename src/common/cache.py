@@ -0,0 +1,116 @@
+"""
+解析済みワークブックのプロセス共通キャッシュ\n
+- 両タブ・変換エンジンから共有する（workbook_cache）\n
+- キーは (絶対パス, mtime, サイズ, data_only) に種別と追加キーを加えたもの\n
+- アクセスのたびにファイルの更新を確認し，古いエントリは破棄する\n
+- 推定メモリ量の合計が上限を超えたら，最も長く使われていないものから破棄する(LRU)\n
+"""
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # キャッシュ全体の推定メモリ上限
+WORKBOOK_BYTES_PER_XML_BYTE = 4         # 展開済みXML 1バイトあたりの解析後メモリの目安
+
+
+def estimate_workbook_bytes(file_path):
+    """ブック全体を解析したときのメモリ量の目安（展開後のXMLサイズから推定）"""
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            xml_bytes = sum(info.file_size for info in archive.infolist())
+    except (zipfile.BadZipFile, OSError):
+        xml_bytes = os.path.getsize(file_path)
+    return xml_bytes * WORKBOOK_BYTES_PER_XML_BYTE
+
+
+class WorkbookCache:
+    """
+    解析結果のLRUキャッシュ\n
+    - get(path, data_only, kind, loader) でキャッシュを参照し，なければloader()で読み込む\n
+    - 破棄時に値がclose()を持っていれば呼び出す\n
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._keys_by_path = {}        # 絶対パス -> {key, ...}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def file_key(file_path, data_only):
+        """(絶対パス, mtime, サイズ, data_only)"""
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, data_only)
+
+    def get(self, file_path, data_only, kind, loader, extra=(), sizeof=None):
+        """
+        -> キャッシュ済みの値，またはloader()の結果\n
+        - kind: 'sheet_names', 'workbook', 'range' などの種別\n
+        - extra: シート名やセル範囲などの追加キー\n
+        - sizeof: 値 -> 推定バイト数（省略時はファイルサイズ）\n
+        """
+        file_key = self.file_key(file_path, data_only)
+        key = file_key + (kind,) + tuple(extra)
+        with self._lock:
+            self._drop_stale(file_key)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = loader()
+        size = sizeof(value) if sizeof else file_key[2]
+        with self._lock:
+            if key in self._entries:  # 他スレッドが先に読み込んだ場合
+                self._discard(key)
+            self._entries[key] = (value, size)
+            self._keys_by_path.setdefault(file_key[0], set()).add(key)
+            self.total_bytes += size
+            self._evict()
+        return value
+
+    def _drop_stale(self, file_key):
+        """同じパスでmtime・サイズが異なるエントリを破棄"""
+        path, mtime, size = file_key[:3]
+        for key in list(self._keys_by_path.get(path, ())):
+            if key[1] != mtime or key[2] != size:
+                self._discard(key)
+
+    def _evict(self):
+        # 最新の1件は上限を超えていても保持する
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        value, size = self._entries.pop(key)
+        self.total_bytes -= size
+        keys = self._keys_by_path.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_path[key[0]]
+        close = getattr(value, 'close', None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+    def invalidate(self, file_path=None):
+        """指定ファイル（省略時は全て）のエントリを破棄"""
+        with self._lock:
+            if file_path is None:
+                keys = list(self._entries)
+            else:
+                keys = list(self._keys_by_path.get(os.path.abspath(file_path), ()))
+            for key in keys:
+                self._discard(key)
+
+
+workbook_cache = WorkbookCache()
@@ -0,0 +1,194 @@
+"""
+範囲のセル値・表示形式のコンパクトな格納\n
+- セル値はインターンプール（同じ型・同じ値は1つだけ保持）に入れ，各セルはint32の番号だけを持つ\n
+- 表示形式も同様にプールの番号(int16)で持つ（General以外のセルがあるときだけ配列を確保する）\n
+- 100万セルでも番号の配列は数MBに収まり，値の実体は異なる値の数だけになる\n
+"""
+import numpy as np
+
+EMPTY = 0    # 空セル(None)の番号
+GENERAL = 0  # 表示形式Generalの番号
+POOL_ENTRY_BYTES = 64  # プールの値1つあたりの推定メモリ量（キャッシュの容量計算用）
+
+
+class ValuePool:
+    """
+    値のインターンプール\n
+    - values[番号] = 値（番号0は空値）\n
+    - 1と1.0とTrueのように等しくても型が違う値は別の番号にする\n
+    """
+
+    def __init__(self, empty=None):
+        self.values = [empty]
+        self._lookup = None  # _key(値) -> 番号（書き込み中だけ保持する）
+
+    def __len__(self):
+        return len(self.values)
+
+    @staticmethod
+    def _key(value):
+        # 文字列はそのままキーにし，それ以外は型と組にする（タプルと文字列は衝突しない）
+        return value if type(value) is str else (type(value), value)
+
+    def code(self, value):
+        """値の番号（初出の値はプールに追加する）"""
+        return self.codes([value])[0]
+
+    def codes(self, values):
+        """値の並びの番号のリスト（Noneは空値の番号0）"""
+        lookup = self._lookup
+        if lookup is None:
+            lookup = self._lookup = {self._key(v): number for number, v in enumerate(self.values) if number}
+        pool = self.values
+        numbers = []
+        for value in values:
+            if value is None:
+                numbers.append(0)
+                continue
+            key = value if type(value) is str else (type(value), value)  # _key()の展開
+            number = lookup.get(key)
+            if number is None:
+                number = lookup[key] = len(pool)
+                pool.append(value)
+            numbers.append(number)
+        return numbers
+
+    def release_lookup(self):
+        """書き込みを終えたら逆引きの辞書を捨ててメモリを空ける（再び書き込むと作り直す）"""
+        self._lookup = None
+
+
+class CellValues:
+    """
+    範囲内のセル値と表示形式（相対座標）\n
+    - codes: 値の番号のint32配列 (行数, 列数)，pool: 値のプール\n
+    - format_codes: 表示形式の番号のint16配列（General以外のセルがなければNone），format_pool: 表示形式のプール\n
+    - 行ごとに値のリストとして参照できる（values[r] / for row in values）\n
+    """
+
+    def __init__(self, num_rows, num_cols):
+        self.codes = np.zeros((num_rows, num_cols), dtype=np.int32)
+        self.pool = ValuePool()
+        self.format_codes = None
+        self.format_pool = ValuePool('General')
+
+    @classmethod
+    def from_rows(cls, rows, num_cols=None, formats=None):
+        """値のリストのリストと {(行, 列): 表示形式} から作る"""
+        if num_cols is None:
+            num_cols = len(rows[0]) if rows else 0
+        values = cls(len(rows), num_cols)
+        for r, row in enumerate(rows):
+            values.codes[r] = values.pool.codes(row)
+        for (r, c), number_format in (formats or {}).items():
+            values.set_format(r, c, number_format)
+        values.release_lookup()
+        return values
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    def __getitem__(self, r):
+        """r行目の値のリスト"""
+        pool = self.pool.values
+        return [pool[number] for number in self.codes[r].tolist()]
+
+    def __iter__(self):
+        for r in range(len(self)):
+            yield self[r]
+
+    def value(self, r, c):
+        return self.pool.values[self.codes[r, c]]
+
+    def set_row(self, r, cols, values):
+        """r行目の列cols（昇順）に値を書き込む（Noneは空セル）"""
+        numbers = self.pool.codes(values)
+        if cols[-1] - cols[0] + 1 == len(cols):  # 連続した列はスライスで代入する（大半の行）
+            self.codes[r, cols[0]:cols[-1] + 1] = numbers
+        else:
+            self.codes[r, cols] = numbers
+
+    def set_column(self, c, values, start_row=0):
+        """c列目のstart_row行目から下へ値を書き込む（Noneは空セル）"""
+        self.codes[start_row:start_row + len(values), c] = self.pool.codes(values)
+
+    def set_value(self, r, c, value):
+        self.codes[r, c] = EMPTY if value is None else self.pool.code(value)
+
+    def set_format(self, r, c, number_format):
+        if number_format is None or number_format == 'General':
+            if self.format_codes is not None:
+                self.format_codes[r, c] = GENERAL
+            return
+        number = self.format_pool.code(number_format)
+        if self.format_codes is None:
+            self.format_codes = np.zeros(self.codes.shape, dtype=np.int16)
+        elif number > np.iinfo(self.format_codes.dtype).max:
+            self.format_codes = self.format_codes.astype(np.int32)
+        self.format_codes[r, c] = number
+
+    def set_column_format(self, c, number_format, start_row=0):
+        """c列目のstart_row行目以降をすべて同じ表示形式にする"""
+        if start_row >= len(self):
+            return
+        if number_format is None or number_format == 'General':
+            if self.format_codes is not None:
+                self.format_codes[start_row:, c] = GENERAL
+            return
+        self.set_format(start_row, c, number_format)
+        self.format_codes[start_row:, c] = self.format_codes[start_row, c]
+
+    def format(self, r, c):
+        """表示形式（GeneralはNone）"""
+        if self.format_codes is None:
+            return None
+        number = self.format_codes[r, c]
+        return self.format_pool.values[number] if number else None
+
+    def format_row(self, r):
+        """r行目の表示形式のリスト（GeneralはNone）"""
+        if self.format_codes is None:
+            return [None] * self.codes.shape[1]
+        pool = self.format_pool.values
+        return [pool[number] if number else None for number in self.format_codes[r].tolist()]
+
+    def formats(self):
+        """{(行, 列): 表示形式}（General以外のセルのみ）"""
+        if self.format_codes is None:
+            return {}
+        pool = self.format_pool.values
+        rows, cols = np.nonzero(self.format_codes)
+        return {(r, c): pool[self.format_codes[r, c]] for r, c in zip(rows.tolist(), cols.tolist())}
+
+    def with_overrides(self, overrides):
+        """
+        -> 一部のセルの値を置き換えたCellValues\n
+        - overrides: {(行, 列): 値}．置き換えたセルの表示形式はGeneralに戻す\n
+        - 値・表示形式のプールは共有し，番号の配列だけを複製する\n
+        """
+        other = CellValues.__new__(CellValues)
+        other.codes = self.codes.copy()
+        other.pool = self.pool
+        other.format_codes = None if self.format_codes is None else self.format_codes.copy()
+        other.format_pool = self.format_pool
+        for (r, c), value in overrides.items():
+            other.set_value(r, c, value)
+            if other.format_codes is not None:
+                other.format_codes[r, c] = GENERAL
+        other.release_lookup()
+        return other
+
+    def release_lookup(self):
+        self.pool.release_lookup()
+        self.format_pool.release_lookup()
+
+    def nbytes(self):
+        """推定メモリ量（番号の配列とプールの値）"""
+        size = self.codes.nbytes + (len(self.pool) + len(self.format_pool)) * POOL_ENTRY_BYTES
+        if self.format_codes is not None:
+            size += self.format_codes.nbytes
+        return size
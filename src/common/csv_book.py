@@ -0,0 +1,78 @@
+"""
+CSV/TSVの読み込み\n
+- ファイル全体を1シートとして扱う（シート名はファイル名）\n
+- 文字コード(UTF-8/Shift_JIS)と区切り文字はファイルの先頭から推定する\n
+- 数値に見える値はExcelで開いた場合と同じく数値として扱う\n
+"""
+import csv
+import os
+
+from common.book import BookReader
+
+SNIFF_BYTES = 64 * 1024  # 文字コード・区切り文字の推定に使う先頭のバイト数
+ENCODINGS = ('utf-8-sig', 'cp932')
+
+
+def detect_encoding(sample):
+    for encoding in ENCODINGS:
+        try:
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError as e:
+            if encoding.startswith('utf-8') and e.start >= len(sample) - 3:
+                return encoding  # 先頭部分の末尾で文字が途切れただけ
+    return ENCODINGS[-1]
+
+
+def _cast_value(text):
+    """'12' -> 12, '1.5' -> 1.5, それ以外は文字列のまま"""
+    stripped = text.strip()
+    if not stripped:
+        return None
+    try:
+        return int(stripped)
+    except ValueError:
+        pass
+    try:
+        number = float(stripped)
+    except ValueError:
+        return text
+    return number if stripped.lower() not in ('nan', 'inf', '-inf', 'infinity', '-infinity') else text
+
+
+class CsvWorkbook(BookReader):
+    """CSV/TSVファイルを1シートのブックとして読む"""
+
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        with open(file_path, 'rb') as f:
+            sample = f.read(SNIFF_BYTES)
+        self.encoding = detect_encoding(sample)
+        text = sample.decode(self.encoding, errors='ignore')
+        if file_path.lower().endswith('.tsv'):
+            self.dialect = csv.excel_tab
+        else:
+            try:
+                self.dialect = csv.Sniffer().sniff(text, delimiters=',\t;')
+            except csv.Error:
+                self.dialect = csv.excel
+        self.sheets = [(os.path.splitext(os.path.basename(file_path))[0], None)]
+
+    def iter_rows(self, sheet_name, min_row=1, max_row=None, min_col=1, max_col=None, data_only=True,
+                  formats=None, uncached=None, formulas=None):
+        """-> (行番号, {列番号: 値}) のイテレータ（CSVは表示形式を持たない）"""
+        self._sheet_key(sheet_name)
+        with open(self.file_path, encoding=self.encoding, newline='') as f:
+            for row, fields in enumerate(csv.reader(f, self.dialect), start=1):
+                if row < min_row:
+                    continue
+                if max_row is not None and row > max_row:
+                    break
+                end = len(fields) if max_col is None else min(max_col, len(fields))
+                values = {}
+                for col in range(min_col, end + 1):
+                    value = _cast_value(fields[col - 1])
+                    if value is not None:
+                        values[col] = value
+                if values:
+                    yield row, values
@@ -0,0 +1,989 @@
+"""
+キャッシュ値のない数式セルの評価\n
+- スクリプトやExcel以外のツールで作られたブックは数式の計算結果を保存していないことがあるので，必要なセルだけをここで計算する\n
+- 評価対象から参照をたどれるセルだけで依存グラフを作り，トポロジカル順に評価する（結果はセル単位でメモ化）\n
+- 参照先のシートは，参照されている範囲を囲む矩形の行だけを読み込む\n
+- 未対応の関数・解析できない数式(配列定数など)は #NAME?，構造化参照(テーブル[列])は #REF! になる\n
+"""
+import math
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from decimal import ROUND_CEILING, ROUND_DOWN, ROUND_FLOOR, ROUND_HALF_UP, ROUND_UP, Decimal
+from functools import lru_cache
+
+from openpyxl.formula.tokenizer import Token, Tokenizer
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.datetime import from_excel, to_excel
+
+from common.number_format import compile_number_format, format_general
+
+PARSE_CACHE_SIZE = 4096  # 解析済みの数式を保持する数
+ERROR_CODES = ('#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A')
+
+_REF_PART = r"\$?[A-Za-z]{1,3}\$?\d+|\$?[A-Za-z]{1,3}|\$?\d+"
+_REF_RE = re.compile(
+    rf"^(?:(?:'((?:[^']|'')+)'|([^'!:]+))!)?({_REF_PART})(?::({_REF_PART}))?$")
+_NAME_RE = re.compile(r'^[A-Za-z_\\][\w.\\]*$')
+_FUNCTION_PREFIXES = ('_xlfn.', '_xlws.')
+
+# 二項演算子の優先順位（大きいほど強く結合する，すべて左結合）
+_PRECEDENCE = {'=': 1, '<>': 1, '<': 1, '>': 1, '<=': 1, '>=': 1, '&': 2, '+': 3, '-': 3, '*': 4, '/': 4, '^': 5}
+
+
+class FormulaError(Exception):
+    """Excelのエラー値（#DIV/0! など）"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+def _split_ref(part):
+    """'$A$1' -> (1, 1)，'A' -> (None, 1)，'3' -> (3, None)"""
+    part = part.replace('$', '')
+    letters = part.rstrip('0123456789')
+    digits = part[len(letters):]
+    return (int(digits) if digits else None), (column_index_from_string(letters.upper()) if letters else None)
+
+
+def _parse_reference(text):
+    """
+    -> ('ref', シート名またはNone, min_row, min_col, max_row, max_col) または None\n
+    - 列全体(A:A)・行全体(1:1)の開いた側はNone\n
+    """
+    match = _REF_RE.match(text)
+    if match is None:
+        return None
+    quoted, plain, start, end = match.groups()
+    sheet = quoted.replace("''", "'") if quoted is not None else plain
+    r1, c1 = _split_ref(start)
+    r2, c2 = _split_ref(end) if end else (r1, c1)
+    if (r1 is None) != (r2 is None) or (c1 is None) != (c2 is None) or (end is None and (r1 is None or c1 is None)):
+        return None
+    if r1 is None:  # 列全体
+        r1, r2 = 1, None
+    if c1 is None:  # 行全体
+        c1, c2 = 1, None
+    if r2 is not None and r2 < r1:
+        r1, r2 = r2, r1
+    if c2 is not None and c2 < c1:
+        c1, c2 = c2, c1
+    return ('ref', sheet, r1, c1, r2, c2)
+
+
+class _Parser:
+    """Tokenizerの字句列から構文木(タプル)を作る"""
+
+    def __init__(self, formula):
+        self.tokens = [token for token in Tokenizer(formula).items if token.type != Token.WSPACE]
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.expression(0)
+        if self.peek() is not None:
+            raise ValueError("余分な字句があります")
+        return node
+
+    def expression(self, min_precedence):
+        left = self.prefix()
+        while True:
+            token = self.peek()
+            if token is None:
+                return left
+            if token.type == Token.OP_POST:  # %
+                self.take()
+                left = ('percent', left)
+                continue
+            precedence = _PRECEDENCE.get(token.value) if token.type == Token.OP_IN else None
+            if precedence is None or precedence < min_precedence:
+                return left
+            self.take()
+            left = ('binary', token.value, left, self.expression(precedence + 1))
+
+    def prefix(self):
+        token = self.take()
+        if token is None:
+            raise ValueError("数式が途中で終わっています")
+        if token.type == Token.OP_PRE:
+            operand = self.prefix()
+            return ('negate', operand) if token.value == '-' else operand
+        if token.type == Token.OPERAND:
+            return self.operand(token)
+        if token.type == Token.PAREN and token.subtype == Token.OPEN:
+            node = self.expression(0)
+            closing = self.take()
+            if closing is None or closing.type != Token.PAREN:
+                raise ValueError("括弧が閉じていません")
+            return node
+        if token.type == Token.FUNC and token.subtype == Token.OPEN:
+            return self.call(token.value[:-1])
+        if token.type == Token.ARRAY:
+            raise ValueError("配列定数は未対応です")
+        raise ValueError(f"予期しない字句: {token.value}")
+
+    def operand(self, token):
+        value = token.value
+        if token.subtype == Token.NUMBER:
+            number = float(value)
+            return ('const', int(number) if number.is_integer() and 'E' not in value.upper() else number)
+        if token.subtype == Token.TEXT:
+            return ('const', value[1:-1].replace('""', '"'))
+        if token.subtype == Token.LOGICAL:
+            return ('const', value.upper() == 'TRUE')
+        if token.subtype == Token.ERROR:
+            return ('error', value)
+        reference = _parse_reference(value)
+        if reference is not None:
+            return reference
+        if _NAME_RE.match(value):
+            return ('name', value.upper())
+        return ('error', '#REF!')  # 構造化参照(テーブル[列])など
+
+    def call(self, name):
+        for prefix in _FUNCTION_PREFIXES:
+            if name.startswith(prefix):
+                name = name[len(prefix):]
+        args = []
+        token = self.peek()
+        if token is not None and token.type == Token.FUNC and token.subtype == Token.CLOSE:
+            self.take()
+            return ('call', name.upper(), ())
+        while True:
+            token = self.peek()
+            if token is not None and (token.type == Token.SEP or
+                                      (token.type == Token.FUNC and token.subtype == Token.CLOSE)):
+                args.append(('missing',))  # IF(A1,,1) のような省略された引数
+            else:
+                args.append(self.expression(0))
+            token = self.take()
+            if token is None:
+                raise ValueError("関数の括弧が閉じていません")
+            if token.type == Token.FUNC and token.subtype == Token.CLOSE:
+                return ('call', name.upper(), tuple(args))
+            if token.type != Token.SEP:
+                raise ValueError(f"予期しない字句: {token.value}")
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_formula(formula):
+    """「=数式」-> 構文木（解析できない数式は #NAME? のエラー）"""
+    try:
+        return _Parser(formula).parse()
+    except (ValueError, KeyError):
+        return ('error', '#NAME?')
+
+
+def iter_references(node):
+    """構文木に含まれるセル参照・名前"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        kind = node[0]
+        if kind in ('ref', 'name'):
+            yield node
+        elif kind == 'binary':
+            stack += (node[2], node[3])
+        elif kind in ('negate', 'percent'):
+            stack.append(node[1])
+        elif kind == 'call':
+            stack += node[2]
+
+
+# ---- 値の変換 ----
+
+def _raise_if_error(value):
+    if isinstance(value, FormulaError):
+        raise value
+    if isinstance(value, str) and value in ERROR_CODES:
+        raise FormulaError(value)
+    return value
+
+
+def to_number(value):
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, (datetime, date, time, timedelta)):
+        if isinstance(value, date) and not isinstance(value, datetime):
+            value = datetime(value.year, value.month, value.day)
+        return to_excel(value)
+    text = value.strip()
+    try:
+        number = float(text.rstrip('%')) / (100 if text.endswith('%') else 1)
+    except ValueError:
+        raise FormulaError('#VALUE!')
+    return int(number) if number.is_integer() and '.' not in text and 'e' not in text.lower() else number
+
+
+def to_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float):
+        return format_general(value)
+    if isinstance(value, (datetime, date, time, timedelta)):
+        return format_general(to_number(value))
+    return str(value)
+
+
+def to_bool(value):
+    if value is None:
+        return False
+    if isinstance(value, str):
+        if value.upper() in ('TRUE', 'FALSE'):
+            return value.upper() == 'TRUE'
+        raise FormulaError('#VALUE!')
+    return bool(to_number(value))
+
+
+def _type_rank(value):
+    """比較の順序: 数値 < 文字列 < 論理値"""
+    if isinstance(value, bool):
+        return 2
+    if isinstance(value, str):
+        return 1
+    return 0
+
+
+def compare(a, b):
+    """-> -1, 0, 1（文字列は大文字・小文字を区別しない）"""
+    if a is None:
+        a = '' if isinstance(b, str) else False if isinstance(b, bool) else 0
+    if b is None:
+        b = '' if isinstance(a, str) else False if isinstance(a, bool) else 0
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 1:
+        a, b = a.casefold(), b.casefold()
+    elif rank_a == 0:
+        a, b = to_number(a), to_number(b)
+    return (a > b) - (a < b)
+
+
+def _round(number, digits, rounding):
+    quantum = Decimal(1).scaleb(-int(digits))
+    rounded = Decimal(repr(float(number))).quantize(quantum, rounding=rounding)
+    return float(rounded) if int(digits) > 0 else int(rounded)
+
+
+class RangeValue:
+    """範囲参照の値（空でないセルだけを疎に扱う）"""
+
+    def __init__(self, evaluator, sheet, min_row, min_col, max_row, max_col):
+        self.evaluator = evaluator
+        self.sheet = sheet
+        self.min_row, self.min_col = min_row, min_col
+        self.max_row, self.max_col = max_row, max_col
+
+    @property
+    def shape(self):
+        return self.max_row - self.min_row + 1, self.max_col - self.min_col + 1
+
+    def cell(self, row_offset, col_offset):
+        return self.evaluator.cell_value(self.sheet, self.min_row + row_offset, self.min_col + col_offset)
+
+    def values(self):
+        """空でないセルの値（行優先の順）"""
+        cells = self.evaluator.sheet_cells(self.sheet)
+        for row, col in list(cells.keys_in(self.min_row, self.max_row, self.min_col, self.max_col)):
+            value = self.evaluator.cell_value(self.sheet, row, col)
+            if value is not None and value != '':
+                yield value
+
+
+class _SheetCells:
+    """評価器が読み込んだシートの一部（読み込み済みの矩形の内側のセル）"""
+
+    def __init__(self):
+        self.box = None       # (min_row, max_row, min_col, max_col)，Noneは未読み込み
+        self.formulas = {}    # (行, 列) -> 「=数式」
+        self.values = {}      # (行, 列) -> 値（数式セルはキャッシュ値）
+        self.uncached = set() # キャッシュ値のない数式セル
+        self.max_row = 0
+        self.max_col = 0
+        self._keys = None           # 値のあるセルの (行, 列) の昇順リスト
+        self._uncached_by_col = None  # 列 -> キャッシュ値のない数式セルの行の昇順リスト
+
+    def load(self, box, formulas, values, uncached):
+        self.box = box
+        self.formulas, self.values = formulas, values
+        self.uncached = {key for key in uncached if key in formulas}
+        self.invalidate()
+
+    def add_uncached(self, keys):
+        self.uncached.update(key for key in keys if key in self.formulas)
+        self.invalidate()
+
+    def invalidate(self):
+        self._keys = None
+        self._uncached_by_col = None
+        keys = list(self.values) + list(self.uncached)
+        self.max_row = max((key[0] for key in keys), default=0)
+        self.max_col = max((key[1] for key in keys), default=0)
+
+    def covers(self, min_row, max_row, min_col, max_col):
+        if self.box is None:
+            return False
+        b_min_r, b_max_r, b_min_c, b_max_c = self.box
+        return (b_min_r <= min_row and b_min_c <= min_col and
+                (b_max_r is None or (max_row is not None and max_row <= b_max_r)) and
+                (b_max_c is None or (max_col is not None and max_col <= b_max_c)))
+
+    def keys_in(self, min_row, max_row, min_col, max_col):
+        """範囲内の値のあるセル（行優先の順）"""
+        if self._keys is None:
+            self._keys = sorted(set(self.values) | self.uncached)
+        start = bisect_left(self._keys, (min_row, min_col))
+        end = bisect_right(self._keys, (max_row, max_col))
+        for key in self._keys[start:end]:
+            if min_col <= key[1] <= max_col:
+                yield key
+
+    def uncached_in(self, min_row, max_row, min_col, max_col):
+        """範囲内のキャッシュ値のない数式セル"""
+        if self._uncached_by_col is None:
+            by_col = {}
+            for row, col in self.uncached:
+                by_col.setdefault(col, []).append(row)
+            self._uncached_by_col = {col: sorted(rows) for col, rows in by_col.items()}
+        for col, rows in self._uncached_by_col.items():
+            if min_col <= col <= max_col:
+                for row in rows[bisect_left(rows, min_row):bisect_right(rows, max_row)]:
+                    yield row, col
+
+
+class FormulaEvaluator:
+    """
+    ブックの数式を必要なセルだけ評価する\n
+    - book: common.book.BookReader（iter_rowsのformulasで数式を「=数式」の文字列として読めること）\n
+    - 同じ評価器で続けて評価した場合，計算済みのセルは再計算しない\n
+    """
+
+    def __init__(self, book):
+        self.book = book
+        self._sheets = {}
+        self._results = {}  # (シート名, 行, 列) -> 値またはFormulaError
+        self._trees = {}    # (シート名, 行, 列) -> 評価待ちの数式の構文木
+        self._names = {}
+        for defined in book.defined_names:
+            self._names.setdefault(defined['name'].upper(), []).append(defined)
+
+    # ---- 読み込み ----
+
+    def sheet_name(self, name):
+        """数式中のシート名 -> ブックのシート名（大文字・小文字を区別しない）"""
+        for sheet in self.book.sheet_names:
+            if sheet.casefold() == name.casefold():
+                return sheet
+        return name
+
+    def sheet_cells(self, sheet):
+        if sheet not in self._sheets:
+            self._sheets[sheet] = _SheetCells()
+        return self._sheets[sheet]
+
+    def _ensure(self, sheet, boxes):
+        """
+        範囲の矩形のリストを読み込み済みにする（足りなければ全体を囲む矩形で読み直す）\n
+        - シートは先頭から解析するので，上に広げる場合は1行目から読み込んでも解析の手間は変わらない\n
+        - 下に広げる場合は，参照が1行ずつ広がっても読み直しが増えないように倍の行数を読み込む\n
+        """
+        cells = self.sheet_cells(sheet)
+        missing = [box for box in boxes if not cells.covers(*box)]
+        if not missing:
+            return
+        if sheet not in self.book.sheet_names:
+            raise FormulaError('#REF!')
+        if cells.box is not None:
+            b_min_r, b_max_r, b_min_c, b_max_c = cells.box
+            if any(box[0] < b_min_r for box in missing):
+                b_min_r = 1
+            if b_max_r is not None and any(box[1] is None or box[1] > b_max_r for box in missing):
+                b_max_r += b_max_r - b_min_r + 1
+            missing.append((b_min_r, b_max_r, b_min_c, b_max_c))
+        min_row = min(box[0] for box in missing)
+        max_row = None if any(box[1] is None for box in missing) else max(box[1] for box in missing)
+        min_col = min(box[2] for box in missing)
+        max_col = None if any(box[3] is None for box in missing) else max(box[3] for box in missing)
+
+        formulas, values, uncached = {}, {}, set()
+        # 数式とキャッシュ値を1回の走査で読む
+        for row, row_values in self.book.iter_rows(sheet, min_row, max_row, min_col, max_col, data_only=True,
+                                                   uncached=uncached, formulas=formulas):
+            for col, value in row_values.items():
+                values[row, col] = value
+        cells.load((min_row, max_row, min_col, max_col), formulas, values, uncached)
+
+    # ---- 依存グラフ ----
+
+    def _resolve_name(self, name, sheet):
+        """名前の定義 -> 構文木（シートのローカルな名前を優先する）"""
+        candidates = self._names.get(name)
+        if not candidates:
+            raise FormulaError('#NAME?')
+        sheet_index = self.book.sheet_names.index(sheet) if sheet in self.book.sheet_names else None
+        local = [defined for defined in candidates if defined['local_sheet'] == sheet_index]
+        defined = (local or [d for d in candidates if d['local_sheet'] is None] or candidates)[0]
+        return parse_formula('=' + defined['value'])
+
+    def _references(self, node, sheet):
+        """-> [(シート名, min_row, min_col, max_row, max_col), ...]"""
+        references = []
+        pending = [(node, sheet, 0)]
+        while pending:
+            node, current, depth = pending.pop()
+            for reference in iter_references(node):
+                if reference[0] == 'name':
+                    if depth > 8:  # 名前の循環参照
+                        continue
+                    try:
+                        pending.append((self._resolve_name(reference[1], current), current, depth + 1))
+                    except FormulaError:
+                        pass
+                    continue
+                _, ref_sheet, r1, c1, r2, c2 = reference
+                references.append((self.sheet_name(ref_sheet or current), r1, c1, r2, c2))
+        return references
+
+    def _dependencies(self, node_key):
+        sheet, row, col = node_key
+        tree = parse_formula(self.sheet_cells(sheet).formulas[row, col])
+        self._trees[node_key] = tree  # 評価まで解析結果を保持する（数式が多いとlru_cacheから外れるため）
+        references = self._references(tree, sheet)
+        boxes = {}
+        for ref_sheet, r1, c1, r2, c2 in references:
+            boxes.setdefault(ref_sheet, []).append((r1, r2, c1, c2))
+        dependencies = []
+        for ref_sheet, sheet_boxes in boxes.items():
+            try:
+                self._ensure(ref_sheet, sheet_boxes)
+            except FormulaError:
+                continue  # 存在しないシートは評価時に #REF! になる
+            cells = self.sheet_cells(ref_sheet)
+            for r1, r2, c1, c2 in sheet_boxes:
+                r2 = cells.max_row if r2 is None else r2
+                c2 = cells.max_col if c2 is None else c2
+                if r1 == r2 and c1 == c2:
+                    if (r1, c1) in cells.uncached:
+                        dependencies.append((ref_sheet, r1, c1))
+                    continue
+                dependencies += [(ref_sheet, r, c) for r, c in cells.uncached_in(r1, r2, c1, c2)]
+        return dependencies
+
+    def evaluate(self, sheet, cells):
+        """
+        -> {(行, 列): 値}\n
+        - cells: 評価する数式セルの (行, 列)（キャッシュ値の有無に関わらず計算する）\n
+        - エラーはエラー値の文字列(#DIV/0! など)で返す\n
+        """
+        cells = list(cells)
+        if not cells:
+            return {}
+        self._ensure(sheet, [(min(r for r, _ in cells), max(r for r, _ in cells),
+                              min(c for _, c in cells), max(c for _, c in cells))])
+        sheet_cells = self.sheet_cells(sheet)
+        sheet_cells.add_uncached(cells)
+        results = {}
+        for row, col in cells:
+            if (row, col) not in sheet_cells.formulas:
+                results[row, col] = sheet_cells.values.get((row, col))
+                continue
+            value = self._evaluate_node((sheet, row, col))
+            results[row, col] = value.code if isinstance(value, FormulaError) else value
+        return results
+
+    def _evaluate_node(self, root):
+        """依存先から順に(後順のDFSで)評価する（再帰しないので長い参照の連鎖でも使える）"""
+        visiting = set()
+        stack = [(root, False)]
+        while stack:
+            node_key, expanded = stack.pop()
+            if node_key in self._results:
+                continue
+            if expanded:
+                self._results[node_key] = self._compute(node_key)
+                visiting.discard(node_key)
+                continue
+            if node_key in visiting:
+                continue  # 循環参照（評価時は0として扱う）
+            visiting.add(node_key)
+            stack.append((node_key, True))
+            for dependency in self._dependencies(node_key):
+                if dependency not in self._results and dependency not in visiting:
+                    stack.append((dependency, False))
+        return self._results[root]
+
+    def _compute(self, node_key):
+        sheet, row, col = node_key
+        tree = self._trees.pop(node_key, None) or parse_formula(self.sheet_cells(sheet).formulas[row, col])
+        try:
+            value = self._eval(tree, sheet)
+            if isinstance(value, RangeValue):
+                value = self._single(value)
+            return 0 if value is None else value
+        except FormulaError as e:
+            return e
+        except (ArithmeticError, ValueError):
+            return FormulaError('#NUM!')
+
+    # ---- 評価 ----
+
+    def cell_value(self, sheet, row, col):
+        cells = self.sheet_cells(sheet)
+        if (row, col) in cells.uncached:
+            value = self._results.get((sheet, row, col), 0)  # 未評価は循環参照
+        else:
+            value = cells.values.get((row, col))
+        return _raise_if_error(value)
+
+    def _single(self, value):
+        """1セルの範囲 -> 値（複数セルは #VALUE!）"""
+        if isinstance(value, RangeValue):
+            rows, cols = value.shape
+            if rows != 1 or cols != 1:
+                raise FormulaError('#VALUE!')
+            return value.cell(0, 0)
+        return value
+
+    def _eval(self, node, sheet):
+        kind = node[0]
+        if kind == 'const':
+            return node[1]
+        if kind == 'error':
+            raise FormulaError(node[1])
+        if kind == 'missing':
+            return None
+        if kind == 'ref':
+            _, ref_sheet, r1, c1, r2, c2 = node
+            ref_sheet = self.sheet_name(ref_sheet or sheet)
+            self._ensure(ref_sheet, [(r1, r2, c1, c2)])
+            cells = self.sheet_cells(ref_sheet)
+            return RangeValue(self, ref_sheet, r1, c1, cells.max_row if r2 is None else r2,
+                              cells.max_col if c2 is None else c2)
+        if kind == 'name':
+            return self._eval(self._resolve_name(node[1], sheet), sheet)
+        if kind == 'negate':
+            return -to_number(self._scalar(node[1], sheet))
+        if kind == 'percent':
+            return to_number(self._scalar(node[1], sheet)) / 100
+        if kind == 'binary':
+            return self._binary(node[1], self._scalar(node[2], sheet), self._scalar(node[3], sheet))
+        if kind == 'call':
+            return self._call(node[1], node[2], sheet)
+        raise FormulaError('#VALUE!')
+
+    def _scalar(self, node, sheet):
+        return _raise_if_error(self._single(self._eval(node, sheet)))
+
+    def _binary(self, operator, left, right):
+        if operator == '&':
+            return to_text(left) + to_text(right)
+        if operator in ('=', '<>', '<', '>', '<=', '>='):
+            result = compare(left, right)
+            return {'=': result == 0, '<>': result != 0, '<': result < 0, '>': result > 0,
+                    '<=': result <= 0, '>=': result >= 0}[operator]
+        a, b = to_number(left), to_number(right)
+        if operator == '+':
+            return a + b
+        if operator == '-':
+            return a - b
+        if operator == '*':
+            return a * b
+        if operator == '/':
+            if b == 0:
+                raise FormulaError('#DIV/0!')
+            return a / b
+        return _power(a, b)
+
+    def _call(self, name, arg_nodes, sheet):
+        lazy = _LAZY_FUNCTIONS.get(name)
+        if lazy is not None:
+            return lazy(self, arg_nodes, sheet)
+        function = _FUNCTIONS.get(name)
+        if function is None:
+            raise FormulaError('#NAME?')
+        args = [self._eval(node, sheet) for node in arg_nodes]
+        return function(*args)
+
+
+# ---- 関数 ----
+
+def _power(a, b):
+    a, b = to_number(a), to_number(b)
+    if a == 0 and b < 0:
+        raise FormulaError('#DIV/0!')
+    result = a ** b
+    if isinstance(result, complex):
+        raise FormulaError('#NUM!')
+    return result
+
+
+def _iter_numbers(args):
+    """
+    集計関数の引数 -> 数値\n
+    - 範囲内の文字列・論理値は無視し，直接指定された値は数値に変換する\n
+    """
+    for arg in args:
+        if isinstance(arg, RangeValue):
+            for value in arg.values():
+                if isinstance(value, (int, float, datetime, date, time, timedelta)) and not isinstance(value, bool):
+                    yield to_number(value)
+        elif arg is not None:
+            yield to_number(_raise_if_error(arg))
+
+
+def _iter_values(args):
+    for arg in args:
+        if isinstance(arg, RangeValue):
+            yield from arg.values()
+        else:
+            yield _raise_if_error(arg)
+
+
+def _scalar_args(function):
+    """範囲の引数を1セルの値にしてから呼び出す"""
+    def wrapper(*args):
+        values = []
+        for arg in args:
+            if isinstance(arg, RangeValue):
+                rows, cols = arg.shape
+                if rows != 1 or cols != 1:
+                    raise FormulaError('#VALUE!')
+                arg = arg.cell(0, 0)
+            values.append(_raise_if_error(arg))
+        return function(*values)
+    return wrapper
+
+
+def _average(*args):
+    numbers = list(_iter_numbers(args))
+    if not numbers:
+        raise FormulaError('#DIV/0!')
+    return sum(numbers) / len(numbers)
+
+
+def _product(*args):
+    result = 1
+    for number in _iter_numbers(args):
+        result *= number
+    return result
+
+
+def _count_blank(arg):
+    if not isinstance(arg, RangeValue):
+        raise FormulaError('#VALUE!')
+    rows, cols = arg.shape
+    return rows * cols - sum(1 for _ in arg.values())
+
+
+def _mod(a, b):
+    a, b = to_number(a), to_number(b)
+    if b == 0:
+        raise FormulaError('#DIV/0!')
+    return a - b * math.floor(a / b)
+
+
+def _sqrt(a):
+    a = to_number(a)
+    if a < 0:
+        raise FormulaError('#NUM!')
+    return math.sqrt(a)
+
+
+def _log(a, base=10):
+    a, base = to_number(a), to_number(base)
+    if a <= 0 or base <= 0 or base == 1:
+        raise FormulaError('#NUM!')
+    return math.log(a, base)
+
+
+def _mid(text, start, length):
+    start, length = int(to_number(start)), int(to_number(length))
+    if start < 1 or length < 0:
+        raise FormulaError('#VALUE!')
+    return to_text(text)[start - 1:start - 1 + length]
+
+
+def _text(value, format_code):
+    if isinstance(value, str):
+        try:
+            value = to_number(value)
+        except FormulaError:
+            pass
+    return compile_number_format(to_text(format_code))(value)
+
+
+def _date(year, month, day):
+    year, month, day = int(to_number(year)), int(to_number(month)), int(to_number(day))
+    if year < 1900:
+        year += 1900
+    month_index = year * 12 + month - 1
+    start = datetime(month_index // 12, month_index % 12 + 1, 1)
+    return to_excel(start + timedelta(days=day - 1))
+
+
+def _date_part(attribute):
+    def part(value):
+        value = to_number(value)
+        return getattr(from_excel(value), attribute)
+    return part
+
+
+def _criteria(criteria):
+    """COUNTIFなどの条件 -> 判定関数（">5"，"<>a"，"abc" など）"""
+    if isinstance(criteria, str):
+        for operator in ('<=', '>=', '<>', '<', '>', '='):
+            if criteria.startswith(operator):
+                target = criteria[len(operator):]
+                break
+        else:
+            operator, target = '=', criteria
+        try:
+            target = to_number(target) if target != '' else None
+        except FormulaError:
+            pass
+    else:
+        operator, target = '=', criteria
+
+    def matches(value):
+        if target is None:
+            return (value is None or value == '') == (operator == '=')
+        if value is None or _type_rank(value) != _type_rank(target):
+            return operator == '<>'
+        result = compare(value, target)
+        return {'=': result == 0, '<>': result != 0, '<': result < 0, '>': result > 0,
+                '<=': result <= 0, '>=': result >= 0}[operator]
+    return matches
+
+
+def _paired_cells(criteria_range, value_range):
+    """条件の範囲と同じ位置の集計対象セル"""
+    if not isinstance(criteria_range, RangeValue):
+        raise FormulaError('#VALUE!')
+    value_range = value_range if value_range is not None else criteria_range
+    if not isinstance(value_range, RangeValue):
+        raise FormulaError('#VALUE!')
+    rows, cols = criteria_range.shape
+    for r in range(rows):
+        for c in range(cols):
+            yield criteria_range.cell(r, c), value_range.cell(r, c)
+
+
+def _count_if(criteria_range, criteria):
+    matches = _criteria(_raise_if_error(criteria))
+    return sum(1 for value, _ in _paired_cells(criteria_range, None) if matches(value))
+
+
+def _sum_if(criteria_range, criteria, sum_range=None):
+    matches = _criteria(_raise_if_error(criteria))
+    return sum(to_number(value) for key, value in _paired_cells(criteria_range, sum_range)
+               if matches(key) and isinstance(value, (int, float)) and not isinstance(value, bool))
+
+
+def _average_if(criteria_range, criteria, average_range=None):
+    matches = _criteria(_raise_if_error(criteria))
+    numbers = [value for key, value in _paired_cells(criteria_range, average_range)
+               if matches(key) and isinstance(value, (int, float)) and not isinstance(value, bool)]
+    if not numbers:
+        raise FormulaError('#DIV/0!')
+    return sum(numbers) / len(numbers)
+
+
+def _lookup_vector(arg):
+    """1行または1列の範囲 -> 値のリスト"""
+    if not isinstance(arg, RangeValue):
+        return [_raise_if_error(arg)]
+    rows, cols = arg.shape
+    if rows == 1:
+        return [arg.cell(0, c) for c in range(cols)]
+    if cols == 1:
+        return [arg.cell(r, 0) for r in range(rows)]
+    raise FormulaError('#N/A')
+
+
+def _match_position(value, candidates, match_type):
+    """-> 0始まりの位置（見つからなければ #N/A）"""
+    if match_type == 0:
+        matches = _criteria(value) if isinstance(value, str) else None
+        for i, candidate in enumerate(candidates):
+            if candidate is not None and (matches(candidate) if matches else compare(candidate, value) == 0):
+                return i
+        raise FormulaError('#N/A')
+    found = None
+    for i, candidate in enumerate(candidates):  # 昇順(1)または降順(-1)に並んでいる前提
+        if candidate is None or _type_rank(candidate) != _type_rank(value):
+            continue
+        result = compare(candidate, value)
+        if result == 0 or (result < 0 if match_type > 0 else result > 0):
+            found = i
+        else:
+            break
+    if found is None:
+        raise FormulaError('#N/A')
+    return found
+
+
+def _match(value, lookup, match_type=1):
+    value = _raise_if_error(value.cell(0, 0) if isinstance(value, RangeValue) else value)
+    match_type = 1 if match_type is None else int(to_number(match_type))
+    return _match_position(value, _lookup_vector(lookup), match_type) + 1
+
+
+def _index(table, row=None, col=None):
+    if not isinstance(table, RangeValue):
+        raise FormulaError('#VALUE!')
+    rows, cols = table.shape
+    row = int(to_number(row)) if row is not None else 0
+    col = int(to_number(col)) if col is not None else 0
+    if rows == 1 and col == 0:
+        row, col = 1, row
+    if row == 0 or col == 0:
+        col = col or 1
+        row = row or 1
+        if rows != 1 and cols != 1:
+            raise FormulaError('#VALUE!')
+    if not (1 <= row <= rows and 1 <= col <= cols):
+        raise FormulaError('#REF!')
+    return table.cell(row - 1, col - 1)
+
+
+def _vlookup(value, table, col, approximate=True):
+    if not isinstance(table, RangeValue):
+        raise FormulaError('#VALUE!')
+    value = _raise_if_error(value.cell(0, 0) if isinstance(value, RangeValue) else value)
+    col = int(to_number(col))
+    rows, cols = table.shape
+    if not 1 <= col <= cols:
+        raise FormulaError('#REF!')
+    keys = [table.cell(r, 0) for r in range(rows)]
+    approximate = True if approximate is None else to_bool(approximate)
+    position = _match_position(value, keys, 1 if approximate else 0)
+    return table.cell(position, col - 1)
+
+
+def _if(evaluator, args, sheet):
+    if not args:
+        raise FormulaError('#VALUE!')
+    condition = to_bool(evaluator._scalar(args[0], sheet))
+    if condition:
+        return evaluator._eval(args[1], sheet) if len(args) > 1 else True
+    return evaluator._eval(args[2], sheet) if len(args) > 2 else False
+
+
+def _if_error(codes):
+    def function(evaluator, args, sheet):
+        if len(args) != 2:
+            raise FormulaError('#VALUE!')
+        try:
+            return evaluator._scalar(args[0], sheet)
+        except FormulaError as e:
+            if codes and e.code not in codes:
+                raise
+            return evaluator._eval(args[1], sheet)
+    return function
+
+
+def _is_error(evaluator, args, sheet):
+    try:
+        evaluator._scalar(args[0], sheet)
+    except FormulaError:
+        return True
+    return False
+
+
+_LAZY_FUNCTIONS = {
+    'IF': _if,
+    'IFERROR': _if_error(()),
+    'IFNA': _if_error(('#N/A',)),
+    'ISERROR': _is_error,
+}
+
+_FUNCTIONS = {
+    # 集計
+    'SUM': lambda *args: sum(_iter_numbers(args)),
+    'PRODUCT': _product,
+    'AVERAGE': _average,
+    'MIN': lambda *args: min(_iter_numbers(args), default=0),
+    'MAX': lambda *args: max(_iter_numbers(args), default=0),
+    'COUNT': lambda *args: sum(1 for value in _iter_values(args)
+                               if isinstance(value, (int, float)) and not isinstance(value, bool)),
+    'COUNTA': lambda *args: sum(1 for value in _iter_values(args) if value is not None),
+    'COUNTBLANK': _count_blank,
+    'COUNTIF': _count_if,
+    'SUMIF': _sum_if,
+    'AVERAGEIF': _average_if,
+    # 数学
+    'ABS': _scalar_args(lambda a: abs(to_number(a))),
+    'INT': _scalar_args(lambda a: math.floor(to_number(a))),
+    'TRUNC': _scalar_args(lambda a, digits=0: _round(to_number(a), to_number(digits), ROUND_DOWN)),
+    'ROUND': _scalar_args(lambda a, digits: _round(to_number(a), to_number(digits), ROUND_HALF_UP)),
+    'ROUNDUP': _scalar_args(lambda a, digits: _round(to_number(a), to_number(digits), ROUND_UP)),
+    'ROUNDDOWN': _scalar_args(lambda a, digits: _round(to_number(a), to_number(digits), ROUND_DOWN)),
+    'CEILING': _scalar_args(lambda a, step=1: _round(to_number(a) / to_number(step), 0, ROUND_CEILING)
+                            * to_number(step)),
+    'FLOOR': _scalar_args(lambda a, step=1: _round(to_number(a) / to_number(step), 0, ROUND_FLOOR)
+                          * to_number(step)),
+    'MOD': _scalar_args(_mod),
+    'SQRT': _scalar_args(_sqrt),
+    'POWER': _scalar_args(_power),
+    'EXP': _scalar_args(lambda a: math.exp(to_number(a))),
+    'LN': _scalar_args(lambda a: _log(a, math.e)),
+    'LOG': _scalar_args(_log),
+    'LOG10': _scalar_args(lambda a: _log(a, 10)),
+    'PI': lambda: math.pi,
+    'SIGN': _scalar_args(lambda a: (to_number(a) > 0) - (to_number(a) < 0)),
+    # 論理
+    'AND': lambda *args: all([to_bool(value) for value in _iter_values(args)]),
+    'OR': lambda *args: any([to_bool(value) for value in _iter_values(args)]),
+    'NOT': _scalar_args(lambda a: not to_bool(a)),
+    'TRUE': lambda: True,
+    'FALSE': lambda: False,
+    'ISBLANK': _scalar_args(lambda a: a is None),
+    'ISNUMBER': _scalar_args(lambda a: isinstance(a, (int, float)) and not isinstance(a, bool)),
+    'ISTEXT': _scalar_args(lambda a: isinstance(a, str)),
+    # 文字列
+    'CONCATENATE': _scalar_args(lambda *args: ''.join(to_text(arg) for arg in args)),
+    'CONCAT': lambda *args: ''.join(to_text(value) for value in _iter_values(args)),
+    'LEN': _scalar_args(lambda a: len(to_text(a))),
+    'LEFT': _scalar_args(lambda a, n=1: to_text(a)[:int(to_number(n))]),
+    'RIGHT': _scalar_args(lambda a, n=1: to_text(a)[-int(to_number(n)):] if int(to_number(n)) else ''),
+    'MID': _scalar_args(_mid),
+    'UPPER': _scalar_args(lambda a: to_text(a).upper()),
+    'LOWER': _scalar_args(lambda a: to_text(a).lower()),
+    'TRIM': _scalar_args(lambda a: re.sub(' +', ' ', to_text(a)).strip(' ')),
+    'TEXT': _scalar_args(_text),
+    'VALUE': _scalar_args(to_number),
+    # 日付
+    'DATE': _scalar_args(_date),
+    'YEAR': _scalar_args(_date_part('year')),
+    'MONTH': _scalar_args(_date_part('month')),
+    'DAY': _scalar_args(_date_part('day')),
+    # 検索
+    'INDEX': _index,
+    'MATCH': _match,
+    'VLOOKUP': _vlookup,
+}
+
+
+def evaluate_cells(book, sheet_name, cells, evaluator=None):
+    """
+    -> {(行, 列): 値}\n
+    - キャッシュ値のない数式セルを評価する（evaluatorを渡すと計算結果を共有する）\n
+    """
+    if evaluator is None:
+        evaluator = FormulaEvaluator(book)
+    return evaluator.evaluate(sheet_name, cells)
@@ -0,0 +1,87 @@
+"""
+LaTeX用のエスケープとセル値の文字列化（表・グラフの両タブで共有）\n
+- エスケープは変換テーブルによる1パスの置換で行い，二重エスケープが起きない\n
+- 同じラベルが何千回も現れるシートが多いので，結果は値(と表示形式)ごとにメモ化する\n
+"""
+import re
+from functools import lru_cache
+
+from common.number_format import compile_number_format, format_general
+
+MEMO_SIZE = 1 << 16  # メモ化する値の種類数の上限
+
+LATEX_SPECIAL_CHARS = {
+    '&': '\\&',
+    '%': '\\%',
+    '$': '\\$',
+    '#': '\\#',
+    '^': '\\textasciicircum{}',
+    '_': '\\_',
+    '{': '\\{',
+    '}': '\\}',
+    '~': '\\textasciitilde{}',
+    '\\': '\\textbackslash{}',
+}
+_ESCAPE_TABLE = str.maketrans(LATEX_SPECIAL_CHARS)
+
+# ラベル用: 数式($...$)と「\」で始まる記述は意図したものとみなして残す
+_LABEL_PROTECTED_RE = re.compile(r'(\$[^$]*\$|\\.)', re.DOTALL)
+_LABEL_ESCAPE_TABLE = str.maketrans({char: LATEX_SPECIAL_CHARS[char] for char in '&%#_'})
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def escape_latex(text):
+    """文字列中のLaTeX特殊文字をすべてエスケープする"""
+    return text.translate(_ESCAPE_TABLE)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def escape_latex_text(text):
+    """
+    ユーザーが入力したラベル（凡例・軸ラベル・注釈など）のエスケープ\n
+    - 数式($...$)やコマンド(\\textbf など)はそのまま残す\n
+    - それ以外の & % # _ だけをエスケープする（いずれもそのままではコンパイルエラーになる）\n
+    """
+    parts = _LABEL_PROTECTED_RE.split(text)
+    return ''.join(part if i % 2 else part.translate(_LABEL_ESCAPE_TABLE) for i, part in enumerate(parts))
+
+
+def _plain_text(value, number_format=None):
+    if number_format is not None:
+        return compile_number_format(number_format)(value)
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return format_general(value)  # 0.1+0.2 -> 0.3, 1.0 -> 1
+    if isinstance(value, int):
+        value = int(value)  # True -> 1
+    return str(value)
+
+
+@lru_cache(maxsize=MEMO_SIZE, typed=True)
+def _format_cell_value(value, number_format):
+    return _plain_text(value, number_format)
+
+
+@lru_cache(maxsize=MEMO_SIZE, typed=True)
+def _latex_cell_value(value, number_format):
+    return escape_latex(_format_cell_value(value, number_format))
+
+
+def format_cell_value(value, number_format=None):
+    """
+    セル値 -> 表示用の文字列（エスケープなし）\n
+    - number_format: Excelの表示形式（Noneの場合はGeneral）\n
+    """
+    try:
+        return _format_cell_value(value, number_format)
+    except TypeError:  # ハッシュできない値はメモ化しない
+        return _plain_text(value, number_format)
+
+
+def latex_cell_value(value, number_format=None):
+    """セル値 -> LaTeXの表に埋め込む文字列（エスケープ済み）"""
+    try:
+        return _latex_cell_value(value, number_format)
+    except TypeError:
+        return escape_latex(_plain_text(value, number_format))
@@ -0,0 +1,93 @@
+"""
+結合セル範囲の空間インデックス\n
+- 行ブロックごとのバケットで，選択範囲に重なる結合セルだけを取り出す\n
+- 選択範囲の各セルがどの結合セルに属するかをラベルグリッドで定数時間に引ける\n
+- ラベルグリッド(int32)・セルの状態(int8)はnumpy配列で持ち，1セルあたり数バイトに抑える\n
+"""
+import numpy as np
+
+MERGE_INDEX_BLOCK_ROWS = 64  # バケット1つが受け持つ行数
+
+# セルの状態（cell_statusの値）
+NORMAL = 0        # 結合していないセル
+MERGE_ORIGIN = 1  # 結合セルの左上
+MERGE_EDGE = 2    # 結合セルの続きで，選択範囲内での左端の列（左上を除く）
+MERGE_COVERED = 3  # 結合セルのそれ以外（出力しない）
+
+
+class MergeIndex:
+    """
+    シート全体の結合セル範囲のインデックス\n
+    - ranges: [(min_row, min_col, max_row, max_col), ...]（シート上の出現順）\n
+    """
+
+    def __init__(self, ranges, block_rows=MERGE_INDEX_BLOCK_ROWS):
+        self.ranges = list(ranges)
+        self.block_rows = block_rows
+        self._buckets = {}  # 行ブロック番号 -> [結合セル番号, ...]
+        for number, (min_row, _, max_row, _) in enumerate(self.ranges):
+            for block in range(min_row // block_rows, max_row // block_rows + 1):
+                self._buckets.setdefault(block, []).append(number)
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def overlapping(self, min_row, max_row, min_col, max_col):
+        """
+        -> [結合セル番号, ...]\n
+        - 範囲に重なる結合セルだけを，シート上の出現順で返す\n
+        - 範囲の行にかかるバケットだけを調べる\n
+        """
+        ranges = self.ranges
+        found = set()
+        for block in range(min_row // self.block_rows, max_row // self.block_rows + 1):
+            for number in self._buckets.get(block, ()):
+                m_min_row, m_min_col, m_max_row, m_max_col = ranges[number]
+                if not (m_max_row < min_row or m_min_row > max_row or m_max_col < min_col or m_min_col > max_col):
+                    found.add(number)
+        return sorted(found)
+
+    def overlapping_ranges(self, min_row, max_row, min_col, max_col):
+        """範囲に重なる結合セル範囲のリスト（シート上の出現順）"""
+        return [self.ranges[number] for number in self.overlapping(min_row, max_row, min_col, max_col)]
+
+
+def label_grid(merged_ranges, min_row, max_row, min_col, max_col):
+    """
+    -> owners\n
+    - owners[相対行, 相対列] = そのセルを含む結合セルの番号（merged_rangesの添字），結合していなければ-1\n
+    - int32の2次元配列．結合セルごとに矩形スライスへ一括代入するので，セル単位のループは発生しない\n
+    """
+    owners = np.full((max_row - min_row + 1, max_col - min_col + 1), -1, dtype=np.int32)
+    for number, (m_min_row, m_min_col, m_max_row, m_max_col) in enumerate(merged_ranges):
+        start_row = max(m_min_row, min_row) - min_row
+        end_row = min(m_max_row, max_row) - min_row + 1
+        start_col = max(m_min_col, min_col) - min_col
+        end_col = min(m_max_col, max_col) - min_col + 1
+        if start_row < end_row and start_col < end_col:
+            owners[start_row:end_row, start_col:end_col] = number
+    return owners
+
+
+def cell_status(owners, merged_ranges, min_row, min_col):
+    """
+    -> status\n
+    - status[相対行, 相対列] = NORMAL, MERGE_ORIGIN, MERGE_EDGE, MERGE_COVERED のいずれか(int8)\n
+    - 結合セルの左上・左端の判定を配列全体でまとめて行う\n
+    """
+    owners = np.asarray(owners, dtype=np.int32).reshape(len(owners), -1)
+    status = np.where(owners >= 0, MERGE_COVERED, NORMAL).astype(np.int8)
+    if not len(merged_ranges) or not owners.size:
+        return status
+    merged = owners >= 0
+    left_edge = merged.copy()
+    left_edge[:, 1:] &= owners[:, 1:] != owners[:, :-1]  # 左隣が別の結合セル(または通常セル)
+    status[left_edge] = MERGE_EDGE
+
+    starts = np.asarray([merged_range[:2] for merged_range in merged_ranges], dtype=np.int32)
+    numbers = np.where(merged, owners, 0)
+    rows = np.arange(owners.shape[0])[:, None] + min_row
+    cols = np.arange(owners.shape[1])[None, :] + min_col
+    origin = merged & (starts[numbers, 0] == rows) & (starts[numbers, 1] == cols)
+    status[origin] = MERGE_ORIGIN
+    return status
@@ -0,0 +1,427 @@
+"""
+Excelの表示形式(number_format)によるセル値の文字列化\n
+- 表示形式の文字列は1回だけ解析して書式化関数にコンパイルし，形式ごとにキャッシュする\n
+- 対応: General・桁区切り・小数桁・パーセント・指数・文字列(@)・日付/時刻・条件付きのセクション\n
+- 分数(# ?/?)などの未対応の形式はGeneralとして表示する\n
+"""
+import math
+import re
+from datetime import date, datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+FORMAT_CACHE_SIZE = 1024  # コンパイル済みの表示形式を保持する数
+GENERAL_DIGITS = 15       # Generalで表示する有効桁数（Excelの数値の精度）
+
+EXCEL_EPOCH = datetime(1899, 12, 30)
+MONTH_NAMES = ('January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December')
+DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+JA_DAY_NAMES = ('月', '火', '水', '木', '金', '土', '日')
+
+# セクション内の字句: 引用符の文字列，\エスケープ，_x(幅合わせ)，*x(繰り返し)，[...]，それ以外の1文字
+_TOKEN_RE = re.compile(r'"[^"]*"|\\.|_.|\*.|\[[^\]]*\]|.', re.DOTALL)
+_CONDITION_RE = re.compile(r'^\[(<=|>=|<>|<|>|=)(-?[\d.]+)\]$')
+_DATE_TOKEN_RE = re.compile(r'(?i)(yyyy|yy|e|m{1,5}|d{1,4}|a{3,4}|h{1,2}|s{1,2}|am/pm|a/p|\.0+)')
+_DATE_CHARS = set('yYmMdDhHsSeE')
+_CONDITION_OPS = {
+    '<': lambda a, b: a < b, '<=': lambda a, b: a <= b, '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b, '=': lambda a, b: a == b, '<>': lambda a, b: a != b,
+}
+
+
+def format_general(value):
+    """
+    -> General形式の文字列\n
+    - 浮動小数点の誤差は15桁で丸める（0.1+0.2 -> 0.3）\n
+    - 整数値の浮動小数点は整数として表示する（1.0 -> 1）\n
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float) and math.isfinite(value):
+        if value == int(value) and abs(value) < 10 ** GENERAL_DIGITS:
+            return str(int(value))
+        text = f"{value:.{GENERAL_DIGITS}g}"
+        if 'e' in text:  # 1e-05 -> 1E-05
+            mantissa, exponent = text.split('e')
+            return f"{mantissa}E{exponent[0]}{exponent[1:].zfill(2)}"
+        return text
+    return str(value)
+
+
+def _split_sections(format_code):
+    """-> [[字句, ...], ...]（; で区切ったセクションごと）"""
+    sections = [[]]
+    for token in _TOKEN_RE.findall(format_code):
+        if token == ';':
+            sections.append([])
+        else:
+            sections[-1].append(token)
+    return sections
+
+
+def _literal(token):
+    """字句 -> 表示される文字列（書式記号でなければ）"""
+    if token.startswith('"'):
+        return token[1:-1]
+    if token.startswith('\\'):
+        return token[1:]
+    if token.startswith('_'):
+        return ' '  # 指定文字の幅の空白
+    if token.startswith('*'):
+        return ''   # セル幅までの繰り返しは表では意味を持たない
+    if token.startswith('[$'):
+        # [$¥-411] のような通貨記号とロケール
+        return token[2:-1].split('-', 1)[0]
+    if token.startswith('['):
+        return ''   # [Red] などの色指定
+    return token
+
+
+def _is_date_section(tokens):
+    # 「e」は年の記号だが，桁記号(0 #)と一緒なら指数表示の記号
+    has_digits = any(token in ('0', '#') for token in tokens)
+    for token in tokens:
+        if len(token) == 1 and token in _DATE_CHARS and not (has_digits and token in 'eE'):
+            return True
+        if token.lower() in ('[h]', '[hh]', '[m]', '[mm]', '[s]', '[ss]'):
+            return True
+    return False
+
+
+def _round_decimal(value, places):
+    number = Decimal(repr(value)) if isinstance(value, float) else Decimal(value)
+    return number.quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_UP)
+
+
+def _fill_integer(placeholders, digits):
+    """
+    整数部の桁記号(0 # ?)に右から数字を割り当てる\n
+    - 数字が余った場合は左端の記号にまとめて入れる\n
+    """
+    filled = [''] * len(placeholders)
+    remaining = digits
+    for i in range(len(placeholders) - 1, -1, -1):
+        if remaining:
+            filled[i] = remaining if i == 0 else remaining[-1]
+            remaining = '' if i == 0 else remaining[:-1]
+        else:
+            filled[i] = {'0': '0', '?': ' ', '#': ''}[placeholders[i]]
+    return filled
+
+
+def _fill_fraction(placeholders, digits):
+    """小数部の桁記号に左から数字を割り当て，末尾の0は記号に応じて省略する"""
+    filled = list(digits)
+    for i in range(len(placeholders) - 1, -1, -1):
+        if filled[i] != '0' or placeholders[i] == '0':
+            break
+        filled[i] = ' ' if placeholders[i] == '?' else ''
+    return filled
+
+
+def _group_thousands(digits):
+    """'1234567' -> '1,234,567'"""
+    head = len(digits) % 3 or 3
+    return ','.join([digits[:head]] + [digits[i:i + 3] for i in range(head, len(digits), 3)]) if digits else ''
+
+
+def _compile_number_section(tokens):
+    """数値セクション -> (数値の絶対値 -> 文字列)"""
+    parts = []  # ('lit', 文字列) / ('int', 番号) / ('frac', 番号) / ('dot',) / ('exp', 番号)
+    int_marks, frac_marks, exp_marks = [], [], []
+    percent = 0
+    thousands = False
+    scale_commas = 0
+    exponent_sign = None
+    section = 'int'
+    pending_commas = 0
+    for token in tokens:
+        if token in ('0', '#', '?'):
+            if pending_commas and section == 'int' and int_marks:
+                thousands = True
+            pending_commas = 0
+            marks = {'int': int_marks, 'frac': frac_marks, 'exp': exp_marks}[section]
+            parts.append((section, len(marks)))
+            marks.append(token)
+        elif token == '.' and section == 'int':
+            scale_commas += pending_commas
+            pending_commas = 0
+            section = 'frac'
+            parts.append(('dot',))
+        elif token == ',' and section != 'exp':
+            pending_commas += 1
+        elif token in ('E', 'e'):
+            parts.append(('exp_mark',))
+            section = 'exp'
+            exponent_sign = None
+        elif section == 'exp' and exponent_sign is None and token in ('+', '-') and parts[-1] == ('exp_mark',):
+            exponent_sign = token
+        elif token == '%':
+            percent += 1
+            parts.append(('lit', '%'))
+        elif token == '/':
+            return None  # 分数は未対応
+        else:
+            parts.append(('lit', _literal(token)))
+    scale_commas += pending_commas
+    if not int_marks and not frac_marks:
+        literal = ''.join(part[1] for part in parts if part[0] == 'lit')
+        return lambda number: literal
+    if section == 'exp' and exponent_sign is None:
+        return None  # 「E」が文字として使われている
+    decimals = len(frac_marks)
+
+    def render(number):
+        number = number * (100 ** percent) / (1000 ** scale_commas) if (percent or scale_commas) else number
+        exponent = 0
+        if exp_marks:
+            if number:
+                magnitude = math.floor(math.log10(number))
+                step = len(int_marks) if int_marks and int_marks[0] == '#' and len(int_marks) > 1 else 1
+                exponent = magnitude - magnitude % step if step > 1 else magnitude - (len(int_marks) - 1)
+                number = number / (10 ** exponent)
+            if _round_decimal(number, decimals) >= 10 ** max(len(int_marks), 1) and number:
+                number /= 10
+                exponent += 1
+        text = format(_round_decimal(number, decimals), 'f')
+        int_digits, _, frac_digits = text.partition('.')
+        int_digits = int_digits.lstrip('0')
+        if thousands:
+            grouped = _group_thousands(int_digits.rjust(int_marks.count('0'), '0'))
+            int_filled = [grouped] + [''] * (len(int_marks) - 1)
+        else:
+            int_filled = _fill_integer(int_marks, int_digits) if int_marks else []
+        frac_filled = _fill_fraction(frac_marks, frac_digits) if frac_marks else []
+        exp_text = str(abs(exponent)).rjust(exp_marks.count('0'), '0')
+        exp_filled = _fill_integer(exp_marks, exp_text) if exp_marks else []
+        pieces = []
+        for part in parts:
+            kind = part[0]
+            if kind == 'lit':
+                pieces.append(part[1])
+            elif kind == 'int':
+                pieces.append(int_filled[part[1]])
+            elif kind == 'frac':
+                pieces.append(frac_filled[part[1]])
+            elif kind == 'exp':
+                pieces.append(exp_filled[part[1]])
+            elif kind == 'dot':
+                pieces.append('.')
+            elif kind == 'exp_mark':
+                pieces.append('E' + ('-' if exponent < 0 else '+' if exponent_sign == '+' else ''))
+        return ''.join(pieces)
+
+    return render
+
+
+def _to_datetime(value):
+    """セル値 -> (datetime, 経過秒数)"""
+    if isinstance(value, timedelta):
+        return EXCEL_EPOCH + value, value.total_seconds()
+    if isinstance(value, datetime):
+        return value, (value - EXCEL_EPOCH).total_seconds()
+    if isinstance(value, date):
+        value = datetime(value.year, value.month, value.day)
+        return value, (value - EXCEL_EPOCH).total_seconds()
+    if isinstance(value, time):
+        seconds = value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1e6
+        return EXCEL_EPOCH + timedelta(seconds=seconds), seconds
+    seconds = value * 86400  # シリアル値
+    return EXCEL_EPOCH + timedelta(seconds=seconds), seconds
+
+
+def _compile_date_section(tokens):
+    """日付・時刻セクション -> (値 -> 文字列)"""
+    items = []  # (種別, 内容)
+    for token in tokens:
+        lowered = token.lower()
+        if lowered in ('[h]', '[hh]', '[m]', '[mm]', '[s]', '[ss]'):
+            items.append(('elapsed', lowered[1:-1]))
+        elif token.startswith(('"', '\\', '_', '*', '[')):
+            items.append(('lit', _literal(token)))
+        else:
+            items.append(('raw', token))
+    # 連続する1文字の字句を結合してから日付の記号に分解する
+    merged = []
+    for kind, text in items:
+        if kind == 'raw' and merged and merged[-1][0] == 'raw':
+            merged[-1] = ('raw', merged[-1][1] + text)
+        else:
+            merged.append((kind, text))
+    parts = []
+    for kind, text in merged:
+        if kind != 'raw':
+            parts.append((kind, text))
+            continue
+        for piece in _DATE_TOKEN_RE.split(text):
+            if not piece:
+                continue
+            parts.append(('code', piece.lower()) if _DATE_TOKEN_RE.fullmatch(piece) else ('lit', piece))
+
+    # m/mm は時(h)の直後か秒(s)の直前なら「分」
+    codes = [i for i, part in enumerate(parts) if part[0] in ('code', 'elapsed')]
+    for position, i in enumerate(codes):
+        kind, code = parts[i]
+        if kind != 'code' or code not in ('m', 'mm'):
+            continue
+        before = parts[codes[position - 1]][1] if position > 0 else ''
+        after = parts[codes[position + 1]][1] if position + 1 < len(codes) else ''
+        if before[:1] == 'h' or after[:1] == 's':
+            parts[i] = ('code', 'minute' if code == 'm' else 'minute2')
+    twelve_hour = any(part == ('code', 'am/pm') or part == ('code', 'a/p') for part in parts)
+    fraction = max((len(code) - 1 for kind, code in parts if kind == 'code' and code.startswith('.')), default=0)
+
+    def render(value):
+        moment, elapsed = _to_datetime(value)
+        # 表示する桁数で秒を丸める
+        step = 10 ** -fraction
+        rounded = round(elapsed / step) * step
+        moment = moment + timedelta(seconds=rounded - elapsed)
+        elapsed = rounded
+        hour = moment.hour % 12 or 12 if twelve_hour else moment.hour
+        pieces = []
+        for kind, code in parts:
+            if kind == 'lit':
+                pieces.append(code)
+            elif kind == 'elapsed':
+                unit = {'h': 3600, 'm': 60, 's': 1}[code[0]]
+                pieces.append(str(int(elapsed // unit)).rjust(len(code), '0'))
+            elif code in ('yyyy', 'e'):
+                pieces.append(str(moment.year))
+            elif code == 'yy':
+                pieces.append(f"{moment.year % 100:02d}")
+            elif code == 'm':
+                pieces.append(str(moment.month))
+            elif code == 'mm':
+                pieces.append(f"{moment.month:02d}")
+            elif code == 'mmm':
+                pieces.append(MONTH_NAMES[moment.month - 1][:3])
+            elif code == 'mmmm':
+                pieces.append(MONTH_NAMES[moment.month - 1])
+            elif code == 'mmmmm':
+                pieces.append(MONTH_NAMES[moment.month - 1][0])
+            elif code == 'd':
+                pieces.append(str(moment.day))
+            elif code == 'dd':
+                pieces.append(f"{moment.day:02d}")
+            elif code == 'ddd':
+                pieces.append(DAY_NAMES[moment.weekday()][:3])
+            elif code == 'dddd':
+                pieces.append(DAY_NAMES[moment.weekday()])
+            elif code == 'aaa':
+                pieces.append(JA_DAY_NAMES[moment.weekday()])
+            elif code == 'aaaa':
+                pieces.append(JA_DAY_NAMES[moment.weekday()] + '曜日')
+            elif code == 'h':
+                pieces.append(str(hour))
+            elif code == 'hh':
+                pieces.append(f"{hour:02d}")
+            elif code == 'minute':
+                pieces.append(str(moment.minute))
+            elif code == 'minute2':
+                pieces.append(f"{moment.minute:02d}")
+            elif code == 's':
+                pieces.append(str(moment.second))
+            elif code == 'ss':
+                pieces.append(f"{moment.second:02d}")
+            elif code.startswith('.'):
+                pieces.append('.' + f"{moment.microsecond:06d}"[:len(code) - 1])
+            elif code == 'am/pm':
+                pieces.append('AM' if moment.hour < 12 else 'PM')
+            elif code == 'a/p':
+                pieces.append('A' if moment.hour < 12 else 'P')
+        return ''.join(pieces)
+
+    return render
+
+
+def _compile_text_section(tokens):
+    """文字列セクション(@) -> (文字列 -> 文字列)"""
+    pieces = [None if token == '@' else _literal(token) for token in tokens]
+    return lambda text: ''.join(text if piece is None else piece for piece in pieces)
+
+
+def _compile_section(tokens):
+    """-> (条件, 書式化関数, 日付か)（未対応の形式は書式化関数がNone）"""
+    condition = None
+    body = []
+    for token in tokens:
+        match = _CONDITION_RE.match(token)
+        if match:
+            condition = (_CONDITION_OPS[match.group(1)], float(match.group(2)))
+        else:
+            body.append(token)
+    if len(body) == 1 and body[0].lower() == 'general':
+        return condition, format_general, False
+    if _is_date_section(body):
+        return condition, _compile_date_section(body), True
+    return condition, _compile_number_section(body), False
+
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def compile_number_format(format_code):
+    """
+    -> 書式化関数(値 -> 文字列)\n
+    - 表示形式の文字列ごとに1回だけ解析する（lru_cacheで共有）\n
+    - 数値・日付以外の値（文字列・真偽値など）は文字列セクションかGeneralで表示する\n
+    """
+    if not format_code or format_code.lower() == 'general':
+        return format_general
+    raw_sections = _split_sections(format_code)
+    text_section = None
+    if len(raw_sections) >= 4 or (len(raw_sections) > 1 and '@' in raw_sections[-1]):
+        text_section = _compile_text_section(raw_sections.pop())
+    elif len(raw_sections) == 1 and '@' in raw_sections[0]:
+        text_section = _compile_text_section(raw_sections.pop())
+    sections = [_compile_section(tokens) for tokens in raw_sections[:3]]
+
+    def choose(number):
+        """-> (セクション, 負号を付けるか)"""
+        if any(condition is not None for condition, _, _ in sections):
+            for index, (condition, formatter, is_date) in enumerate(sections):
+                if condition is None or condition[0](number, condition[1]):
+                    return sections[index], number < 0 and condition is None and index != 1
+            return sections[-1], number < 0
+        if len(sections) >= 3 and number == 0:
+            return sections[2], False
+        if len(sections) >= 2 and number < 0:
+            return sections[1], False
+        return sections[0], number < 0
+
+    def format_value(value):
+        if value is None:
+            return ""
+        if isinstance(value, str):
+            return text_section(value) if text_section is not None else value
+        if isinstance(value, bool):
+            return "TRUE" if value else "FALSE"
+        if isinstance(value, (datetime, date, time, timedelta)):
+            for condition, formatter, is_date in sections:
+                if is_date and formatter is not None:
+                    try:
+                        return formatter(value)
+                    except (OverflowError, ValueError):
+                        return format_general(value)
+            return format_general(value)
+        if not isinstance(value, (int, float)) or not math.isfinite(value) or not sections:
+            return format_general(value)
+        (condition, formatter, is_date), negative = choose(value)
+        if formatter is None:
+            return format_general(value)
+        if formatter is format_general:
+            return format_general(value)
+        try:
+            text = formatter(value if is_date else abs(value))
+        except (OverflowError, ValueError):
+            return format_general(value)
+        if negative and not is_date and any(ch in '123456789' for ch in text):
+            text = '-' + text
+        return text
+
+    return format_value
+
+
+def format_number(value, format_code):
+    """セル値を表示形式に従って文字列にする（形式はコンパイル済みのものを再利用）"""
+    return compile_number_format(format_code)(value)
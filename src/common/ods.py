@@ -0,0 +1,240 @@
+"""
+OpenDocument表計算(.ods)の読み込み（標準ライブラリのみ）\n
+- content.xmlを行単位でストリーム解析し，max_rowを過ぎたら読み込みを打ち切る\n
+- 繰り返し属性(number-rows-repeated など)で省略された空行・空列は展開せずに読み飛ばす\n
+"""
+import html
+import re
+import zipfile
+from datetime import date, datetime, timedelta
+from xml.etree import ElementTree
+
+from common.book import BookReader, in_column_range
+
+TABLE_NS = 'urn:oasis:names:tc:opendocument:xmlns:table:1.0'
+OFFICE_NS = 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'
+TEXT_NS = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+
+_TABLE = f'{{{TABLE_NS}}}table'
+_ROW = f'{{{TABLE_NS}}}table-row'
+_CELL = f'{{{TABLE_NS}}}table-cell'
+_COVERED_CELL = f'{{{TABLE_NS}}}covered-table-cell'
+_NAME = f'{{{TABLE_NS}}}name'
+_ROWS_REPEATED = f'{{{TABLE_NS}}}number-rows-repeated'
+_COLS_REPEATED = f'{{{TABLE_NS}}}number-columns-repeated'
+_COLS_SPANNED = f'{{{TABLE_NS}}}number-columns-spanned'
+_ROWS_SPANNED = f'{{{TABLE_NS}}}number-rows-spanned'
+_FORMULA = f'{{{TABLE_NS}}}formula'
+_VALUE_TYPE = f'{{{OFFICE_NS}}}value-type'
+_VALUE = f'{{{OFFICE_NS}}}value'
+_DATE_VALUE = f'{{{OFFICE_NS}}}date-value'
+_TIME_VALUE = f'{{{OFFICE_NS}}}time-value'
+_BOOLEAN_VALUE = f'{{{OFFICE_NS}}}boolean-value'
+_PARAGRAPH = f'{{{TEXT_NS}}}p'
+_SPACE = f'{{{TEXT_NS}}}s'
+_TAB = f'{{{TEXT_NS}}}tab'
+_LINE_BREAK = f'{{{TEXT_NS}}}line-break'
+
+_TABLE_NAME_RE = re.compile(rb'<(?:\w+:)?table\s[^>]*?\bname="([^"]*)"')
+_DURATION_RE = re.compile(r'^-?P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:([\d.]+)S)?$')
+_FORMULA_REF_RE = re.compile(r"\[\$?'?([^\].']*?)'?\.\$?([A-Z]+)\$?(\d+)(?::\.\$?([A-Z]+)\$?(\d+))?\]")
+SCAN_CHUNK_SIZE = 1 << 20  # シート名の走査時の読み込み単位(1MB)
+ROW_CLEAR_INTERVAL = 1000  # 解析済みの行要素を破棄する間隔
+
+
+def _cast_number(text):
+    if '.' in text or 'E' in text or 'e' in text:
+        number = float(text)
+        return int(number) if number.is_integer() and abs(number) < 1e15 else number
+    return int(text)
+
+
+def _paragraph_text(element):
+    """text:p の文字列（text:s などの空白要素を展開する）"""
+    parts = [element.text or '']
+    for child in element:
+        if child.tag == _SPACE:
+            parts.append(' ' * int(child.get(f'{{{TEXT_NS}}}c', 1)))
+        elif child.tag == _TAB:
+            parts.append('\t')
+        elif child.tag == _LINE_BREAK:
+            parts.append('\n')
+        else:
+            parts.append(_paragraph_text(child))
+        parts.append(child.tail or '')
+    return ''.join(parts)
+
+
+def _parse_duration(text):
+    """PT12H30M00S -> time（24時間以上はtimedelta）"""
+    match = _DURATION_RE.match(text)
+    if match is None:
+        return text
+    days, hours, minutes, seconds = (float(group) if group else 0 for group in match.groups())
+    delta = timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+    if text.startswith('-'):
+        return -delta
+    if delta < timedelta(days=1):
+        return (datetime.min + delta).time()
+    return delta
+
+
+def _convert_formula(formula):
+    """of:=SUM([.A1:.B2]) -> =SUM(A1:B2)"""
+    if ':' in formula.split('=', 1)[0]:
+        formula = formula.split(':', 1)[1]  # 名前空間の接頭辞(of:)
+
+    def reference(match):
+        sheet, start_col, start_row, end_col, end_row = match.groups()
+        ref = f"{start_col}{start_row}" + (f":{end_col}{end_row}" if end_col else "")
+        return f"'{sheet}'!{ref}" if sheet else ref
+
+    return _FORMULA_REF_RE.sub(reference, formula)
+
+
+def _cell_value(cell, data_only):
+    if not data_only:
+        formula = cell.get(_FORMULA)
+        if formula:
+            return _convert_formula(formula)
+    value_type = cell.get(_VALUE_TYPE)
+    if value_type in ('float', 'percentage', 'currency'):
+        return _cast_number(cell.get(_VALUE, '0'))
+    if value_type == 'date':
+        text = cell.get(_DATE_VALUE, '')
+        try:
+            return datetime.fromisoformat(text) if 'T' in text else date.fromisoformat(text)
+        except ValueError:
+            return text
+    if value_type == 'time':
+        return _parse_duration(cell.get(_TIME_VALUE, ''))
+    if value_type == 'boolean':
+        return cell.get(_BOOLEAN_VALUE) == 'true'
+    paragraphs = [_paragraph_text(p) for p in cell.iter(_PARAGRAPH)]
+    return '\n'.join(paragraphs) if paragraphs else None
+
+
+class OdsWorkbook(BookReader):
+    """.odsファイルの読み取り専用ハンドル"""
+
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        self.archive = zipfile.ZipFile(file_path)
+        self.sheets = [(name, index) for index, name in enumerate(self._scan_table_names())]
+
+    def close(self):
+        self.archive.close()
+
+    def _scan_table_names(self):
+        """content.xmlのバイト列からtable:table要素の名前だけを取り出す"""
+        names = []
+        with self.archive.open('content.xml') as src:
+            tail = b''
+            while True:
+                chunk = src.read(SCAN_CHUNK_SIZE)
+                data = tail + chunk
+                cut = data.rfind(b'<') if chunk else len(data)
+                if cut == -1:
+                    cut = len(data)
+                names += [html.unescape(name.decode('utf-8')) for name in _TABLE_NAME_RE.findall(data, 0, cut)]
+                if not chunk:
+                    break
+                tail = data[cut:]
+        return names
+
+    def _iter_table(self, sheet_name):
+        """
+        -> (行番号, 行の繰り返し数, 行要素) のイテレータ\n
+        - 対象のシートの行だけを返し，シートの終わりで打ち切る\n
+        """
+        self._sheet_key(sheet_name)
+        with self.archive.open('content.xml') as src:
+            inside = False
+            table = None
+            depth = 0  # 入れ子の表(サブテーブル)の深さ
+            row_counter = 0
+            parsed_rows = 0
+            for event, element in ElementTree.iterparse(src, events=('start', 'end')):
+                tag = element.tag
+                if event == 'start':
+                    if tag == _TABLE:
+                        if inside:
+                            depth += 1
+                        elif element.get(_NAME) == sheet_name:
+                            inside = True
+                            table = element
+                    continue
+                if not inside:
+                    if tag == _ROW:
+                        element.clear()
+                    continue
+                if tag == _TABLE:
+                    if depth == 0:
+                        return
+                    depth -= 1
+                elif tag == _ROW and depth == 0:
+                    repeated = int(element.get(_ROWS_REPEATED, 1))
+                    yield row_counter + 1, repeated, element
+                    row_counter += repeated
+                    # 解析済みの行要素を破棄してメモリ使用量を一定に保つ
+                    element.clear()
+                    parsed_rows += 1
+                    if parsed_rows % ROW_CLEAR_INTERVAL == 0:
+                        table.clear()
+
+    def _iter_cells(self, row_element):
+        """-> (列番号, 列の繰り返し数, セル要素)"""
+        col_counter = 0
+        for cell in row_element:
+            if cell.tag not in (_CELL, _COVERED_CELL):
+                continue
+            repeated = int(cell.get(_COLS_REPEATED, 1))
+            yield col_counter + 1, repeated, cell
+            col_counter += repeated
+
+    def iter_rows(self, sheet_name, min_row=1, max_row=None, min_col=1, max_col=None, data_only=True,
+                  formats=None, uncached=None, formulas=None):
+        """
+        -> (行番号, {列番号: 値}) のイテレータ\n
+        - データスタイルは読まないので，formatsには何も追加しない\n
+        - formulas: 辞書を渡すと，data_only=Trueのまま数式セルの {(行, 列): 「=数式」} も追加する\n
+        """
+        read_formulas = data_only and formulas is not None
+        for first_row, row_repeated, row_element in self._iter_table(sheet_name):
+            if max_row is not None and first_row > max_row:
+                break
+            values = {}
+            row_formulas = {}
+            for first_col, col_repeated, cell in self._iter_cells(row_element):
+                if cell.tag == _COVERED_CELL or (max_col is not None and first_col > max_col):
+                    continue
+                formula = cell.get(_FORMULA) if read_formulas else None
+                if formula:
+                    formula = _convert_formula(formula)
+                value = _cell_value(cell, data_only)
+                if (value is None or value == '') and not formula:
+                    continue
+                for col in range(max(first_col, min_col), first_col + col_repeated):
+                    if not in_column_range(col, min_col, max_col):
+                        break
+                    if formula:
+                        row_formulas[col] = formula
+                    if value is not None and value != '':
+                        values[col] = value
+            if not values and not row_formulas:
+                continue
+            for row in range(max(first_row, min_row), first_row + row_repeated):
+                if max_row is not None and row > max_row:
+                    break
+                for col, formula in row_formulas.items():
+                    formulas[row, col] = formula
+                if values:
+                    yield row, dict(values)
+
+    def iter_merged_ranges(self, sheet_name):
+        for row, row_repeated, row_element in self._iter_table(sheet_name):
+            for col, _, cell in self._iter_cells(row_element):
+                col_span = int(cell.get(_COLS_SPANNED, 1))
+                row_span = int(cell.get(_ROWS_SPANNED, 1))
+                if col_span > 1 or row_span > 1:
+                    yield row, col, row + row_span - 1, col + col_span - 1
@@ -0,0 +1,68 @@
+"""
+openpyxlによる.xlsxの読み込み（通常モードでブック全体を展開する）\n
+- 独自のストリーム解析(common.xlsx)と結果を比較するための代替バックエンド\n
+"""
+from openpyxl import load_workbook
+
+from common.book import BookReader
+
+
+class OpenpyxlWorkbook(BookReader):
+    """openpyxlで読み込んだブック（data_onlyごとに1回だけ読み込む）"""
+
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        self._workbooks = {}
+        self.sheets = [(name, name) for name in self._workbook(True).sheetnames]
+        self.defined_names = self._read_defined_names()
+
+    def _read_defined_names(self):
+        workbook = self._workbook(True)
+        scopes = [(None, workbook.defined_names)]
+        scopes += [(index, worksheet.defined_names) for index, worksheet in enumerate(workbook.worksheets)]
+        return [{'name': defined.name, 'value': defined.attr_text, 'local_sheet': local_sheet,
+                 'hidden': bool(defined.hidden)}
+                for local_sheet, names in scopes for defined in names.values()]
+
+    def _workbook(self, data_only):
+        if data_only not in self._workbooks:
+            self._workbooks[data_only] = load_workbook(self.file_path, data_only=data_only)
+        return self._workbooks[data_only]
+
+    def close(self):
+        for workbook in self._workbooks.values():
+            workbook.close()
+        self._workbooks.clear()
+
+    def iter_rows(self, sheet_name, min_row=1, max_row=None, min_col=1, max_col=None, data_only=True,
+                  formats=None, uncached=None, formulas=None):
+        """
+        -> (行番号, {列番号: 値}) のイテレータ\n
+        - openpyxlは値と数式を別々に読み込むので，formulasを渡すと数式用のブックも読み込む\n
+        """
+        worksheet = self._workbook(data_only)[self._sheet_key(sheet_name)]
+        need_formulas = data_only and (uncached is not None or formulas is not None)
+        formula_sheet = self._workbook(False)[self._sheet_key(sheet_name)] if need_formulas else None
+        for cells in worksheet.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col):
+            values = {}
+            for cell in cells:
+                value = getattr(cell.value, 'text', cell.value)  # 配列数式は数式の文字列にする
+                # 数式セルかどうかはセルごとに1回だけ調べる
+                formula_cell = formula_sheet.cell(cell.row, cell.column) if formula_sheet is not None else None
+                is_formula = formula_cell is not None and formula_cell.data_type == 'f'
+                if is_formula and formulas is not None:
+                    formulas[cell.row, cell.column] = getattr(formula_cell.value, 'text', formula_cell.value)
+                if value is None or value == '':
+                    if is_formula and uncached is not None:
+                        uncached.add((cell.row, cell.column))
+                    continue
+                values[cell.column] = value
+                if formats is not None and cell.data_type in ('n', 'd') and cell.number_format != 'General':
+                    formats[cell.row, cell.column] = cell.number_format
+            if values:
+                yield cells[0].row, values
+
+    def iter_merged_ranges(self, sheet_name):
+        worksheet = self._workbook(True)[self._sheet_key(sheet_name)]
+        for merged in worksheet.merged_cells.ranges:
+            yield merged.min_row, merged.min_col, merged.max_row, merged.max_col
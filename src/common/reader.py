@@ -0,0 +1,263 @@
+"""
+ストリーミング方式のワークブック読み込み\n
+- 指定範囲の行だけを解析し，max_rowを過ぎたら読み込みを打ち切る\n
+- ファイル形式に応じた読み込みバックエンドは common.backends が選ぶ\n
+- 結合セルはシートXMLを直接走査して，選択範囲に重なるものだけを返す\n
+"""
+import threading
+
+from openpyxl import load_workbook
+
+from common.backends import open_workbook
+from common.cache import estimate_workbook_bytes, workbook_cache
+from common.cell_values import CellValues
+from common.formula import evaluate_cells
+from common.merges import MergeIndex
+from common.sheets import list_sheet_names
+from common.used_range import detect_table_blocks
+
+MERGE_BYTES = 160  # 結合セル1つあたりの推定メモリ量（インデックスのバケット分を含む）
+PROGRESS_ROWS = 1024  # 読み込み中に進捗を通知する行の間隔
+
+
+class SheetGrid:
+    """
+    指定範囲のセル値と，範囲に重なる結合セル範囲\n
+    - rows: 範囲内のセル値と表示形式（CellValues，rows[r]で行の値のリスト，空セルはNone）\n
+    - merged_ranges: [(min_row, min_col, max_row, max_col), ...]（シート上の絶対座標）\n
+    - formats: {(行, 列): 表示形式}（範囲内の相対座標，General以外のセルのみ）\n
+    - rowsに値のリストのリストを渡した場合は，formatsと合わせてCellValuesに変換する\n
+    """
+
+    def __init__(self, min_row, max_row, min_col, max_col, rows, merged_ranges, formats=None):
+        self.min_row = min_row
+        self.max_row = max_row
+        self.min_col = min_col
+        self.max_col = max_col
+        if not isinstance(rows, CellValues):
+            rows = CellValues.from_rows(rows, max_col - min_col + 1, formats)
+        self.rows = rows
+        self.merged_ranges = merged_ranges
+
+    @property
+    def formats(self):
+        return self.rows.formats()
+
+    @property
+    def num_rows(self):
+        return self.max_row - self.min_row + 1
+
+    @property
+    def num_cols(self):
+        return self.max_col - self.min_col + 1
+
+    def value(self, row, col):
+        """絶対座標のセル値（範囲外はNone）"""
+        if self.min_row <= row <= self.max_row and self.min_col <= col <= self.max_col:
+            return self.rows.value(row - self.min_row, col - self.min_col)
+        return None
+
+
+class RangeViews:
+    """
+    1回の走査で読んだ範囲の，値の表示と数式の表示（どちらもCellValues）\n
+    - formulas: 値の表示の番号の配列を複製し，数式セルだけを「=数式」に置き換えたもの（プールは共有）\n
+    - キャッシュ値のない数式セルが残っていれば，値の表示を初めて使うときに計算する\n
+    """
+
+    def __init__(self, file_path, sheet_name, min_row, min_col, values, formulas, uncached):
+        self.file_path = file_path
+        self.sheet_name = sheet_name
+        self.min_row = min_row
+        self.min_col = min_col
+        self.values = values
+        self.formulas = values.with_overrides({(row - min_row, col - min_col): formula
+                                               for (row, col), formula in formulas.items()})
+        self._uncached = uncached
+        self._lock = threading.Lock()
+
+    def evaluate(self, book=None):
+        """キャッシュ値のない数式セルを計算して値の表示に書き込む（bookを省略するとファイルを開き直す）"""
+        with self._lock:
+            if not self._uncached:
+                return
+            if book is None:
+                with open_workbook(self.file_path) as reopened:
+                    results = evaluate_cells(reopened, self.sheet_name, self._uncached)
+            else:
+                results = evaluate_cells(book, self.sheet_name, self._uncached)
+            for (row, col), value in results.items():
+                self.values.set_value(row - self.min_row, col - self.min_col, value)
+            self.values.release_lookup()
+            self._uncached = set()
+
+    def view(self, data_only):
+        """data_only=True: 値の表示，False: 数式の表示"""
+        if not data_only:
+            return self.formulas
+        self.evaluate()
+        return self.values
+
+    def nbytes(self):
+        size = self.values.nbytes() + self.formulas.codes.nbytes
+        if self.formulas.format_codes is not None:
+            size += self.formulas.format_codes.nbytes
+        return size
+
+
+def _read_cells(book, sheet_name, min_row, max_row, min_col, max_col, data_only, uncached=None, formulas=None,
+                progress=None):
+    """
+    範囲の値と表示形式をCellValuesに書き込む（uncached・formulasはiter_rowsにそのまま渡す）\n
+    - progress(stage, fraction): PROGRESS_ROWS行ごとに 'load' の進捗を通知する（例外を送出すると読み込みを中止する）\n
+    """
+    num_rows = max_row - min_row + 1
+    cells = CellValues(num_rows, max_col - min_col + 1)
+    sheet_formats = {}
+    count = 0
+    for row, values in book.iter_rows(sheet_name, min_row, max_row, min_col, max_col, data_only,
+                                      formats=sheet_formats, uncached=uncached, formulas=formulas):
+        count += 1
+        if progress is not None and count % PROGRESS_ROWS == 0:
+            progress('load', (row - min_row + 1) / num_rows)
+        if values:
+            cells.set_row(row - min_row, [col - min_col for col in values], list(values.values()))
+        if sheet_formats:  # 表示形式も行ごとに移して，セル単位の辞書を溜めない
+            for (f_row, f_col), number_format in sheet_formats.items():
+                cells.set_format(f_row - min_row, f_col - min_col, number_format)
+            sheet_formats.clear()
+    return cells
+
+
+def read_range_values(book, sheet_name, min_row, max_row, min_col, max_col, data_only=True, progress=None):
+    """
+    -> CellValues\n
+    - 範囲内の値と表示形式だけを取り出す（max_row以降は解析しない）\n
+    - 値はプールの番号として行ごとに書き込むので，行のリストを作らない\n
+    - 値の表示でキャッシュ値のない数式セルは，参照先をたどってその場で計算する\n
+    """
+    uncached = set() if data_only else None
+    cells = _read_cells(book, sheet_name, min_row, max_row, min_col, max_col, data_only, uncached,
+                        progress=progress)
+    if uncached:
+        for (row, col), value in evaluate_cells(book, sheet_name, uncached).items():
+            cells.set_value(row - min_row, col - min_col, value)
+    cells.release_lookup()
+    return cells
+
+
+def read_range_views(book, sheet_name, min_row, max_row, min_col, max_col, evaluate=True, progress=None):
+    """
+    -> RangeViews\n
+    - 値の表示と数式の表示を，シートの1回の走査でまとめて読む\n
+    - evaluate=Falseの場合，キャッシュ値のない数式セルは値の表示を初めて使うときに計算する\n
+    """
+    uncached, formulas = set(), {}
+    cells = _read_cells(book, sheet_name, min_row, max_row, min_col, max_col, True, uncached, formulas, progress)
+    cells.release_lookup()
+    views = RangeViews(book.file_path, sheet_name, min_row, min_col, cells, formulas, uncached)
+    if evaluate:
+        views.evaluate(book)
+    return views
+
+
+def read_overlapping_merges(book, sheet_name, min_row, max_row, min_col, max_col):
+    """範囲に重なる結合セル範囲のリスト（シート上の出現順）"""
+    return [
+        merged for merged in book.iter_merged_ranges(sheet_name)
+        if not (merged[2] < min_row or merged[0] > max_row or merged[3] < min_col or merged[1] > max_col)
+    ]
+
+
+def _read_merge_index(file_path, sheet_name):
+    with open_workbook(file_path) as book:
+        return MergeIndex(book.iter_merged_ranges(sheet_name))
+
+
+def get_merge_index(file_path, sheet_name, cache=workbook_cache):
+    """シート全体の結合セルのインデックス（値の表示モードに依存しないので，シート単位で共有する）"""
+    if cache is None:
+        return _read_merge_index(file_path, sheet_name)
+    return cache.get(file_path, None, 'merge_index', lambda: _read_merge_index(file_path, sheet_name),
+                     extra=(sheet_name,), sizeof=lambda index: len(index) * MERGE_BYTES + MERGE_BYTES)
+
+
+def _read_views(file_path, sheet_name, min_row, max_row, min_col, max_col, data_only, progress=None):
+    with open_workbook(file_path) as book:
+        # 数式の表示で読む場合，数式の計算は値の表示に切り替えるまで行わない
+        return read_range_views(book, sheet_name, min_row, max_row, min_col, max_col, evaluate=data_only,
+                                progress=progress)
+
+
+def read_sheet_range(file_path, sheet_name, min_row, max_row, min_col, max_col, data_only=True,
+                     cache=workbook_cache, progress=None):
+    """
+    指定範囲をストリーミングで読み込み，SheetGridを返す\n
+    - progress(stage, fraction): 読み込み中の進捗通知（例外を送出すると読み込みを中止し，キャッシュには入れない）\n
+    - cacheを指定した場合，範囲の値とシートの結合セル一覧をキャッシュから再利用する\n
+    - キャッシュには値の表示と数式の表示を1回の走査で読んで両方を保持するので，表示の切り替えでは読み直さない\n
+    """
+    if cache is None:
+        with open_workbook(file_path) as book:
+            cells = read_range_values(book, sheet_name, min_row, max_row, min_col, max_col, data_only, progress)
+            merged_ranges = read_overlapping_merges(book, sheet_name, min_row, max_row, min_col, max_col)
+        return SheetGrid(min_row, max_row, min_col, max_col, cells, merged_ranges)
+
+    merge_index = get_merge_index(file_path, sheet_name, cache)
+    views = cache.get(
+        file_path, None, 'range',
+        lambda: _read_views(file_path, sheet_name, min_row, max_row, min_col, max_col, data_only, progress),
+        extra=(sheet_name, min_row, max_row, min_col, max_col),
+        sizeof=lambda views: views.nbytes())
+    cells = views.view(data_only)
+    merged_ranges = merge_index.overlapping_ranges(min_row, max_row, min_col, max_col)
+    return SheetGrid(min_row, max_row, min_col, max_col, cells, merged_ranges)
+
+
+def _read_table_blocks(file_path, sheet_name):
+    with open_workbook(file_path) as book:
+        return detect_table_blocks(book, sheet_name)
+
+
+def get_table_blocks(file_path, sheet_name, cache=workbook_cache):
+    """
+    -> [(min_row, max_row, min_col, max_col), ...]\n
+    - シート内の表ブロック（空行・空列で区切られた値のかたまり）をキャッシュ経由で検出する\n
+    """
+    if cache is None:
+        return _read_table_blocks(file_path, sheet_name)
+    return cache.get(file_path, None, 'table_blocks', lambda: _read_table_blocks(file_path, sheet_name),
+                     extra=(sheet_name,), sizeof=lambda blocks: len(blocks) * MERGE_BYTES + MERGE_BYTES)
+
+
+def _read_sheet_dimension(file_path, sheet_name):
+    with open_workbook(file_path) as book:
+        return book.sheet_dimension(sheet_name)
+
+
+def get_sheet_dimension(file_path, sheet_name, cache=workbook_cache):
+    """保存されているシートの使用範囲 (min_row, max_row, min_col, max_col)，記録がなければNone（キャッシュ経由）"""
+    if cache is None:
+        return _read_sheet_dimension(file_path, sheet_name)
+    return cache.get(file_path, None, 'dimension', lambda: _read_sheet_dimension(file_path, sheet_name),
+                     extra=(sheet_name,), sizeof=lambda dimension: 64)
+
+
+def get_sheet_names(file_path, cache=workbook_cache):
+    """シート名の一覧（キャッシュ経由）"""
+    if cache is None:
+        return list_sheet_names(file_path)
+    return cache.get(file_path, None, 'sheet_names', lambda: list_sheet_names(file_path),
+                     sizeof=lambda names: sum(len(name) for name in names) * 2 + 64)
+
+
+def load_workbook_cached(file_path, data_only=True, cache=workbook_cache):
+    """
+    openpyxlで通常モードのブック全体を読み込む（キャッシュ経由）\n
+    - 戻り値はキャッシュと共有されるので，変更しないこと\n
+    """
+    if cache is None:
+        return load_workbook(file_path, data_only=data_only)
+    return cache.get(file_path, data_only, 'workbook',
+                     lambda: load_workbook(file_path, data_only=data_only),
+                     sizeof=lambda wb: estimate_workbook_bytes(file_path))
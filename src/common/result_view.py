@@ -0,0 +1,75 @@
+"""
+生成したLaTeXコードの表示欄（両タブで共有）\n
+- QTextEditは全文をレイアウトするため，数MBのコードでは表示・スクロールが重くなる\n
+- 行のリストをモデルとして持ち，QListViewで見えている行だけを描画する\n
+- 行の高さは一定(setUniformItemSizes)なので，全行を公開しても描画は見えている行の分だけで済む\n
+- コピー・保存は表示部品ではなく，元の文字列(バッファ)から行う\n
+"""
+from PyQt5.QtCore import QStringListModel, Qt
+from PyQt5.QtGui import QFontDatabase, QKeySequence
+from PyQt5.QtWidgets import QAbstractItemView, QApplication, QListView
+
+
+class LatexLineModel(QStringListModel):
+    """
+    LaTeXコードを行単位で公開するモデル\n
+    - 最初から全行を公開し，スクロールバー・Ctrl+Endでコードの最後まで移動できるようにする\n
+    - 行数・行の参照はQStringListModel(C++)が行う（レイアウト時に行ごとにPythonを呼ばない）\n
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.text = ""
+        self.lines = []
+
+    def set_text(self, text):
+        self.text = text
+        self.lines = text.split('\n') if text else []
+        self.setStringList(self.lines)
+
+
+class LatexResultView(QListView):
+    """
+    読み取り専用のLaTeXコード表示欄（QTextEditと同じ setPlainText / toPlainText / clear を持つ）\n
+    - Ctrl+C は選択した行を，toPlainText() はコード全体をバッファから返す\n
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.lineModel = LatexLineModel(self)
+        self.setModel(self.lineModel)
+        self.setUniformItemSizes(True)  # 行の高さを1回だけ計算させる
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+
+    def setPlainText(self, text):
+        self.lineModel.set_text(text)
+        self.scrollToTop()
+
+    def toPlainText(self):
+        return self.lineModel.text
+
+    def clear(self):
+        self.lineModel.set_text("")
+
+    def setReadOnly(self, read_only):
+        """QTextEditとの互換用（常に読み取り専用）"""
+
+    def selected_text(self):
+        rows = sorted(index.row() for index in self.selectedIndexes())
+        return '\n'.join(self.lineModel.lines[row] for row in rows)
+
+    def save_to_file(self, file_path):
+        """バッファの内容をそのままファイルに書き出す"""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(self.lineModel.text)
+            if self.lineModel.text and not self.lineModel.text.endswith('\n'):
+                f.write('\n')
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            QApplication.clipboard().setText(self.selected_text())
+            return
+        super().keyPressEvent(event)
@@ -0,0 +1,164 @@
+"""
+シートの一部分だけを読むプレビュー用のリーダー（Qt非依存）\n
+- シートを行のブロック(BLOCK_ROWS行)単位で読み，最近使ったブロックだけをLRUで保持する\n
+- ストリーミングの走査を開いたまま次のブロックから再開するので，下へ順にスクロールする間は読み直さない\n
+  （前へ戻ったブロック・離れた先のブロックは，そのブロックから走査をやり直す）\n
+- セルは表示形式を適用した文字列（エスケープなし）で保持する\n
+"""
+import threading
+from collections import OrderedDict
+
+from common.backends import open_workbook
+from common.cache import workbook_cache
+from common.latex_escape import format_cell_value
+from common.reader import get_merge_index, get_sheet_dimension, get_table_blocks
+from common.used_range import bounding_range
+
+BLOCK_ROWS = 256   # 1ブロックの行数
+MAX_BLOCKS = 64    # 保持するブロック数の上限
+RESUME_BLOCKS = 8  # これより先のブロックへ飛ぶ場合は，途中の行を値に変換せずに済むよう走査を開き直す
+
+
+class SheetWindow:
+    """
+    シートの表示範囲だけを読み込むリーダー\n
+    - num_rows, num_cols: プレビューする範囲（A1からシートの使用範囲の右下まで）\n
+    - cached_block(index): 読み込み済みのブロック（なければNone，読み込みはしない）\n
+    - load_block(index): ブロックを読み込む（時間がかかるのでワーカースレッドから呼ぶ）\n
+    - 使用後はclose()を呼ぶこと\n
+    """
+
+    def __init__(self, file_path, sheet_name, data_only=True, block_rows=BLOCK_ROWS, max_blocks=MAX_BLOCKS,
+                 cache=workbook_cache):
+        self.file_path = file_path
+        self.sheet_name = sheet_name
+        self.data_only = data_only
+        self.block_rows = block_rows
+        self.max_blocks = max_blocks
+        dimension = get_sheet_dimension(file_path, sheet_name, cache)
+        if dimension is None:
+            # 使用範囲の記録がない形式(csv・odsなど)は，表ブロックの検出（キャッシュされる）で求める
+            dimension = bounding_range(get_table_blocks(file_path, sheet_name, cache))
+        _, max_row, _, max_col = dimension if dimension is not None else (1, 0, 1, 0)
+        self.num_rows = max_row
+        self.num_cols = max(max_col, 1)
+        self.merge_index = get_merge_index(file_path, sheet_name, cache)
+
+        self._blocks = OrderedDict()  # ブロック番号 -> [{列: 文字列}, ...]（ブロック内の行ごと）
+        self._lock = threading.Lock()       # LRUの操作（画面からの参照を待たせないよう短く保持する）
+        self._read_lock = threading.Lock()  # 走査の状態（読み込み中はこちらだけを保持する）
+        self._book = None
+        self._rows = None       # 開いたままの行の走査（iter_rows）
+        self._formats = {}      # 走査中に集まる表示形式（ブロックを取り出したら捨てる）
+        self._next_row = None   # 走査が次に返す行の下限（これより前のブロックは走査をやり直す）
+        self._lookahead = None  # 先読みした次のブロックの行
+        self._closed = False
+
+    @property
+    def num_blocks(self):
+        return (self.num_rows + self.block_rows - 1) // self.block_rows
+
+    def block_of(self, row):
+        """行番号(1始まり) -> ブロック番号"""
+        return (row - 1) // self.block_rows
+
+    def cached_block(self, index):
+        with self._lock:
+            block = self._blocks.get(index)
+            if block is not None:
+                self._blocks.move_to_end(index)
+            return block
+
+    def text(self, row, col):
+        """セル(1始まり)の表示文字列．ブロックが未読み込みならNone"""
+        block = self.cached_block(self.block_of(row))
+        if block is None:
+            return None
+        return block[(row - 1) % self.block_rows].get(col, "")
+
+    def merged_ranges(self, min_row, max_row):
+        """行の範囲に重なる結合セル範囲 [(min_row, min_col, max_row, max_col), ...]"""
+        return self.merge_index.overlapping_ranges(min_row, max_row, 1, self.num_cols)
+
+    def load_block(self, index):
+        """ブロックを読み込んでLRUに入れる（読み込み済みならそのまま返す．close()後はNone）"""
+        with self._read_lock:
+            if self._closed:
+                return None
+            block = self.cached_block(index)
+            if block is not None:
+                return block
+            block = self._read_block(index)
+        with self._lock:
+            self._blocks[index] = block
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        return block
+
+    def _read_block(self, index):
+        start = index * self.block_rows + 1
+        end = start + self.block_rows - 1
+        if self._rows is None or start < self._next_row or start > self._next_row + RESUME_BLOCKS * self.block_rows:
+            self._restart(start)
+
+        block = [{} for _ in range(self.block_rows)]
+        found = []
+        while True:
+            item = self._lookahead if self._lookahead is not None else next(self._rows, None)
+            self._lookahead = None
+            if item is None:
+                break
+            row, values = item
+            if row < start:
+                continue
+            if row > end:
+                self._lookahead = item  # 次のブロックの行は次回の読み込みで使う
+                break
+            found.append((row, values))
+        self._next_row = end + 1
+
+        formats = self._formats
+        for row, values in found:
+            cells = block[row - start]
+            for col, value in values.items():
+                if value is not None:
+                    cells[col] = format_cell_value(value, formats.get((row, col)))
+        for key in [key for key in formats if key[0] <= end]:
+            del formats[key]
+        return block
+
+    def _restart(self, start):
+        """startの行から走査を開き直す"""
+        if self._book is None:
+            self._book = open_workbook(self.file_path)
+        if self._rows is not None:
+            self._rows.close()  # 途中まで読んだ走査のファイルを閉じる
+        self._formats = {}
+        self._lookahead = None
+        self._rows = self._book.iter_rows(self.sheet_name, min_row=start, min_col=1, max_col=self.num_cols,
+                                          data_only=self.data_only, formats=self._formats)
+        self._next_row = start
+
+    def release(self):
+        """
+        開いたままの走査とブックを閉じる（読み込み済みのブロックは残す）\n
+        - しばらく読み込みがなければ呼び出し，Excelでの上書き保存を妨げないようにする\n
+        - 次の読み込みでは走査を開き直す\n
+        """
+        with self._read_lock:
+            self._release()
+
+    def _release(self):
+        if self._rows is not None:
+            self._rows.close()
+            self._rows = None
+        if self._book is not None:
+            self._book.close()
+            self._book = None
+
+    def close(self):
+        with self._read_lock:
+            self._closed = True
+            self._release()
+        with self._lock:
+            self._blocks.clear()
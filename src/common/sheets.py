@@ -0,0 +1,13 @@
+"""
+シート名の高速取得\n
+- .xlsx/.xlsm はブックのマニフェスト(workbook.xml)だけを読み，シートの中身は展開しない\n
+- 旧形式の .xls はxlrdのオンデマンド読み込みで，シート本体を読まずに取得する\n
+- .ods はcontent.xmlのシート名だけを走査し，.csv/.tsv はファイル名を1つのシート名とする\n
+"""
+from common.backends import open_workbook
+
+
+def list_sheet_names(file_path):
+    """-> [シート名, ...]（ブック内の順番）"""
+    with open_workbook(file_path) as book:
+        return book.sheet_names
@@ -0,0 +1,205 @@
+"""
+シートの使用範囲と表ブロックの自動検出\n
+- シートのdimension（保存時の使用範囲）の内側だけを走査し，空の行・列を端から切り詰める\n
+- 空行・空列で区切られた値のかたまりを，それぞれ別の表ブロックとして検出する\n
+"""
+from openpyxl.utils.cell import get_column_letter
+
+BLOCK_GAP = 1  # これ以上の空行・空列があれば別の表とみなす
+
+
+def _row_runs(cols):
+    """
+    -> [(開始列, 終了列), ...]\n
+    - 昇順の列番号を連続区間にまとめる（BLOCK_GAP未満の空列は区間に含める）\n
+    """
+    runs = []
+    for col in cols:
+        if runs and col - runs[-1][1] <= BLOCK_GAP:
+            runs[-1][1] = col
+        else:
+            runs.append([col, col])
+    return runs
+
+
+def _join_runs(runs):
+    """
+    -> [(開始列, 終了列), ...]\n
+    - 列の区間を開始列順に並べ，重なる・隣り合う区間を1つにまとめる\n
+    """
+    joined = []
+    for start, end in sorted(map(tuple, runs)):
+        if joined and start - joined[-1][1] <= BLOCK_GAP:
+            joined[-1][1] = max(joined[-1][1], end)
+        else:
+            joined.append([start, end])
+    return joined
+
+
+def _occupied_spans(rows, merged_ranges):
+    """
+    -> (開始行, 終了行, [(開始列, 終了列), ...]) のイテレータ（行番号の昇順）\n
+    - 値のある行は1行ずつ，結合セルだけが覆う行は列の区間が変わらない間を1つにまとめて返す\n
+    - 結合セルは行ごとの列に展開せず，列の区間のまま扱う\n
+    """
+    merges = sorted(merged_ranges)
+    active = []  # 現在の行を覆う結合セル [(最終行, 開始列, 終了列), ...]
+    position = 0
+    rows = iter(rows)
+    pending = next(rows, None)
+    row = None
+    while True:
+        if row is not None:
+            active = [merge for merge in active if merge[0] >= row]
+        if not active:  # 次に値か結合セルがある行まで進む
+            candidates = [pending[0]] if pending is not None else []
+            if position < len(merges):
+                candidates.append(merges[position][0])
+            if not candidates:
+                return
+            row = min(candidates)
+        while position < len(merges) and merges[position][0] <= row:
+            m_min_r, m_min_c, m_max_r, m_max_c = merges[position]
+            active.append((m_max_r, m_min_c, m_max_c))
+            position += 1
+        merge_runs = [(m_min_c, m_max_c) for _, m_min_c, m_max_c in active]
+
+        if pending is not None and pending[0] == row:
+            yield row, row, _join_runs(_row_runs(sorted(set(pending[1]))) + merge_runs)
+            pending = next(rows, None)
+            row += 1
+            continue
+        # 結合セルだけの行: 値のある行・結合セルの始まり・終わりの手前までは同じ区間が続く
+        last = min(merge[0] for merge in active)
+        if pending is not None:
+            last = min(last, pending[0] - 1)
+        if position < len(merges):
+            last = min(last, merges[position][0] - 1)
+        yield row, last, _join_runs(merge_runs)
+        row = last + 1
+
+
+def _merge_overlapping(blocks):
+    """
+    -> 外接矩形が重なるブロックをまとめたリスト\n
+    - 開始行の順に走査し，行が重なりうる矩形とだけ列の重なりを調べる\n
+    - まとめて広がった矩形が新たに重なることがあるので，数が変わらなくなるまで繰り返す\n
+    """
+    while True:
+        merged = []
+        open_boxes = []  # 行が重なりうる矩形（mergedの要素）
+        for box in sorted(blocks):
+            open_boxes = [other for other in open_boxes if other[0] is not None and other[2] >= box[0]]
+            target = None
+            for other in open_boxes:
+                if box[2] <= other[4] and other[3] <= box[3]:
+                    if target is None:
+                        target = other
+                        target[2] = max(target[2], box[1])
+                        target[3] = min(target[3], box[2])
+                        target[4] = max(target[4], box[3])
+                    elif other is not target:
+                        target[1] = min(target[1], other[1])
+                        target[2] = max(target[2], other[2])
+                        target[3] = min(target[3], other[3])
+                        target[4] = max(target[4], other[4])
+                        other[0] = None
+            if target is None:
+                target = [True, box[0], box[1], box[2], box[3]]
+                merged.append(target)
+                open_boxes.append(target)
+        result = [tuple(box[1:]) for box in merged if box[0] is not None]
+        if len(result) == len(blocks):
+            return result
+        blocks = result
+
+
+def find_table_blocks(rows, merged_ranges=()):
+    """
+    -> [(min_row, max_row, min_col, max_col), ...]（上から，同じ行では左から）\n
+    - rows: (行番号, [値のある列番号, ...]) のイテレータ（行番号の昇順）\n
+    - 各行の値の連続区間を，前の行の区間と列が重なれば(斜めも含む)同じブロックにまとめる\n
+    - 結合セルは範囲全体を値のあるセルとして扱う\n
+    """
+    parent = []  # ブロック番号の統合(union-find)
+    boxes = []   # ブロック番号 -> [min_row, max_row, min_col, max_col]
+
+    def find(block):
+        while parent[block] != block:
+            parent[block] = parent[parent[block]]
+            block = parent[block]
+        return block
+
+    def union(a, b):
+        a, b = find(a), find(b)
+        if a == b:
+            return a
+        parent[b] = a
+        box_a, box_b = boxes[a], boxes[b]
+        box_a[0] = min(box_a[0], box_b[0])
+        box_a[1] = max(box_a[1], box_b[1])
+        box_a[2] = min(box_a[2], box_b[2])
+        box_a[3] = max(box_a[3], box_b[3])
+        return a
+
+    previous_row = None
+    previous_runs = []  # 前の行の [(開始列, 終了列, ブロック番号), ...]（開始列の昇順）
+    for first_row, last_row, row_runs in _occupied_spans(rows, merged_ranges):
+        if previous_row is None or first_row - previous_row > BLOCK_GAP:
+            previous_runs = []
+        runs = []
+        p = 0
+        for start, end in row_runs:
+            # 前の行の区間は昇順で重ならないので，列が重なる区間は連続した範囲になる
+            while p < len(previous_runs) and previous_runs[p][1] + 1 < start:
+                p += 1
+            block = None
+            q = p
+            while q < len(previous_runs) and previous_runs[q][0] - 1 <= end:
+                p_block = previous_runs[q][2]
+                block = find(p_block) if block is None else union(block, p_block)
+                q += 1
+            if block is None:
+                block = len(parent)
+                parent.append(block)
+                boxes.append([first_row, last_row, start, end])
+            else:  # 上の行のブロックを広げる
+                box = boxes[block]
+                box[1] = last_row
+                box[2] = min(box[2], start)
+                box[3] = max(box[3], end)
+            runs.append((start, end, block))
+        previous_runs = runs
+        previous_row = last_row
+
+    blocks = {tuple(boxes[block]) for block in range(len(parent)) if find(block) == block}
+    # ブロックの外接矩形が重なる場合（L字型など）もまとめる
+    return sorted(_merge_overlapping(sorted(blocks)))
+
+
+def bounding_range(blocks):
+    """ブロック全体を囲む範囲（ブロックがなければNone）"""
+    if not blocks:
+        return None
+    return (min(block[0] for block in blocks), max(block[1] for block in blocks),
+            min(block[2] for block in blocks), max(block[3] for block in blocks))
+
+
+def range_string(min_row, max_row, min_col, max_col):
+    """(min_row, max_row, min_col, max_col) -> 「A1:E6」形式"""
+    return f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}"
+
+
+def detect_table_blocks(book, sheet_name):
+    """
+    -> [(min_row, max_row, min_col, max_col), ...]\n
+    - dimensionがあればその範囲の行だけを解析し，範囲外の行に達した時点で打ち切る\n
+    - セルの値は変換せず，値の有無だけを調べる\n
+    """
+    dimension = book.sheet_dimension(sheet_name)
+    if dimension is None:
+        rows = book.iter_occupied_columns(sheet_name)
+    else:
+        min_row, max_row, min_col, max_col = dimension
+        rows = book.iter_occupied_columns(sheet_name, min_row, max_row, min_col, max_col)
+    return find_table_blocks(rows, book.iter_merged_ranges(sheet_name))
@@ -0,0 +1,107 @@
+"""
+旧形式(.xls)の読み込み（xlrd）\n
+- xlrdは数式を保持しないため，data_onlyに関わらず保存されている値を返す\n
+- 結合セルの取得には formatting_info=True での読み込みが必要\n
+"""
+from common.book import BookReader
+from common.used_range import range_string
+
+
+def import_xlrd():
+    try:
+        import xlrd
+    except ImportError:
+        raise ImportError("旧形式(.xls)のファイルを読み込むにはxlrdが必要です")
+    return xlrd
+
+
+class XlsWorkbook(BookReader):
+    """.xlsファイルの読み取り専用ハンドル（シートは必要になった時点で読み込む）"""
+
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        self._xlrd = import_xlrd()
+        self.book = self._xlrd.open_workbook(file_path, formatting_info=True, on_demand=True)
+        self.sheets = [(name, index) for index, name in enumerate(self.book.sheet_names())]
+        self.defined_names = self._read_defined_names()
+
+    def close(self):
+        self.book.release_resources()
+
+    def _read_defined_names(self):
+        """名前の定義のうち，1つのシートの矩形範囲を指すもの"""
+        defined_names = []
+        for name in self.book.name_obj_list:
+            try:
+                sheet_index, row_lo, row_hi, col_lo, col_hi = name.area2d(clipped=True)
+            except Exception:
+                continue  # 定数・数式・複数範囲の名前
+            if row_lo >= row_hi or col_lo >= col_hi:
+                continue
+            sheet_name = self.book.sheet_names()[sheet_index].replace("'", "''")
+            defined_names.append({
+                'name': name.name,
+                'value': f"'{sheet_name}'!{range_string(row_lo + 1, row_hi, col_lo + 1, col_hi)}",
+                'local_sheet': name.scope if name.scope >= 0 else None,
+                'hidden': bool(name.hidden),
+            })
+        return defined_names
+
+    def _cell_value(self, cell):
+        xlrd = self._xlrd
+        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+            return None
+        value = cell.value
+        if cell.ctype == xlrd.XL_CELL_NUMBER:
+            return int(value) if value == int(value) else value
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            try:
+                converted = xlrd.xldate_as_datetime(value, self.book.datemode)
+            except (ValueError, OverflowError, xlrd.xldate.XLDateError):
+                return "#VALUE!"
+            return converted.time() if value < 1 else converted
+        if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            return bool(value)
+        if cell.ctype == xlrd.XL_CELL_ERROR:
+            return xlrd.error_text_from_code.get(value, "#N/A")
+        return value if value != '' else None
+
+    def _number_format(self, cell):
+        """セルの表示形式（Generalまたは不明ならNone）"""
+        xf = self.book.xf_list[cell.xf_index] if cell.xf_index is not None else None
+        number_format = self.book.format_map.get(xf.format_key) if xf is not None else None
+        if number_format is None or number_format.format_str in ('', 'General'):
+            return None
+        return number_format.format_str
+
+    def iter_rows(self, sheet_name, min_row=1, max_row=None, min_col=1, max_col=None, data_only=True,
+                  formats=None, uncached=None, formulas=None):
+        """-> (行番号, {列番号: 値}) のイテレータ（数式は保持されないので常に値）"""
+        xlrd = self._xlrd
+        sheet = self.book.sheet_by_index(self._sheet_key(sheet_name))
+        last_row = sheet.nrows if max_row is None else min(max_row, sheet.nrows)
+        for r in range(min_row - 1, last_row):
+            end_col = sheet.row_len(r) if max_col is None else min(max_col, sheet.row_len(r))
+            values = {}
+            for c in range(min_col - 1, end_col):
+                cell = sheet.cell(r, c)
+                value = self._cell_value(cell)
+                if value is not None:
+                    values[c + 1] = value
+                    if formats is not None and cell.ctype in (xlrd.XL_CELL_NUMBER, xlrd.XL_CELL_DATE):
+                        number_format = self._number_format(cell)
+                        if number_format is not None:
+                            formats[r + 1, c + 1] = number_format
+            if values:
+                yield r + 1, values
+
+    def iter_merged_ranges(self, sheet_name):
+        sheet = self.book.sheet_by_index(self._sheet_key(sheet_name))
+        for row_lo, row_hi, col_lo, col_hi in sheet.merged_cells:  # 0始まり，終端は含まない
+            yield row_lo + 1, col_lo + 1, row_hi, col_hi
+
+    def sheet_dimension(self, sheet_name):
+        sheet = self.book.sheet_by_index(self._sheet_key(sheet_name))
+        if sheet.nrows == 0 or sheet.ncols == 0:
+            return None
+        return 1, sheet.nrows, 1, sheet.ncols
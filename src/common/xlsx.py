@@ -0,0 +1,426 @@
+"""
+.xlsx(OOXML)パッケージを直接読むための低レベルヘルパー\n
+- openpyxlでブック全体を展開せずに，シートXMLを行単位でストリーム解析する\n
+- 結合セル範囲はシートXMLのバイト列を走査して取り出す\n
+"""
+import posixpath
+import re
+import zipfile
+from xml.etree import ElementTree
+
+from openpyxl.cell.text import Text
+from openpyxl.formula.translate import Translator
+from openpyxl.reader.strings import read_string_table
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import column_index_from_string, get_column_letter, range_boundaries
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_ISO8601, from_excel
+
+from common.book import BookReader
+
+MERGE_SCAN_CHUNK_SIZE = 1 << 20  # 結合セル走査時の読み込み単位(1MB)
+SHEET_CLEAR_INTERVAL = 1000      # 解析済みの行要素を破棄する間隔
+# ロケールに依存する組み込みの表示形式（日本語版Excelでの表示）
+LOCALE_FORMATS = {14: 'yyyy/m/d', 22: 'yyyy/m/d h:mm'}
+
+_MERGE_CELL_RE = re.compile(rb'<(?:\w+:)?mergeCell\b[^>]*?\bref="([^"]+)"')
+_DIMENSION_RE = re.compile(rb'<(?:\w+:)?dimension\b[^>]*?\bref="([^"]+)"')
+_ROW_OR_CELL_RE = re.compile(  # 行の開始タグ("row", 行番号)，またはセル(列名, 属性, 中身)
+    rb'<(?:\w+:)?(?:(row)\b(?:[^>]*?\br="(\d+)")?[^>]*>|c\b(?:(?=[^>]*?\br="([A-Z]+)\d+"))?'
+    rb'([^>]*?)(?:/>|>(.*?)</(?:\w+:)?c>))', re.DOTALL)
+_CELL_VALUE_RE = re.compile(rb'<(?:\w+:)?v>([^<]*)<')
+_TEXT_NODE_RE = re.compile(rb'>[^<]')  # 値・数式・文字列のいずれかの中身がある
+DIMENSION_SCAN_BYTES = 64 * 1024  # dimension要素を探すシートXML先頭のバイト数
+_DIGITS = '0123456789'
+
+
+def _local_name(tag):
+    """名前空間を除いたタグ名・属性名"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _read_relationships(archive, rels_path, source_dir):
+    """
+    -> {Id: (Type, パッケージ内の絶対パス)}\n
+    - .relsファイルのTargetをsource_dir基準で解決する\n
+    """
+    try:
+        root = ElementTree.fromstring(archive.read(rels_path))
+    except KeyError:
+        return {}
+    relationships = {}
+    for rel in root:
+        target = rel.get('Target', '')
+        if target.startswith('/'):
+            path = target.lstrip('/')
+        else:
+            path = posixpath.normpath(posixpath.join(source_dir, target))
+        relationships[rel.get('Id')] = (rel.get('Type', ''), path)
+    return relationships
+
+
+def workbook_part_path(archive):
+    """ブック本体(workbook.xml)のパッケージ内パス"""
+    for rel_type, path in _read_relationships(archive, '_rels/.rels', '').values():
+        if rel_type.endswith('/officeDocument'):
+            return path
+    return 'xl/workbook.xml'
+
+
+def _cast_number(text):
+    """数値セルの文字列 -> int または float"""
+    if '.' in text or 'E' in text or 'e' in text:
+        return float(text)
+    return int(text)
+
+
+class XlsxWorkbook(BookReader):
+    """
+    .xlsxファイルの読み取り専用ハンドル\n
+    - シート一覧・共有文字列・スタイルは必要になった時点で一度だけ読み込む\n
+    - with文で使用するか，使用後にclose()を呼ぶこと\n
+    """
+
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        self.archive = zipfile.ZipFile(file_path)
+        self._shared_strings = None
+        self._cell_formats = None
+        self._date_styles = None
+        self._timedelta_styles = None
+
+        workbook_path = workbook_part_path(self.archive)
+        workbook_dir = posixpath.dirname(workbook_path)
+        rels_path = posixpath.join(workbook_dir, '_rels', posixpath.basename(workbook_path) + '.rels')
+        self._relationships = _read_relationships(self.archive, rels_path, workbook_dir)
+        self._read_workbook_xml(workbook_path)
+
+    def close(self):
+        self.archive.close()
+
+    def _read_workbook_xml(self, workbook_path):
+        """シート一覧（ブック内の順番），名前の定義，日付の基準(1900/1904)を取得"""
+        root = ElementTree.fromstring(self.archive.read(workbook_path))
+        self.sheets = []
+        self.defined_names = []
+        self.epoch = CALENDAR_WINDOWS_1900
+        for element in root.iter():
+            name = _local_name(element.tag)
+            if name == 'workbookPr':
+                if element.get('date1904') in ('1', 'true'):
+                    self.epoch = CALENDAR_MAC_1904
+            elif name == 'sheet':
+                rel_id = None
+                for key, value in element.attrib.items():
+                    if key.startswith('{') and _local_name(key) == 'id':  # r:id（sheetIdではない）
+                        rel_id = value
+                relationship = self._relationships.get(rel_id)
+                self.sheets.append((element.get('name'), relationship[1] if relationship else None))
+            elif name == 'definedName':
+                local_sheet_id = element.get('localSheetId')
+                self.defined_names.append({
+                    'name': element.get('name'),
+                    'value': (element.text or '').strip(),
+                    'local_sheet': int(local_sheet_id) if local_sheet_id is not None else None,
+                    'hidden': element.get('hidden') in ('1', 'true'),
+                })
+
+    def _part_by_type(self, type_suffix):
+        for rel_type, path in self._relationships.values():
+            if rel_type.endswith(type_suffix):
+                return path
+        return None
+
+    def sheet_part(self, sheet_name):
+        """シート名 -> シートXMLのパス（存在しない場合はKeyError）"""
+        for name, path in self.sheets:
+            if name == sheet_name and path:
+                return path
+        raise KeyError(f"Worksheet {sheet_name} does not exist.")
+
+    def sheet_tables(self, sheet_name):
+        """
+        -> [{'name', 'display_name', 'ref'}, ...]
+
+        - シートに含まれるExcelのテーブル（挿入 -> テーブル）
+
+        """
+        part_path = self.sheet_part(sheet_name)
+        part_dir = posixpath.dirname(part_path)
+        rels_path = posixpath.join(part_dir, '_rels', posixpath.basename(part_path) + '.rels')
+        tables = []
+        for rel_type, path in _read_relationships(self.archive, rels_path, part_dir).values():
+            if not rel_type.endswith('/table'):
+                continue
+            root = ElementTree.fromstring(self.archive.read(path))
+            tables.append({
+                'name': root.get('name'),
+                'display_name': root.get('displayName') or root.get('name'),
+                'ref': root.get('ref'),
+            })
+        return tables
+
+    @property
+    def shared_strings(self):
+        if self._shared_strings is None:
+            path = self._part_by_type('/sharedStrings')
+            if path and path in self.archive.namelist():
+                with self.archive.open(path) as src:
+                    self._shared_strings = read_string_table(src)
+            else:
+                self._shared_strings = []
+        return self._shared_strings
+
+    def _read_styles(self):
+        """cellXfsの各スタイル番号に対応する表示形式と，日付・時間形式のスタイル番号"""
+        formats = []
+        path = self._part_by_type('/styles')
+        if path and path in self.archive.namelist():
+            root = ElementTree.fromstring(self.archive.read(path))
+            custom = {}
+            for element in root.iter():
+                if _local_name(element.tag) == 'numFmt':
+                    custom[int(element.get('numFmtId'))] = element.get('formatCode', 'General')
+            for element in root:
+                if _local_name(element.tag) != 'cellXfs':
+                    continue
+                for xf in element:
+                    num_fmt_id = int(xf.get('numFmtId', 0))
+                    formats.append(custom.get(num_fmt_id, LOCALE_FORMATS.get(num_fmt_id) or BUILTIN_FORMATS.get(num_fmt_id, 'General')))
+        self._cell_formats = formats
+        self._date_styles = {idx for idx, fmt in enumerate(formats) if is_date_format(fmt)}
+        self._timedelta_styles = {idx for idx, fmt in enumerate(formats) if is_timedelta_format(fmt)}
+
+    @property
+    def cell_formats(self):
+        """スタイル番号 -> 表示形式(number_format)"""
+        if self._cell_formats is None:
+            self._read_styles()
+        return self._cell_formats
+
+    def iter_rows(self, sheet_name, min_row=1, max_row=None, min_col=1, max_col=None, data_only=True,
+                  formats=None, uncached=None, formulas=None):
+        """
+        -> (行番号, {列番号: 値}) のイテレータ\n
+        - 範囲内の値のある行だけを返す（空行・空セルは含まない）\n
+        - max_rowを過ぎた時点で解析を打ち切る\n
+        - data_only=Falseの場合，数式セルは「=数式」の文字列を返す\n
+        - formats: 辞書を渡すと，表示形式がGeneral以外の数値セルの {(行, 列): 表示形式} を追加する\n
+        - uncached: 集合を渡すと，data_only=Trueでキャッシュ値のない数式セルの (行, 列) を追加する\n
+        - formulas: 辞書を渡すと，data_only=Trueのまま数式セルの {(行, 列): 「=数式」} も同じ走査で追加する\n
+        """
+        read_formulas = not data_only or formulas is not None
+        shared_strings = self.shared_strings
+        if self._cell_formats is None:
+            self._read_styles()
+        date_styles = self._date_styles
+        timedelta_styles = self._timedelta_styles
+        styled = {style: fmt for style, fmt in enumerate(self._cell_formats) if fmt != 'General'}
+        epoch = self.epoch
+        shared_formulae = {}
+
+        with self.archive.open(self.sheet_part(sheet_name)) as src:
+            ns = None
+            sheet_data = None
+            row_counter = 0
+            parsed_rows = 0
+            for event, element in ElementTree.iterparse(src, events=('start', 'end')):
+                if ns is None:
+                    tag = element.tag
+                    ns = tag[:tag.index('}') + 1] if tag.startswith('{') else ''
+                    row_tag, cell_tag, value_tag = ns + 'row', ns + 'c', ns + 'v'
+                    formula_tag, inline_tag, data_tag = ns + 'f', ns + 'is', ns + 'sheetData'
+                if event == 'start':
+                    if element.tag == data_tag:
+                        sheet_data = element
+                    continue
+                if element.tag == data_tag:
+                    break
+                if element.tag != row_tag:
+                    continue
+
+                r = element.get('r')
+                row_counter = int(r) if r else row_counter + 1
+                if max_row is not None and row_counter > max_row:
+                    break
+                in_rows = row_counter >= min_row
+                # 数式を読む場合は範囲外の共有数式の先頭セルも記録する必要がある
+                if in_rows or read_formulas:
+                    values = {}
+                    col_counter = 0
+                    for cell in element:
+                        if cell.tag != cell_tag:
+                            continue
+                        ref = cell.get('r')
+                        col_counter = column_index_from_string(ref.rstrip(_DIGITS)) if ref else col_counter + 1
+                        in_range = in_rows and col_counter >= min_col and (max_col is None or col_counter <= max_col)
+                        if not in_range and not read_formulas:
+                            continue
+
+                        formula = cell.find(formula_tag) if read_formulas else None
+                        if formula is not None:
+                            value = "=" + (formula.text or '')
+                            if formula.get('t') == 'shared':
+                                # 共有数式は先頭セルの数式を現在のセルに平行移動する
+                                coordinate = ref or f"{get_column_letter(col_counter)}{row_counter}"
+                                index = formula.get('si')
+                                if index in shared_formulae:
+                                    if in_range:
+                                        value = shared_formulae[index].translate_formula(coordinate)
+                                elif value != "=":
+                                    shared_formulae[index] = Translator(value, coordinate)
+                            if not data_only:
+                                if in_range:
+                                    values[col_counter] = value
+                                continue
+                            if in_range:
+                                formulas[row_counter, col_counter] = value
+                        if not in_range:
+                            continue
+
+                        data_type = cell.get('t', 'n')
+                        if data_type == 'inlineStr':
+                            child = cell.find(inline_tag)
+                            if child is not None:
+                                values[col_counter] = Text.from_tree(child).content
+                            continue
+
+                        text = cell.findtext(value_tag)
+                        if not text:
+                            if uncached is not None and cell.find(formula_tag) is not None:
+                                uncached.add((row_counter, col_counter))
+                                style = int(cell.get('s', 0))
+                                if formats is not None and style in styled:
+                                    formats[row_counter, col_counter] = styled[style]
+                            continue
+                        if data_type == 'n':
+                            value = _cast_number(text)
+                            style = int(cell.get('s', 0))
+                            if formats is not None and style in styled:
+                                formats[row_counter, col_counter] = styled[style]
+                            if style in date_styles:
+                                try:
+                                    value = from_excel(value, epoch, timedelta=style in timedelta_styles)
+                                except (OverflowError, ValueError):
+                                    value = "#VALUE!"
+                        elif data_type == 's':
+                            value = shared_strings[int(text)]
+                        elif data_type == 'b':
+                            value = bool(int(text))
+                        elif data_type == 'd':
+                            value = from_ISO8601(text)
+                        else:  # 'str'（数式の文字列結果）, 'e'（エラー値）
+                            value = text
+                        values[col_counter] = value
+                    if values:
+                        yield row_counter, values
+
+                # 解析済みの行要素を破棄してメモリ使用量を一定に保つ
+                element.clear()
+                parsed_rows += 1
+                if sheet_data is not None and parsed_rows % SHEET_CLEAR_INTERVAL == 0:
+                    sheet_data.clear()
+
+    def iter_occupied_columns(self, sheet_name, min_row=1, max_row=None, min_col=1, max_col=None):
+        """
+        -> (行番号, [列番号, ...]) のイテレータ\n
+        - 値のあるセルの位置だけを返す（書式だけの空セル・空文字列のセルは含まない）\n
+        - 数式のセルは，計算結果が保存されていなくても値のあるセルとみなす\n
+        - XMLとして解析せず，シートXMLのバイト列をチャンク単位で走査するので iter_rows より速い\n
+        """
+        shared_strings = self.shared_strings
+        column_numbers = {}  # 列名(bytes) -> 列番号
+        row_counter = 0
+        col_counter = 0
+        current_row, cols = None, []
+        with self.archive.open(self.sheet_part(sheet_name)) as src:
+            tail = b''
+            while True:
+                chunk = src.read(MERGE_SCAN_CHUNK_SIZE)
+                data = tail + chunk
+                # 行の途中で切れないよう，最後の</row>までを処理する（最後のチャンクは全て）
+                cut = data.rfind(b'</row>') + len(b'</row>') if chunk else len(data)
+                if chunk and cut < len(b'</row>'):
+                    tail = data
+                    continue
+                for row_tag, row_number, column, cell_attrs, body in _ROW_OR_CELL_RE.findall(data, 0, cut):
+                    if row_tag:
+                        if cols:
+                            yield current_row, cols
+                            cols = []
+                        row_counter = int(row_number) if row_number else row_counter + 1
+                        col_counter = 0
+                        if max_row is not None and row_counter > max_row:
+                            return
+                        current_row = row_counter
+                        continue
+                    if column:
+                        col_counter = column_numbers.get(column)
+                        if col_counter is None:
+                            col_counter = column_numbers[column] = column_index_from_string(column.decode('ascii'))
+                    else:
+                        col_counter += 1
+                    if (not body or row_counter < min_row or col_counter < min_col
+                            or (max_col is not None and col_counter > max_col)):
+                        continue
+                    if b't="s"' in cell_attrs:
+                        value = _CELL_VALUE_RE.search(body)
+                        if value is None or not value.group(1) or not shared_strings[int(value.group(1))]:
+                            continue
+                    elif not _TEXT_NODE_RE.search(body):
+                        continue
+                    cols.append(col_counter)
+                if not chunk:
+                    break
+                tail = data[cut:]
+        if cols:
+            yield current_row, cols
+
+    def sheet_dimension(self, sheet_name):
+        """
+        -> (min_row, max_row, min_col, max_col)，記録がなければNone\n
+        - シートXML先頭のdimension要素（Excelが保存時に書き込む使用範囲）を読む\n
+        - 書式だけのセルも含むため，実際のデータより大きいことがある\n
+        """
+        with self.archive.open(self.sheet_part(sheet_name)) as src:
+            head = src.read(DIMENSION_SCAN_BYTES)
+        data_start = head.find(b'sheetData')
+        match = _DIMENSION_RE.search(head, 0, data_start if data_start != -1 else len(head))
+        if match is None:
+            return None
+        try:
+            min_col, min_row, max_col, max_row = range_boundaries(match.group(1).decode('ascii'))
+        except ValueError:
+            return None
+        if None in (min_col, min_row, max_col, max_row):
+            return None
+        return min_row, max_row, min_col, max_col
+
+    def iter_merged_ranges(self, sheet_name):
+        """
+        -> (min_row, min_col, max_row, max_col) のイテレータ\n
+        - シートXMLをチャンク単位で走査し，mergeCell要素のref属性だけを取り出す\n
+        - sheetDataをXMLとして解析しないため，シートの大きさに関わらずメモリ使用量は一定\n
+        """
+        with self.archive.open(self.sheet_part(sheet_name)) as src:
+            tail = b''
+            while True:
+                chunk = src.read(MERGE_SCAN_CHUNK_SIZE)
+                if not chunk:
+                    break
+                data = tail + chunk
+                # 最後の'<'以降は要素が途中で切れている可能性があるので次回に回す
+                cut = data.rfind(b'<')
+                if cut == -1:
+                    cut = len(data)
+                if b'mergeCell' in data:
+                    for match in _MERGE_CELL_RE.finditer(data, 0, cut):
+                        yield _merge_boundaries(match)
+                tail = data[cut:]
+            for match in _MERGE_CELL_RE.finditer(tail):
+                yield _merge_boundaries(match)
+
+
+def _merge_boundaries(match):
+    min_col, min_row, max_col, max_row = range_boundaries(match.group(1).decode('ascii'))
+    return min_row, min_col, max_row, max_col
+
@@ -0,0 +1,244 @@
+"""
+Excel→LaTeX表のコマンドライン一括変換\n
+- マニフェスト(JSON)に列挙したブック/シート/範囲のジョブをプロセスプールで並列変換する\n
+- ジョブごとの所要時間と構造化エラーをJSONレポートとして出力する\n
+
+使用例（srcディレクトリで実行）::
+
+    python -m table_latex.batch manifest.json --report report.json
+    python -m table_latex.batch --workbook report.xlsx --output-dir out
+
+マニフェスト::
+
+    {
+        "defaults": {"position": "H", "show_value": true, "add_borders": true},
+        "jobs": [
+            {"file": "data.xlsx", "sheet": "Sheet1", "range": "A1:E6",
+             "caption": "結果", "label": "tab:result", "output": "out/result.tex"}
+        ]
+    }
+
+file, output の相対パスはマニフェストのあるディレクトリを基準に解決する
+range に "auto" を指定すると，シートの使用範囲を自動検出する
+longtable を true にしたジョブは，longtable環境で output に1行ずつ書き出す（大きな表向け）
+max_cells, max_output_bytes, max_seconds を指定したジョブは，読み込む前に規模を見積もり，
+上限を超えれば RangeTooLargeError（レポートに見積もりを含む）として変換しない
+formats に {"html": "out/result.html", "markdown": "out/result.md"} のように形式と出力先を指定すると，
+同じ読み込み結果から他の形式（booktabs, markdown, html, csv）も続けて書き出す
+header_rows には見出しの行数を指定する（booktabsでは見出しの下に\\midrule，見出し内の横方向の結合セルの下に
+\\cmidruleを引き，HTMLではその行を<thead>にする．既定は1）
+
+--backends に python -m common.backends --save で保存したJSONを指定すると，
+そのベンチマークの結果で読み込みバックエンドを選ぶ（各ワーカーでは計測しない）
+
+--workbook を指定した場合はマニフェストの代わりに，ブック内の全シート・名前の定義・
+テーブルを --output-dir に1ファイルずつ書き出す（ブックの解析は1回だけ）
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+if __package__ in (None, ''):
+    # python src/table_latex/batch.py として直接実行された場合
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.backends import load_backend_selection, selected_backends, use_backends
+from table_latex import converter
+from table_latex.converter import TableConversionError
+from table_latex.emitters import check_formats, convert_formats
+from table_latex.preflight import ConversionLimits
+from table_latex.workbook_export import export_workbook
+
+DEFAULT_OPTIONS = {
+    'caption': '表のタイトル',
+    'label': 'tab:data',
+    'position': 'H',
+    'show_value': True,
+    'add_borders': True,
+    'longtable': False,
+    'header_rows': 1,
+}
+LIMIT_KEYS = ('max_cells', 'max_output_bytes', 'max_seconds')
+
+
+def load_manifest(manifest_path):
+    """
+    -> jobs\n
+    - マニフェストを読み込み，defaultsを適用したジョブのリストを返す\n
+    - ジョブのみのリスト形式のマニフェストも受け付ける\n
+    """
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if isinstance(manifest, list):
+        manifest = {'jobs': manifest}
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    defaults = dict(DEFAULT_OPTIONS)
+    defaults.update(manifest.get('defaults', {}))
+
+    jobs = []
+    for index, entry in enumerate(manifest.get('jobs', [])):
+        job = dict(defaults)
+        job.update(entry)
+        job['index'] = index
+        for key in ('file', 'output'):
+            if job.get(key) and not os.path.isabs(job[key]):
+                job[key] = os.path.join(base_dir, job[key])
+        if job.get('formats'):
+            job['formats'] = {output_format: os.path.join(base_dir, path)
+                              for output_format, path in job['formats'].items()}
+        jobs.append(job)
+    return jobs
+
+
+def job_limits(job):
+    """ジョブの上限の指定(max_cells等)からConversionLimitsを作る（指定がなければNone）"""
+    if not any(key in job for key in LIMIT_KEYS):
+        return None
+    return ConversionLimits(**{key: job.get(key) for key in LIMIT_KEYS})
+
+
+def _write_outputs(outputs, texts):
+    """{形式: 出力先} のそれぞれに，その形式の文字列を書き出す"""
+    for output_format, path in outputs.items():
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            text = texts[output_format]
+            f.write(text if text.endswith('\n') else text + '\n')
+
+
+def run_job(job):
+    """
+    -> result\n
+    - 1ジョブを変換し，所要時間とエラー情報を含む辞書を返す（プロセスプールから呼ばれる）\n
+    """
+    result = {
+        'index': job.get('index'),
+        'file': job.get('file'),
+        'sheet': job.get('sheet'),
+        'range': job.get('range'),
+        'output': job.get('output'),
+        'ok': False,
+        'elapsed': 0.0,
+        'error': None,
+    }
+    start = time.perf_counter()
+    try:
+        args = (job.get('file'), job.get('sheet'), job.get('range'),
+                job['caption'], job['label'], job['position'],
+                job['show_value'], job['add_borders'])
+        extra_outputs = job.get('formats') or {}
+        check_formats(extra_outputs)
+        for path in [job.get('output')] + list(extra_outputs.values()):
+            output_dir = os.path.dirname(path) if path else ''
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+        # LaTeX以外の形式は，同じ読み込み結果（キャッシュした表）から続けて出力する
+        convert_args = (job.get('file'), job.get('sheet'), job.get('range'), job['show_value'])
+        convert_options = dict(caption=job['caption'], label=job['label'], position=job['position'],
+                               add_borders=job['add_borders'], header_rows=job['header_rows'],
+                               limits=job_limits(job))
+        if job.get('longtable') and job.get('output'):
+            # 大きな表: 文字列を組み立てず，行ごとにファイルへ書き出す
+            converter.excel_to_latex_file(*args, job['output'], preview_rows=0, limits=job_limits(job))
+            if extra_outputs:
+                _write_outputs(extra_outputs, convert_formats(*convert_args, list(extra_outputs), **convert_options))
+        else:
+            texts = convert_formats(*convert_args, ['latex'] + list(extra_outputs), **convert_options)
+            _write_outputs(extra_outputs, texts)
+            latex_code = texts['latex']
+            if job.get('output'):
+                with open(job['output'], 'w', encoding='utf-8') as f:
+                    f.write(latex_code + '\n')
+            else:
+                result['latex'] = latex_code
+        result['ok'] = True
+    except TableConversionError as e:
+        result['error'] = e.to_dict()
+    except Exception as e:
+        # 想定外のエラーでもバッチ全体は止めない
+        result['error'] = {
+            'type': type(e).__name__,
+            'title': 'エラー',
+            'severity': 'critical',
+            'message': str(e),
+        }
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+
+def run_batch(jobs, max_workers=None):
+    """
+    -> results\n
+    - ジョブをプロセスプールで並列変換する（max_workers=1 の場合は逐次実行）\n
+    - 結果はジョブの順番で返す\n
+    """
+    if max_workers == 1 or len(jobs) <= 1:
+        return [run_job(job) for job in jobs]
+    # 親プロセスで指定したバックエンドの選択をワーカーにも使わせる
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=use_backends,
+                             initargs=(selected_backends(),)) as executor:
+        return list(executor.map(run_job, jobs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="マニフェストに列挙したExcelの範囲をLaTeXの表に一括変換します")
+    parser.add_argument('manifest', nargs='?', help="ジョブを記述したJSONファイル")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="並列プロセス数（既定: CPUコア数）")
+    parser.add_argument('--report', help="JSONレポートの出力先（既定: 標準出力）")
+    parser.add_argument('--workbook', help="ブック全体（全シート・名前の定義・テーブル）を一括変換する")
+    parser.add_argument('--output-dir', default='.', help="--workbook の出力先フォルダ（既定: カレント）")
+    parser.add_argument('--backends', help="python -m common.backends --save で保存したバックエンドの選択(JSON)")
+    args = parser.parse_args(argv)
+    if bool(args.manifest) == bool(args.workbook):
+        parser.error("manifest と --workbook のどちらか一方を指定してください")
+    if args.backends:
+        load_backend_selection(args.backends)
+
+    start = time.perf_counter()
+    if args.workbook:
+        try:
+            results = export_workbook(
+                args.workbook, args.output_dir, DEFAULT_OPTIONS['position'],
+                DEFAULT_OPTIONS['show_value'], DEFAULT_OPTIONS['add_borders'],
+                max_workers=args.jobs)
+        except TableConversionError as e:
+            print(f"NG  {args.workbook}  {e.message}", file=sys.stderr)
+            return 1
+        for result in results:
+            result['file'] = args.workbook
+    else:
+        jobs = load_manifest(args.manifest)
+        results = run_batch(jobs, max_workers=args.jobs)
+    total = time.perf_counter() - start
+
+    for result in results:
+        status = "OK " if result['ok'] else "NG "
+        target = f"{result['file']}:{result['sheet']}!{result['range']}"
+        if result['ok']:
+            message = result['output'] or ''
+        else:
+            message = result['error']['message'].splitlines()[0]
+        print(f"{status} {result['elapsed']:8.3f}s  {target}  {message}", file=sys.stderr)
+
+    failed = sum(1 for result in results if not result['ok'])
+    print(f"{len(results) - failed}/{len(results)} 件成功 ({total:.3f}s)", file=sys.stderr)
+
+    report = {'elapsed': total, 'failed': failed, 'results': results}
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
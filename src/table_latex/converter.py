@@ -0,0 +1,429 @@
+"""
+Qt非依存のExcel→LaTeX表変換エンジン\n
+- GUI(TableLatexTab)とコマンドライン(batch)の両方から使用する\n
+- エラーはダイアログではなく TableConversionError として送出する\n
+"""
+import numpy as np
+from openpyxl.utils import column_index_from_string
+
+from common.cache import workbook_cache
+from common.latex_escape import latex_cell_value
+from common.merges import MERGE_EDGE, MERGE_ORIGIN, NORMAL, cell_status, label_grid
+from common.reader import get_table_blocks, read_sheet_range
+from common.used_range import bounding_range
+from table_latex.preflight import estimate_conversion
+
+
+class TableConversionError(Exception):
+    """
+    変換失敗を表す例外\n
+    - title: ダイアログのタイトル\n
+    - severity: 'critical' または 'warning'（GUIでのダイアログ種別）\n
+    """
+
+    def __init__(self, message, title="エラー", severity="critical"):
+        super().__init__(message)
+        self.message = message
+        self.title = title
+        self.severity = severity
+
+    def to_dict(self):
+        """構造化エラー（バッチ処理のレポート用）"""
+        return {
+            'type': type(self).__name__,
+            'title': self.title,
+            'severity': self.severity,
+            'message': self.message,
+        }
+
+
+class WorkbookLoadError(TableConversionError):
+    """Excelファイル・シートの読み込み失敗"""
+
+
+class RangeFormatError(TableConversionError):
+    """セル範囲の指定ミス"""
+
+    def __init__(self, message):
+        super().__init__(message, title="警告", severity="warning")
+
+
+class RangeTooLargeError(TableConversionError):
+    """
+    範囲が変換の上限を超えている（読み込みを始める前に検出する）\n
+    - estimate: ConversionEstimate，reasons: 超えた上限の説明のリスト\n
+    """
+
+    def __init__(self, estimate, reasons):
+        message = "指定した範囲が大きすぎるため，変換を開始しませんでした\n" + '\n'.join(reasons)
+        super().__init__(message, title="範囲が大きすぎます", severity="warning")
+        self.estimate = estimate
+        self.reasons = reasons
+
+    def to_dict(self):
+        result = super().to_dict()
+        result['estimate'] = self.estimate.to_dict()
+        return result
+
+
+class ConversionCancelled(TableConversionError):
+    """利用者による変換の中止"""
+
+    def __init__(self, message="変換を中止しました"):
+        super().__init__(message, title="中止", severity="warning")
+
+
+PROGRESS_ROW_INTERVAL = 500  # LaTeX生成中に進捗を通知する行数の間隔
+PREVIEW_ROWS = 50            # ファイルに直接出力する場合に画面に表示する行数
+AUTO_RANGE = 'auto'          # セル範囲の代わりに指定すると，シートの使用範囲を自動検出する
+
+
+def _report(progress, stage, fraction):
+    """
+    進捗を通知する（progressがNoneなら何もしない）\n
+    - stage: 'check'(規模の見積もり)，'load'(読み込み)，'merge'(結合セルの解析)，'emit'(LaTeX生成)\n
+    - progressがConversionCancelledを送出すると，変換はそこで中止される\n
+    """
+    if progress is not None:
+        progress(stage, fraction)
+
+
+def parse_cell_range(cell_range):
+    """
+    -> min_row, max_row, min_col, max_col\n
+    - 「A1:E6」形式のセル範囲を1始まりの行列番号に変換する\n
+    """
+    if not cell_range:
+        raise RangeFormatError("セル範囲を指定してください")
+    try:
+        start_cell, end_cell = cell_range.split(':')
+        start_col_letter = ''.join(filter(str.isalpha, start_cell))
+        start_row = int(''.join(filter(str.isdigit, start_cell)))
+        end_col_letter = ''.join(filter(str.isalpha, end_cell))
+        end_row = int(''.join(filter(str.isdigit, end_cell)))
+        start_col = column_index_from_string(start_col_letter)
+        end_col = column_index_from_string(end_col_letter)
+    except Exception as e:
+        raise RangeFormatError(f"範囲の形式が正しくありません: {cell_range}\nエラー: {e}\n表にしたい範囲の左上のセルと右下のセルを指定してください.\n例: A1:E6")
+    return start_row, end_row, start_col, end_col
+
+
+def resolve_merges(grid):
+    """
+    -> owners\n
+    - 各セル（相対座標）を含む結合セルの番号（grid.merged_rangesの添字），結合していなければ-1（int32の配列）\n
+    """
+    return label_grid(grid.merged_ranges, grid.min_row, grid.max_row, grid.min_col, grid.max_col)
+
+
+def border_line_commands(owners):
+    """
+    -> 各行の末尾に付ける罫線コマンド(\\hline, \\cline, 空文字列)のリスト\n
+    - 「下のセルが同じ結合セルの続き」を範囲全体のブール行列として一度に求め，\n
+      行ごとに下線を引ける列の連続区間(ランレングス)から\\clineを組み立てる\n
+    """
+    owner = np.asarray(owners, dtype=np.int32).reshape(len(owners), -1)
+    num_rows, num_cols = owner.shape
+    lines = ["\\hline"] * num_rows # 末行と，結合セルが下に続かない行は\hline
+    if num_rows < 2:
+        return lines
+
+    continuation_below = (owner[1:] == owner[:-1]) & (owner[1:] >= 0)
+    # 下線を引いて良い列の区間の開始・終了を全行まとめて求める（LaTeX換算で1始まり）
+    allowed = np.zeros((num_rows - 1, num_cols + 2), dtype=np.int8)
+    allowed[:, 1:-1] = ~continuation_below
+    edges = np.diff(allowed, axis=1)
+    start_rows, start_cols = np.nonzero(edges == 1)
+    end_cols = np.nonzero(edges == -1)[1]
+
+    needs_cline = continuation_below.any(axis=1)
+    for r in np.flatnonzero(needs_cline).tolist():
+        lines[r] = ""  # 全列が結合セルの続きなら罫線なし
+    for r, start, end in zip(start_rows.tolist(), (start_cols + 1).tolist(), end_cols.tolist()):
+        if needs_cline[r]:
+            cline = f"\\cline{{{start}-{end}}}"
+            lines[r] = f"{lines[r]} {cline}" if lines[r] else cline
+    return lines
+
+
+def load_table_blocks(excel_file, sheet_name, progress=None):
+    """
+    -> [(min_row, max_row, min_col, max_col), ...]\n
+    - シートの表ブロックを検出する（結果はキャッシュされる）\n
+    - 画面側の範囲の自動検出もConversionWorkerからこれを呼ぶ\n
+    """
+    _report(progress, 'load', 0.0)
+    try:
+        return get_table_blocks(excel_file, sheet_name)
+    except Exception as e:
+        raise WorkbookLoadError(f"Excelファイルの読み込みに失敗しました: {e}")
+
+
+def _grid_bounds(excel_file, sheet_name, cell_range, progress=None):
+    """
+    -> (min_row, max_row, min_col, max_col)\n
+    - AUTO_RANGE('auto')はシートの使用範囲（表ブロックの検出結果はキャッシュされる）\n
+    """
+    auto = isinstance(cell_range, str) and cell_range.strip().lower() == AUTO_RANGE
+    if not auto:
+        return parse_cell_range(cell_range)
+    used_range = bounding_range(load_table_blocks(excel_file, sheet_name, progress))
+    if used_range is None:
+        raise RangeFormatError("シートに値のあるセルが見つかりませんでした")
+    return used_range
+
+
+def _read_grid(excel_file, sheet_name, bounds, show_value, progress=None, limits=None):
+    """範囲(bounds)のSheetGridを読み込む（limitsを超える場合は読み込む前にRangeTooLargeError）"""
+    min_row, max_row, min_col, max_col = bounds
+    _report(progress, 'load', 0.0)
+    try:
+        if limits is not None:
+            _report(progress, 'check', 0.0)
+            estimate = estimate_conversion(excel_file, sheet_name, min_row, max_row, min_col, max_col)
+            reasons = limits.exceeded(estimate)
+            if reasons:
+                raise RangeTooLargeError(estimate, reasons)
+            _report(progress, 'load', 0.0)
+        # 範囲内の行と，範囲に重なる結合セルだけをストリーミングで読み込む
+        return read_sheet_range(excel_file, sheet_name, min_row, max_row, min_col, max_col,
+                                data_only=show_value, progress=progress)
+    except TableConversionError:
+        raise
+    except Exception as e:
+        raise WorkbookLoadError(f"Excelファイルの読み込みに失敗しました: {e}")
+
+
+def load_grid(excel_file, sheet_name, cell_range, show_value, progress=None, limits=None):
+    """
+    セル範囲の指定を解釈し，範囲のSheetGridを読み込む\n
+    - cell_rangeが AUTO_RANGE('auto') の場合はシートの使用範囲を検出して使う\n
+    - limits(ConversionLimits)を指定すると，読み込む前に規模を見積もり，上限を超えればRangeTooLargeErrorを送出する\n
+    """
+    bounds = _grid_bounds(excel_file, sheet_name, cell_range, progress)
+    return _read_grid(excel_file, sheet_name, bounds, show_value, progress, limits)
+
+
+class TableModel:
+    """
+    読み込み・結合セル解決済みの表（変換オプションに依らない部分）\n
+    - grid: SheetGrid，owners: 結合セルの番号(int32)，status: セルの状態(int8)\n
+    - 罫線の位置と，値のLaTeX文字列は初めて必要になったときに求めて保持する\n
+    - キャプション・ラベル・位置・罫線の有無を変えても，render()で文字列を作り直すだけでよい\n
+    """
+
+    def __init__(self, grid, progress=None):
+        _report(progress, 'merge', 0.0)
+        self.grid = grid
+        self.owners = resolve_merges(grid) # 相対座標 -> 結合セルの番号(-1:通常セル)
+        self.status = cell_status(self.owners, grid.merged_ranges, grid.min_row, grid.min_col) # 通常/左上/左端/それ以外
+        self._line_commands = None # 各行末の\hline，\cline（罫線ありで初めて出力するときに求める）
+        self._general_texts = [None] * len(grid.rows.pool) # 値の番号 -> 表示形式GeneralでのLaTeX
+
+    def line_commands(self):
+        if self._line_commands is None:
+            self._line_commands = border_line_commands(self.owners)
+        return self._line_commands
+
+    def nbytes(self):
+        """推定メモリ量（値はgridと共有するので，結合セル・罫線の構造と値の文字列の分）"""
+        return self.owners.nbytes + self.status.nbytes + len(self._general_texts) * 64 + self.grid.num_rows * 16
+
+    def render(self, caption, label, position, add_borders=True, progress=None, longtable=False):
+        return "\n".join(line for _, line in self.iter_typed_lines(caption, label, position, add_borders,
+                                                                    progress, longtable))
+
+    def iter_typed_lines(self, caption, label, position, add_borders=True, progress=None, longtable=False):
+        """(種別, 行) を生成する（種別は 'head', 'row', 'foot'）"""
+        grid = self.grid
+        min_row, max_row = grid.min_row, grid.max_row
+        min_col, max_col = grid.min_col, grid.max_col
+        merged_ranges = grid.merged_ranges # 範囲に重なる結合セル(絶対座標)
+        owners = self.owners
+        status = self.status
+        cells = grid.rows
+        pool = cells.pool.values
+        general_texts = self._general_texts # 同じ値は1回だけ変換する
+
+        num_rows = grid.num_rows
+        num_cols = grid.num_cols
+
+        col_count = num_cols
+        col_format = "|" + "|".join(["c"] * col_count) + "|" if add_borders else "c" * col_count
+
+        # LaTeX表の生成
+        if longtable:
+            yield 'head', f"\\begin{{longtable}}{{{col_format}}}"
+            yield 'head', f"    \\caption{{{caption}}}\\label{{{label}}} \\\\"
+        else:
+            yield 'head', f"\\begin{{table}}[{position}]"
+            yield 'head', "    \\centering"
+            yield 'head', f"    \\caption{{{caption}}}"
+            yield 'head', f"    \\label{{{label}}}"
+            yield 'head', f"    \\begin{{tabular}}{{{col_format}}}"
+        if add_borders:
+            yield 'head', "      \\hline"
+
+        border_str = "{|c|}" if add_borders else "{c}"
+        line_commands = self.line_commands() if add_borders else None # 各行末の\hline，\cline
+
+        # 各行のLaTeXコード生成
+        for r in range(num_rows):
+            if r % PROGRESS_ROW_INTERVAL == 0:
+                _report(progress, 'emit', r / num_rows)
+            cells_in_row = [] #cline,hline含め1行ずつ処理
+            status_row = status[r].tolist()
+            code_row = cells.codes[r].tolist()
+            format_row = cells.format_row(r) if cells.format_codes is not None else None
+            owner_row = owners[r].tolist() if merged_ranges else None
+            r_abs = r + min_row
+            col = 0
+            while col < num_cols:
+                state = status_row[col]
+                if state == NORMAL or state == MERGE_ORIGIN:
+                    code = code_row[col]
+                    number_format = format_row[col] if format_row is not None else None
+                    if number_format is None:
+                        value = general_texts[code]
+                        if value is None:
+                            value = general_texts[code] = latex_cell_value(pool[code])
+                    else:
+                        value = latex_cell_value(pool[code], number_format)
+                    if state == NORMAL: # 通常のセル
+                        cells_in_row.append(value)
+                        col += 1
+                        continue
+
+                if state == MERGE_ORIGIN: # 結合セルの左上
+                    m_min_r, m_min_c, m_max_r, m_max_c = merged_ranges[owner_row[col]]
+                    c_abs = col + min_col
+                    # 選択範囲で切り詰めたスパン
+                    eff_rowspan = min(m_max_r, max_row) - r_abs + 1
+                    eff_colspan = min(m_max_c, max_col) - c_abs + 1
+
+                    row_cmd = f"\\multirow{{{eff_rowspan}}}{{*}}" if eff_rowspan > 1 else ""
+                    col_cmd_start = f"\\multicolumn{{{eff_colspan}}}{border_str}" if eff_colspan > 1 else "" #ex) \multicolumn{3}{|c|}
+
+                    content = f"{row_cmd}{{{value}}}" if row_cmd else value #ex) \multirow{3}{*}{値}
+                    full_cmd = f"{col_cmd_start}{{{content}}}" if col_cmd_start else content
+                    cells_in_row.append(full_cmd)
+
+                    col += eff_colspan # スパン分列カウントを進める
+                elif state == MERGE_EDGE: # 結合セルの続きで，選択範囲内での左端の列
+                    # 現座標とlast_col含むセルのスパン
+                    segment_colspan = min(merged_ranges[owner_row[col]][3], max_col) - (col + min_col) + 1
+                    if segment_colspan > 1:
+                        cells_in_row.append(f"\\multicolumn{{{segment_colspan}}}{border_str}{{}}")
+                        col += segment_colspan
+                    else:
+                        cells_in_row.append("")
+                        col += 1
+                else:
+                    col += 1
+
+            row_str = f"      {' & '.join(cells_in_row)} \\\\" # 一行分のLaTeXコード最終
+
+            line_command = line_commands[r] if add_borders else ""
+            if line_command:
+                row_str += f" {line_command}"
+
+            yield 'row', row_str
+            # --- 罫線処理終了 ---
+
+        # 表の終了 (最後のhlineはループ内で処理される)
+        if longtable:
+            yield 'foot', "\\end{longtable}"
+        else:
+            yield 'foot', "    \\end{tabular}"
+            yield 'foot', "\\end{table}"
+
+
+def _table_model(grid):
+    """SheetGridならTableModelを作る（TableModelはそのまま使う）"""
+    return grid if isinstance(grid, TableModel) else TableModel(grid)
+
+
+def load_table_model(excel_file, sheet_name, cell_range, show_value, progress=None, cache=workbook_cache,
+                     limits=None):
+    """
+    -> TableModel\n
+    - ファイル・シート・範囲・値の表示モードが同じ間はキャッシュの表を再利用する\n
+      （罫線・位置・キャプション・ラベルを変えただけなら，読み込みも結合セルの解決もしない）\n
+    - ファイルが更新されるとキャッシュ側で破棄される\n
+    """
+    # 範囲の解釈だけを先に行い，キャッシュにあれば読み込み・規模の見積もりもしない
+    bounds = _grid_bounds(excel_file, sheet_name, cell_range, progress)
+
+    def load():
+        return TableModel(_read_grid(excel_file, sheet_name, bounds, show_value, progress, limits), progress)
+
+    if cache is None:
+        return load()
+    try:
+        return cache.get(excel_file, show_value, 'table_model', load, extra=(sheet_name,) + tuple(bounds),
+                         sizeof=lambda model: model.nbytes())
+    except OSError as e: # 選択後にファイルが移動・削除された場合（キャッシュのキーを作るstatで失敗）
+        raise WorkbookLoadError(f"Excelファイルの読み込みに失敗しました: {e}")
+
+
+def excel_to_latex_universal(excel_file, sheet_name, cell_range, caption, label,
+                             position, show_value, add_borders=True, progress=None, limits=None):
+    """
+    ExcelをLaTeXの表形式に変換する\n
+    - progress(stage, fraction): 段階ごとの進捗通知（バックグラウンド実行時の表示・中止用）\n
+    - limits: 変換を始めてよい規模の上限（ConversionLimits，Noneなら見積もらない）\n
+    """
+    model = load_table_model(excel_file, sheet_name, cell_range, show_value, progress, limits=limits)
+    return model.render(caption, label, position, add_borders, progress)
+
+
+def excel_to_latex_file(excel_file, sheet_name, cell_range, caption, label, position, show_value,
+                        add_borders, output_path, longtable=True, preview_rows=PREVIEW_ROWS, progress=None,
+                        limits=None):
+    """
+    -> プレビュー用のLaTeXコード\n
+    - 大きな範囲向け: LaTeXコードを1行ずつファイルに書き出す（既定はlongtable環境）\n
+    """
+    model = load_table_model(excel_file, sheet_name, cell_range, show_value, progress, limits=limits)
+    try:
+        return write_latex_file(output_path, model, caption, label, position, add_borders, progress,
+                                longtable, preview_rows)
+    except OSError as e:
+        raise TableConversionError(f"出力ファイルに書き込めません: {e}")
+
+
+def render_grid(grid, caption, label, position, add_borders=True, progress=None, longtable=False):
+    """読み込み済みのSheetGrid（またはTableModel）をLaTeXの表形式に変換する"""
+    return _table_model(grid).render(caption, label, position, add_borders, progress, longtable)
+
+
+def write_latex_file(output_path, grid, caption, label, position, add_borders=True, progress=None,
+                     longtable=True, preview_rows=PREVIEW_ROWS):
+    """
+    -> プレビュー用のLaTeXコード（先頭preview_rows行と表の終わり）\n
+    - 行を生成しながらファイルに書き出すので，表全体の文字列をメモリ上に作らない\n
+    - gridはSheetGridまたはTableModel\n
+    """
+    preview, footer = [], []
+    rows_written = 0
+    lines = _table_model(grid).iter_typed_lines(caption, label, position, add_borders, progress, longtable)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        if longtable:
+            f.write("% 注意: \\usepackage{longtable} と \\usepackage{multirow} が必要です\n")
+        for line_type, line in lines:
+            f.write(line)
+            f.write('\n')
+            if line_type == 'row':
+                rows_written += 1
+                if rows_written > preview_rows:
+                    continue
+            (footer if line_type == 'foot' else preview).append(line)
+    if rows_written > preview_rows:
+        preview.append(f"      % ... 以降の{rows_written - preview_rows}行は省略（全体は {output_path} に出力しました）")
+    return "\n".join(preview + footer)
+
+
+def iter_latex_lines(grid, caption, label, position, add_borders=True, progress=None, longtable=False):
+    """LaTeXコードを1行ずつ生成する（longtable=True で複数ページにまたがるlongtable環境）"""
+    for _, line in _table_model(grid).iter_typed_lines(caption, label, position, add_borders, progress, longtable):
+        yield line
@@ -0,0 +1,253 @@
+"""
+1つの表(TableModel)からの複数形式の出力\n
+- 読み込み・結合セル解決済みの表から，LaTeX(tabular / booktabs)・Markdown・HTML・CSVを生成する\n
+- セルの文字列は表示形式を適用したエスケープ前の文字列を共通で求め，各形式がそれぞれの規則でエスケープする\n
+- ブックの読み込みは1回だけで，すべての形式を続けて出力できる（load_table_modelのキャッシュも共有する）\n
+"""
+import csv
+import html
+import io
+
+from common.latex_escape import escape_latex, format_cell_value
+from table_latex.converter import RangeFormatError, _table_model, load_table_model
+
+OUTPUT_FORMATS = ('latex', 'booktabs', 'markdown', 'html', 'csv')
+FORMAT_EXTENSIONS = {'latex': '.tex', 'booktabs': '.tex', 'markdown': '.md', 'html': '.html', 'csv': '.csv'}
+HEADER_ROW_FORMATS = ('booktabs', 'html')  # 見出しの行数(header_rows)を使う形式
+
+
+def cell_rows(model):
+    """
+    -> 行ごとの [(相対行, 相対列, 文字列, 行数, 列数), ...]\n
+    - 結合セルは範囲で切り詰めた矩形の左上に1つだけ置き，覆われるセルは含めない\n
+    - 結合セルの左上が範囲外にある場合は空文字列にする（LaTeXの出力と同じ）\n
+    - 文字列はエスケープ前（表示形式を適用済み）\n
+    """
+    grid = model.grid
+    cells = grid.rows
+    pool = cells.pool.values
+    num_rows, num_cols = grid.num_rows, grid.num_cols
+
+    anchors = {}  # (相対行, 相対列) -> (行数, 列数, 左上が範囲内か)
+    for m_min_r, m_min_c, m_max_r, m_max_c in grid.merged_ranges:
+        top, left = max(m_min_r, grid.min_row), max(m_min_c, grid.min_col)
+        bottom, right = min(m_max_r, grid.max_row), min(m_max_c, grid.max_col)
+        anchors[top - grid.min_row, left - grid.min_col] = (
+            bottom - top + 1, right - left + 1, (top, left) == (m_min_r, m_min_c))
+    merged = (model.owners >= 0).tolist()
+
+    texts = {}  # 値の番号 -> 表示形式Generalでの文字列（同じ値は1回だけ変換する）
+    rows = []
+    for r in range(num_rows):
+        code_row = cells.codes[r].tolist()
+        format_row = cells.format_row(r) if cells.format_codes is not None else None
+        merged_row = merged[r]
+        row = []
+        for c in range(num_cols):
+            rowspan = colspan = 1
+            if merged_row[c]:
+                anchor = anchors.get((r, c))
+                if anchor is None:
+                    continue  # 結合セルに覆われたセル
+                rowspan, colspan, has_origin = anchor
+                if not has_origin:
+                    row.append((r, c, "", rowspan, colspan))
+                    continue
+            code = code_row[c]
+            number_format = format_row[c] if format_row is not None else None
+            if number_format is None:
+                text = texts.get(code)
+                if text is None:
+                    text = texts[code] = format_cell_value(pool[code])
+            else:
+                text = format_cell_value(pool[code], number_format)
+            row.append((r, c, text, rowspan, colspan))
+        rows.append(row)
+    return rows
+
+
+def _covered_columns(rows, num_rows):
+    """
+    -> 行ごとの {列: 列数}\n
+    - 上の行から縦に続く結合セルが，その行で覆う列（区切りの位置を揃えるために使う）\n
+    """
+    covered = [dict() for _ in range(num_rows)]
+    for row in rows:
+        for r, c, _, rowspan, colspan in row:
+            for below in range(r + 1, r + rowspan):
+                covered[below][c] = colspan
+    return covered
+
+
+def emit_latex(model, caption, label, position, add_borders=True, **_):
+    """tabular形式（画面・ファイル出力と同じ）"""
+    return model.render(caption, label, position, add_borders)
+
+
+def emit_booktabs(model, caption, label, position, header_rows=1, rows=None, **_):
+    """
+    booktabsの罫線(\\toprule, \\midrule, \\bottomrule)による表\n
+    - 縦罫線は引かない．header_rows行目の下に\\midrule，見出し内の横方向の結合セルの下に\\cmidruleを引く\n
+    - \\usepackage{booktabs}と\\usepackage{multirow}が必要\n
+    """
+    rows = rows if rows is not None else cell_rows(model)
+    num_rows = len(rows)
+    covered = _covered_columns(rows, num_rows)
+    lines = [
+        f"\\begin{{table}}[{position}]",
+        "    \\centering",
+        f"    \\caption{{{caption}}}",
+        f"    \\label{{{label}}}",
+        f"    \\begin{{tabular}}{{{'c' * model.grid.num_cols}}}",
+        "      \\toprule",
+    ]
+    for r, row in enumerate(rows):
+        parts = []
+        anchors = {c: (text, rowspan, colspan) for _, c, text, rowspan, colspan in row}
+        c = 0
+        while c < model.grid.num_cols:
+            if c in covered[r]:
+                colspan = covered[r][c]
+                parts.append(f"\\multicolumn{{{colspan}}}{{c}}{{}}" if colspan > 1 else "")
+                c += colspan
+                continue
+            text, rowspan, colspan = anchors.get(c, ("", 1, 1))
+            content = escape_latex(text)
+            if rowspan > 1:
+                content = f"\\multirow{{{rowspan}}}{{*}}{{{content}}}"
+            if colspan > 1:
+                content = f"\\multicolumn{{{colspan}}}{{c}}{{{content}}}"
+            parts.append(content)
+            c += colspan
+        lines.append(f"      {' & '.join(parts)} \\\\")
+        if r + 1 < header_rows and r + 1 < num_rows:
+            rules = [f"\\cmidrule(lr){{{c + 1}-{c + colspan}}}"
+                     for _, c, _, rowspan, colspan in row if colspan > 1 and rowspan == 1]
+            if rules:
+                lines.append(f"      {' '.join(rules)}")
+        elif r + 1 == header_rows and r + 1 < num_rows:
+            lines.append("      \\midrule")
+    lines += [
+        "      \\bottomrule",
+        "    \\end{tabular}",
+        "\\end{table}",
+    ]
+    return "\n".join(lines)
+
+
+def _markdown_text(text):
+    return text.replace('\\', '\\\\').replace('|', '\\|').replace('\r\n', '<br>').replace('\n', '<br>')
+
+
+def emit_markdown(model, rows=None, **_):
+    """
+    Markdown(GitHub Flavored)の表\n
+    - 先頭行を見出しにする．Markdownの表は結合できないので，結合セルの値は左上のセルにだけ入れる\n
+    """
+    num_cols = model.grid.num_cols
+    lines = []
+    for r, row in enumerate(rows if rows is not None else cell_rows(model)):
+        values = [""] * num_cols
+        for _, c, text, _, _ in row:
+            values[c] = _markdown_text(text)
+        lines.append(f"| {' | '.join(values)} |")
+        if r == 0:
+            lines.append(f"|{'|'.join([':---:'] * num_cols)}|")
+    return "\n".join(lines)
+
+
+def emit_html(model, caption="", header_rows=1, rows=None, **_):
+    """
+    HTMLの<table>\n
+    - 結合セルはrowspan・colspanで表す．header_rows行を<thead>の<th>にする\n
+    """
+    lines = ["<table>"]
+    if caption:
+        lines.append(f"  <caption>{html.escape(caption)}</caption>")
+    rows = rows if rows is not None else cell_rows(model)
+    for r, row in enumerate(rows):
+        if r == 0 and header_rows > 0:
+            lines.append("  <thead>")
+        if r == header_rows:
+            lines.append("  <tbody>")
+        tag = 'th' if r < header_rows else 'td'
+        cells = []
+        for _, _, text, rowspan, colspan in row:
+            spans = (f' rowspan="{rowspan}"' if rowspan > 1 else "") + (f' colspan="{colspan}"' if colspan > 1 else "")
+            cells.append(f"<{tag}{spans}>{html.escape(text).replace(chr(10), '<br>')}</{tag}>")
+        lines.append(f"    <tr>{''.join(cells)}</tr>")
+        if r + 1 == header_rows:
+            lines.append("  </thead>")
+    if len(rows) > header_rows:
+        lines.append("  </tbody>")
+    elif 0 < len(rows) < header_rows:
+        lines.append("  </thead>")
+    lines.append("</table>")
+    return "\n".join(lines)
+
+
+def emit_csv(model, rows=None, **_):
+    """CSV（表示形式を適用した文字列．結合セルの値は左上のセルにだけ入れる）"""
+    num_cols = model.grid.num_cols
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator='\n')
+    for row in rows if rows is not None else cell_rows(model):
+        values = [""] * num_cols
+        for _, c, text, _, _ in row:
+            values[c] = text
+        writer.writerow(values)
+    return output.getvalue()
+
+
+def check_formats(output_formats):
+    """対応していない出力形式があればRangeFormatErrorを送出する"""
+    unknown = [output_format for output_format in output_formats if output_format not in EMITTERS]
+    if unknown:
+        raise RangeFormatError(f"出力形式 {', '.join(map(repr, unknown))} には対応していません\n"
+                               f"対応している形式: {', '.join(OUTPUT_FORMATS)}")
+
+
+EMITTERS = {
+    'latex': emit_latex,
+    'booktabs': emit_booktabs,
+    'markdown': emit_markdown,
+    'html': emit_html,
+    'csv': emit_csv,
+}
+
+
+def emit_all(model, output_formats, caption="", label="", position="H", add_borders=True, header_rows=1):
+    """
+    -> {出力形式: 文字列}\n
+    - model: TableModel（SheetGridも可．dataframe_to_gridなどで作った表もそのまま渡せる）\n
+    - output_formats: OUTPUT_FORMATS の中の形式のリスト．セルの文字列は1回だけ求めて各形式で共有する\n
+    """
+    check_formats(output_formats)
+    model = _table_model(model)
+    rows = cell_rows(model) if any(output_format != 'latex' for output_format in output_formats) else None
+    return {output_format: EMITTERS[output_format](model, caption=caption, label=label, position=position,
+                                                   add_borders=add_borders, header_rows=header_rows, rows=rows)
+            for output_format in output_formats}
+
+
+def emit(model, output_format, caption="", label="", position="H", add_borders=True, header_rows=1):
+    """-> output_format形式の文字列（引数はemit_allを参照）"""
+    return emit_all(model, [output_format], caption, label, position, add_borders, header_rows)[output_format]
+
+
+def convert_formats(excel_file, sheet_name, cell_range, show_value, output_formats, caption="", label="",
+                    position="H", add_borders=True, header_rows=1, progress=None, limits=None):
+    """
+    -> {出力形式: 文字列}\n
+    - ブックを1回だけ読み込み，指定したすべての形式で出力する\n
+    """
+    check_formats(output_formats)
+    model = load_table_model(excel_file, sheet_name, cell_range, show_value, progress, limits=limits)
+    return emit_all(model, output_formats, caption, label, position, add_borders, header_rows)
+
+
+def convert_table(excel_file, sheet_name, cell_range, caption, label, position, show_value, add_borders=True,
+                  output_format='latex', header_rows=1, progress=None, limits=None):
+    """excel_to_latex_universalと同じ引数で，output_format形式の文字列を返す（GUIのワーカー用）"""
+    return convert_formats(excel_file, sheet_name, cell_range, show_value, [output_format], caption, label,
+                           position, add_borders, header_rows, progress=progress, limits=limits)[output_format]
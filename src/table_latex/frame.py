@@ -0,0 +1,203 @@
+"""
+DataFrame・2次元配列からの表変換\n
+- メモリ上の表をExcelファイルを経由せずにSheetGridに詰め，ファイルからの変換と同じLaTeXコードを生成する\n
+- 値は列ごとにまとめて変換し，列ごとの表示形式（Excelの書式記号）で文字列化する\n
+- pandasはimportせず，DataFrame・Seriesのメソッド(columns, tolist, isnaなど)だけを使う\n
+"""
+from datetime import date, datetime
+
+from common.cell_values import CellValues
+from common.merges import label_grid
+from common.reader import SheetGrid
+from table_latex.converter import RangeFormatError, TableModel, parse_cell_range
+
+# pandasのto_excelが日付・日時の列に付ける表示形式（ファイル経由で変換した場合と同じ表示にする）
+DATE_FORMAT = 'YYYY-MM-DD'
+DATETIME_FORMAT = 'YYYY-MM-DD HH:MM:SS'
+
+
+def _column_values(column):
+    """
+    -> 値のリスト（欠損値はNone）\n
+    - column: Series・numpyの1次元配列・リスト\n
+    """
+    if hasattr(column, 'isna'):  # pandasのSeries
+        values = column.tolist()
+        missing = column.isna().tolist()
+        if any(missing):
+            values = [None if is_missing else value for value, is_missing in zip(values, missing)]
+        return values
+    kind = getattr(getattr(column, 'dtype', None), 'kind', None)
+    if kind == 'M':
+        column = column.astype('datetime64[us]')  # tolist()でdatetimeになる単位に揃える（NaTはNone）
+    elif kind == 'm':
+        column = column.astype('timedelta64[us]')
+    values = column.tolist() if hasattr(column, 'tolist') else list(column)
+    # NaN（自身と等しくない値）は空セルにする
+    return [None if isinstance(value, float) and value != value else value for value in values]
+
+
+def _default_formats(values):
+    """
+    -> [(行, 表示形式), ...]\n
+    - 表示形式の指定がない列の日付・日時に，ファイル経由の場合と同じ表示形式を付ける\n
+    """
+    formats = []
+    for r, value in enumerate(values):
+        if isinstance(value, datetime):
+            formats.append((r, DATETIME_FORMAT))
+        elif isinstance(value, date):
+            formats.append((r, DATE_FORMAT))
+    return formats
+
+
+def _merged_ranges(merges, num_rows, num_cols):
+    """
+    -> [(min_row, min_col, max_row, max_col), ...]（SheetGridと同じ1始まりの座標）\n
+    - merges: (先頭行, 先頭列, 末尾行, 末尾列)（0始まり，末尾を含む）または「A1:B2」形式の文字列\n
+    """
+    ranges = []
+    for merge in merges:
+        if isinstance(merge, str):
+            min_row, max_row, min_col, max_col = parse_cell_range(merge)
+        else:
+            try:
+                first_row, first_col, last_row, last_col = (int(position) for position in merge)
+            except (TypeError, ValueError):
+                raise RangeFormatError(f"結合セルの指定が正しくありません: {merge!r}\n"
+                                       "(先頭行, 先頭列, 末尾行, 末尾列) または「A1:B2」の形式で指定してください")
+            min_row, max_row, min_col, max_col = first_row + 1, last_row + 1, first_col + 1, last_col + 1
+        if not (1 <= min_row <= max_row <= num_rows and 1 <= min_col <= max_col <= num_cols):
+            raise RangeFormatError(f"結合セル {merge!r} が表（{num_rows}行 × {num_cols}列）の外にあります")
+        ranges.append((min_row, min_col, max_row, max_col))
+
+    if ranges:
+        owners = label_grid(ranges, 1, num_rows, 1, num_cols)
+        area = sum((m_max_r - m_min_r + 1) * (m_max_c - m_min_c + 1) for m_min_r, m_min_c, m_max_r, m_max_c in ranges)
+        if int((owners >= 0).sum()) != area:
+            raise RangeFormatError("結合セルの指定が互いに重なっています")
+    return ranges
+
+
+def _build_grid(columns, num_rows, header_rows, merges, column_formats):
+    """
+    -> SheetGrid（A1から始まる表）\n
+    - columns: 列ごとの値（ヘッダーの下に入る部分）\n
+    - header_rows: ヘッダーの行（値のリストのリスト）\n
+    - column_formats: 列ごとの表示形式のリスト（Noneの列は日付・日時だけ既定の表示形式にする）\n
+    """
+    num_cols = len(columns)
+    total_rows = len(header_rows) + num_rows
+    if num_cols == 0 or total_rows == 0:
+        raise RangeFormatError("表が空です（行または列がありません）")
+    cells = CellValues(total_rows, num_cols)
+    for r, row in enumerate(header_rows):
+        cells.set_row(r, list(range(num_cols)), row)
+    start = len(header_rows)
+    for c, column in enumerate(columns):
+        values = _column_values(column)
+        if len(values) != num_rows:
+            raise RangeFormatError(f"{c + 1}列目の行数({len(values)})が他の列({num_rows})と異なります")
+        cells.set_column(c, values, start)
+        if column_formats[c] is not None:
+            cells.set_column_format(c, column_formats[c], start)
+        else:
+            for r, number_format in _default_formats(values):
+                cells.set_format(start + r, c, number_format)
+    cells.release_lookup()
+    merged_ranges = _merged_ranges(merges, total_rows, num_cols)
+    return SheetGrid(1, total_rows, 1, num_cols, cells, merged_ranges)
+
+
+def _format_list(column_formats, keys):
+    """{列のキー: 表示形式} または列ごとのリスト -> 列ごとのリスト"""
+    if column_formats is None:
+        return [None] * len(keys)
+    if isinstance(column_formats, dict):
+        return [column_formats.get(key) for key in keys]
+    column_formats = list(column_formats)
+    if len(column_formats) != len(keys):
+        raise RangeFormatError(f"表示形式の数({len(column_formats)})が列数({len(keys)})と異なります")
+    return column_formats
+
+
+def _header_rows(labels, nlevels):
+    """
+    -> (ヘッダーの行のリスト, ヘッダーの結合セル)\n
+    - 多段の列ラベル(MultiIndex)は段ごとに1行とし，上の段が同じで隣り合う同じラベルを横に結合する\n
+    """
+    if nlevels == 1:
+        return [list(labels)], []
+    rows, merges = [], []
+    for level in range(nlevels):
+        row = []
+        c = 0
+        while c < len(labels):
+            prefix = labels[c][:level + 1]
+            end = c
+            while end + 1 < len(labels) and labels[end + 1][:level + 1] == prefix:
+                end += 1
+            row.append(prefix[-1])
+            row.extend([None] * (end - c))
+            if end > c:
+                merges.append((level, c, level, end))
+            c = end + 1
+        rows.append(row)
+    return rows, merges
+
+
+def array_to_grid(data, merges=(), column_formats=None):
+    """
+    -> SheetGrid\n
+    - data: 2次元の配列（numpyの配列・リストのリスト）．行ごとの長さが違う場合は短い行の右を空セルにする\n
+    - merges: 結合セルのリスト．(先頭行, 先頭列, 末尾行, 末尾列)（0始まり，末尾を含む）または「A1:B2」形式\n
+    - column_formats: 列ごとの表示形式．{列番号(0始まり): 書式} または列数分のリスト（例: '#,##0.00', '0.0%'）\n
+    """
+    if hasattr(data, 'ndim') and data.ndim == 2:
+        columns = [data[:, c] for c in range(data.shape[1])]
+        num_rows = data.shape[0]
+    else:
+        rows = [list(row) for row in data]
+        num_rows = len(rows)
+        num_cols = max((len(row) for row in rows), default=0)
+        columns = [[row[c] if c < len(row) else None for row in rows] for c in range(num_cols)]
+    return _build_grid(columns, num_rows, [], merges,
+                       _format_list(column_formats, list(range(len(columns)))))
+
+
+def dataframe_to_grid(frame, merges=(), column_formats=None, header=True, index=False):
+    """
+    -> SheetGrid\n
+    - frame: pandasのDataFrame．header=Trueなら列ラベルを先頭行（多段の列ラベルは段数分の行）に入れる\n
+    - index=Trueなら行ラベルを左端の列に入れる\n
+    - merges: 結合セルのリスト（ヘッダー行を含めた表の中での位置，array_to_gridと同じ形式）\n
+    - column_formats: 列ごとの表示形式．{列ラベル: 書式} または列数分のリスト\n
+    """
+    if index:
+        frame = frame.reset_index()
+    labels = list(frame.columns)
+    nlevels = getattr(frame.columns, 'nlevels', 1)
+    header_rows, header_merges = _header_rows(labels, nlevels) if header else ([], [])
+    columns = [frame.iloc[:, c] for c in range(len(labels))]
+    return _build_grid(columns, len(frame), header_rows, list(header_merges) + list(merges),
+                       _format_list(column_formats, labels))
+
+
+def array_to_latex(data, caption, label, position, merges=(), add_borders=True, column_formats=None,
+                   longtable=False):
+    """
+    2次元の配列をLaTeXの表形式に変換する（ファイルを経由しない）\n
+    - 引数はarray_to_gridとexcel_to_latex_universalを参照\n
+    """
+    grid = array_to_grid(data, merges, column_formats)
+    return TableModel(grid).render(caption, label, position, add_borders, longtable=longtable)
+
+
+def dataframe_to_latex(frame, caption, label, position, merges=(), add_borders=True, column_formats=None,
+                       header=True, index=False, longtable=False):
+    """
+    DataFrameをLaTeXの表形式に変換する（ファイルを経由しない）\n
+    - 引数はdataframe_to_gridとexcel_to_latex_universalを参照\n
+    """
+    grid = dataframe_to_grid(frame, merges, column_formats, header, index)
+    return TableModel(grid).render(caption, label, position, add_borders, longtable=longtable)
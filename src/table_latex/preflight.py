@@ -0,0 +1,134 @@
+"""
+変換前の規模の見積もり\n
+- セル値を読む前に，シートのメタデータ（保存されている使用範囲・結合セル一覧）から\n
+  範囲のセル数・結合セル数・出力サイズ・所要時間を見積もる\n
+- 上限(ConversionLimits)を超える範囲は読み込みを始める前に止め，使用範囲への切り詰めやlongtableでのファイル出力を提案する\n
+"""
+from common.cache import workbook_cache
+from common.reader import get_merge_index, get_sheet_dimension
+
+# 出力サイズの見積もり（ベンチマークの合成ブックでの実測に基づく概算）
+BYTES_PER_VALUE_CELL = 11  # 値のあるセル1つあたりの出力バイト数（区切りの & を含む）
+BYTES_PER_EMPTY_CELL = 3   # 空セル1つあたり
+BYTES_PER_ROW = 16         # 行末の \\ と罫線の命令
+
+# 所要時間の見積もり（秒/セル）
+LOAD_SECONDS_PER_CELL = 1e-5  # 読み込み（ファイル上にあるセルだけ解析する）
+EMIT_SECONDS_PER_CELL = 3e-6  # 結合セル解決・文字列化・LaTeX生成（範囲内のすべてのセル）
+
+DEFAULT_MAX_CELLS = 1_000_000
+DEFAULT_MAX_OUTPUT_BYTES = 16 * 1024 * 1024
+DEFAULT_MAX_SECONDS = 30.0
+
+
+class ConversionLimits:
+    """
+    変換を始めてよい規模の上限\n
+    - Noneの項目は制限しない\n
+    """
+
+    def __init__(self, max_cells=DEFAULT_MAX_CELLS, max_output_bytes=DEFAULT_MAX_OUTPUT_BYTES,
+                 max_seconds=DEFAULT_MAX_SECONDS):
+        self.max_cells = max_cells
+        self.max_output_bytes = max_output_bytes
+        self.max_seconds = max_seconds
+
+    def exceeded(self, estimate):
+        """
+        -> [超えた理由, ...]（上限内なら空のリスト）\n
+        """
+        reasons = []
+        if self.max_cells is not None and estimate.cells > self.max_cells:
+            reasons.append(f"セル数 {estimate.cells:,} が上限 {self.max_cells:,} を超えています")
+        if self.max_output_bytes is not None and estimate.output_bytes > self.max_output_bytes:
+            reasons.append(f"出力サイズ 約{format_bytes(estimate.output_bytes)} が"
+                           f"上限 {format_bytes(self.max_output_bytes)} を超えています")
+        if self.max_seconds is not None and estimate.seconds > self.max_seconds:
+            reasons.append(f"所要時間 約{estimate.seconds:.0f}秒 が上限 {self.max_seconds:.0f}秒 を超えています")
+        return reasons
+
+
+# longtableで.texファイルに直接書き出す場合の上限（画面に全体を表示しないので出力サイズは制限しない）
+FILE_LIMITS = ConversionLimits(max_cells=20_000_000, max_output_bytes=None, max_seconds=600.0)
+
+
+class ConversionEstimate:
+    """
+    範囲の変換の見積もり\n
+    - cells: 範囲のセル数，used_cells: そのうちシートの使用範囲に入るセル数\n
+    - merges: 範囲に重なる結合セル数，output_bytes: 出力サイズ，seconds: 所要時間\n
+    - used_range: 範囲をシートの使用範囲に切り詰めた (min_row, max_row, min_col, max_col)．\n
+      使用範囲の記録がない・範囲が使用範囲に収まっている場合はNone\n
+    """
+
+    def __init__(self, rows, cols, used_cells, merges, used_range=None):
+        self.rows = rows
+        self.cols = cols
+        self.cells = rows * cols
+        self.used_cells = used_cells
+        self.merges = merges
+        self.used_range = used_range
+        self.output_bytes = (used_cells * BYTES_PER_VALUE_CELL + (self.cells - used_cells) * BYTES_PER_EMPTY_CELL
+                             + rows * BYTES_PER_ROW)
+        self.seconds = used_cells * LOAD_SECONDS_PER_CELL + self.cells * EMIT_SECONDS_PER_CELL
+
+    def summary(self):
+        """画面に表示する見積もりの説明"""
+        lines = [
+            f"範囲: {self.rows:,} 行 × {self.cols:,} 列 = {self.cells:,} セル",
+            f"結合セル: {self.merges:,} 個",
+            f"出力サイズ: 約{format_bytes(self.output_bytes)}",
+            f"所要時間: 約{self.seconds:.1f}秒",
+        ]
+        if self.used_range is not None:
+            min_row, max_row, min_col, max_col = self.used_range
+            lines.append(f"シートの使用範囲: {(max_row - min_row + 1):,} 行 × {(max_col - min_col + 1):,} 列 "
+                         f"= {self.used_cells:,} セル")
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'cols': self.cols,
+            'cells': self.cells,
+            'used_cells': self.used_cells,
+            'merges': self.merges,
+            'output_bytes': self.output_bytes,
+            'seconds': round(self.seconds, 3),
+            'used_range': list(self.used_range) if self.used_range is not None else None,
+        }
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+def estimate_conversion(excel_file, sheet_name, min_row, max_row, min_col, max_col, cache=workbook_cache):
+    """
+    -> ConversionEstimate\n
+    - セル値は読まず，シートの使用範囲(dimension)と結合セル一覧だけから見積もる\n
+    - 使用範囲の記録がない形式(ods・csvなど)では，範囲全体に値があるものとして見積もる\n
+    """
+    rows = max_row - min_row + 1
+    cols = max_col - min_col + 1
+    used_cells = rows * cols
+    used_range = None
+    dimension = get_sheet_dimension(excel_file, sheet_name, cache)
+    if dimension is not None:
+        d_min_row, d_max_row, d_min_col, d_max_col = dimension
+        clipped = (max(min_row, d_min_row), min(max_row, d_max_row),
+                   max(min_col, d_min_col), min(max_col, d_max_col))
+        if clipped[0] > clipped[1] or clipped[2] > clipped[3]:
+            used_cells = 0
+        else:
+            used_cells = (clipped[1] - clipped[0] + 1) * (clipped[3] - clipped[2] + 1)
+            if clipped != (min_row, max_row, min_col, max_col):
+                used_range = clipped
+
+    merge_index = get_merge_index(excel_file, sheet_name, cache)
+    merges = len(merge_index.overlapping(min_row, max_row, min_col, max_col))
+    return ConversionEstimate(rows, cols, used_cells, merges, used_range)
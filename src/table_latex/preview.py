@@ -0,0 +1,223 @@
+"""
+シートのプレビュー（表タブ）\n
+- QTableViewで見えている行のブロックだけをSheetWindowから読み込み，結合セルはspanで描く\n
+- ブロックの読み込み（とシートを開く処理）はワーカースレッドで行い，読み込み中のセルは空で表示する\n
+- マウスで選択した範囲を「A1:E6」形式で通知する（rangeSelected）\n
+"""
+import traceback
+
+from PyQt5.QtCore import (QAbstractTableModel, QModelIndex, QObject, QRunnable, Qt, QThreadPool, QTimer,
+                          pyqtSignal)
+from PyQt5.QtWidgets import QAbstractItemView, QHeaderView, QTableView
+from openpyxl.utils.cell import get_column_letter
+
+from common.sheet_window import SheetWindow
+from common.used_range import range_string
+
+PENDING_BLOCKS = 4  # 読み込みを待つブロック数の上限（素早くスクロールした場合は古い要求から捨てる）
+ROW_HEIGHT = 22
+RELEASE_IDLE_MS = 2000  # 読み込みがこの時間なければブックを閉じる
+
+
+class PreviewSignals(QObject):
+    """PreviewTaskのシグナル．finished(結果) / failed(traceback文字列)"""
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+
+class PreviewTask(QRunnable):
+    """関数をワーカースレッドで実行し，結果をシグナルで返す"""
+
+    def __init__(self, function, *args):
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.signals = PreviewSignals()
+
+    def run(self):
+        try:
+            result = self.function(*self.args)
+        except Exception:
+            self._emit('failed', traceback.format_exc())
+        else:
+            self._emit('finished', result)
+
+    def _emit(self, name, value):
+        try:
+            getattr(self.signals, name).emit(value)
+        except RuntimeError:
+            pass  # アプリの終了などでプレビューが破棄された後に読み込みが終わった
+
+
+class SheetPreviewModel(QAbstractTableModel):
+    """
+    SheetWindowを公開するモデル\n
+    - data()で未読み込みのブロックに触れると読み込みを予約し，読み込めたらdataChangedで再描画させる\n
+    - ブロックは1つずつ，最後に要求されたもの（今見えている位置）から読み込む\n
+    """
+    blockLoaded = pyqtSignal(int, int)  # 読み込んだブロックの (先頭行, 末尾行)（1始まり）
+    loadFailed = pyqtSignal(str)
+
+    def __init__(self, window, start_task, parent=None):
+        super().__init__(parent)
+        self.window = window
+        self.start_task = start_task  # ワーカースレッドでPreviewTaskを実行する関数（SheetPreview.start_task）
+        self._pending = []     # 読み込みを待つブロック番号（末尾ほど新しい）
+        self._loading = None   # 読み込み中のブロック番号
+        self.releaseTimer = QTimer(self)
+        self.releaseTimer.setSingleShot(True)
+        self.releaseTimer.setInterval(RELEASE_IDLE_MS)
+        self.releaseTimer.timeout.connect(lambda: self.start_task(PreviewTask(self.window.release)))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.window.num_rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.window.num_cols
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        text = self.window.text(index.row() + 1, index.column() + 1)
+        if text is None:
+            self.request_block(self.window.block_of(index.row() + 1))
+            return ""
+        return text
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return get_column_letter(section + 1)
+        return str(section + 1)
+
+    def request_block(self, index):
+        if index == self._loading:
+            return
+        if index in self._pending:
+            self._pending.remove(index)
+        self._pending.append(index)
+        del self._pending[:-PENDING_BLOCKS]
+        self._start_next()
+
+    def _start_next(self):
+        if self._loading is not None or not self._pending:
+            return
+        self._loading = self._pending.pop()
+        task = PreviewTask(self.window.load_block, self._loading)
+        task.signals.finished.connect(self._on_block_loaded)
+        task.signals.failed.connect(self._on_block_failed)
+        self.start_task(task)
+
+    def _on_block_loaded(self, block):
+        index, self._loading = self._loading, None
+        if block is not None:
+            first = index * self.window.block_rows
+            last = min(first + self.window.block_rows, self.window.num_rows) - 1
+            self.dataChanged.emit(self.index(first, 0), self.index(last, self.window.num_cols - 1))
+            self.blockLoaded.emit(first + 1, last + 1)
+        self._start_next()
+        if self._loading is None:
+            self.releaseTimer.start()
+
+    def _on_block_failed(self, trace):
+        self._loading = None
+        self._pending.clear()
+        self.loadFailed.emit(trace)
+
+    def close(self):
+        """読み込みの予約を捨て，実行中の読み込みが終わってからブックを閉じる（画面は待たせない）"""
+        self._pending.clear()
+        self.releaseTimer.stop()
+        self.start_task(PreviewTask(self.window.close))
+
+
+class SheetPreview(QTableView):
+    """
+    シートのプレビュー\n
+    - load(file_path, sheet_name) でシートを開く（使用範囲・結合セルの取得もワーカースレッドで行う）\n
+    - rangeSelected(範囲の文字列): マウス・キーボードで選択した範囲\n
+    - statusChanged(メッセージ): 読み込みの状況\n
+    """
+    rangeSelected = pyqtSignal(str)
+    statusChanged = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.previewModel = None
+        self._spans = set()  # 設定済みの結合セル
+        self._generation = 0  # 古いシートを開く処理の結果を捨てるための番号
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)  # SheetWindowの走査は1本なので，開く処理も読み込みも順番に行う
+        self._tasks = set()  # 実行中・実行待ちのPreviewTask（終わるまでシグナルを破棄させない）
+        self.setSelectionMode(QAbstractItemView.ContiguousSelection)
+        self.setWordWrap(False)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        # 行の高さを固定にして，10万行でも行ごとの高さを計算しない
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.verticalHeader().setDefaultSectionSize(ROW_HEIGHT)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+
+    def load(self, file_path, sheet_name, data_only=True):
+        self.clear_preview()
+        self._generation += 1
+        generation = self._generation
+        self.statusChanged.emit(f"シート '{sheet_name}' のプレビューを準備しています...")
+        task = PreviewTask(SheetWindow, file_path, sheet_name, data_only)
+        task.signals.finished.connect(lambda window: self._on_opened(generation, window))
+        task.signals.failed.connect(lambda trace: self._on_open_failed(generation, trace))
+        self.start_task(task)
+
+    def start_task(self, task):
+        self._tasks.add(task)
+        task.signals.finished.connect(lambda _: self._tasks.discard(task))
+        task.signals.failed.connect(lambda _: self._tasks.discard(task))
+        self._pool.start(task)
+
+    def _on_opened(self, generation, window):
+        if generation != self._generation:
+            window.close()
+            return
+        model = SheetPreviewModel(window, self.start_task, self)
+        model.blockLoaded.connect(self._apply_spans)
+        model.loadFailed.connect(self._on_block_failed)
+        self.previewModel = model
+        self.setModel(model)
+        self.selectionModel().selectionChanged.connect(self._on_selection_changed)
+        self.statusChanged.emit(f"{window.num_rows:,} 行 × {window.num_cols:,} 列（ドラッグで変換する範囲を選択）")
+
+    def _on_open_failed(self, generation, trace):
+        if generation == self._generation:
+            self.statusChanged.emit(f"プレビューを表示できません: {trace.strip().splitlines()[-1]}")
+
+    def _on_block_failed(self, trace):
+        self.statusChanged.emit(f"プレビューの読み込みに失敗しました: {trace.strip().splitlines()[-1]}")
+
+    def _apply_spans(self, first_row, last_row):
+        """読み込んだブロックに重なる結合セルをspanにする（見えた部分の結合セルだけを設定する）"""
+        for merged in self.previewModel.window.merged_ranges(first_row, last_row):
+            if merged in self._spans:
+                continue
+            self._spans.add(merged)
+            m_min_r, m_min_c, m_max_r, m_max_c = merged
+            self.setSpan(m_min_r - 1, m_min_c - 1, m_max_r - m_min_r + 1, m_max_c - m_min_c + 1)
+
+    def _on_selection_changed(self, *_):
+        ranges = self.selectionModel().selection()
+        if ranges.isEmpty():
+            return
+        top = min(selection_range.top() for selection_range in ranges)
+        bottom = max(selection_range.bottom() for selection_range in ranges)
+        left = min(selection_range.left() for selection_range in ranges)
+        right = max(selection_range.right() for selection_range in ranges)
+        self.rangeSelected.emit(range_string(top + 1, bottom + 1, left + 1, right + 1))
+
+    def clear_preview(self):
+        model = self.previewModel
+        self.previewModel = None
+        self._spans.clear()
+        self.clearSpans()
+        self.setModel(None)
+        if model is not None:
+            model.close()
+            model.deleteLater()
@@ -1,15 +1,32 @@
 import sys
 import os
-# 最適化したインポート
-from pandas import ExcelFile
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QLineEdit, QPushButton,
-                             QFileDialog, QComboBox, QMessageBox, QTextEdit,
+                             QFileDialog, QComboBox, QMessageBox,
                              QCheckBox, QGridLayout, QGroupBox, QSplitter,
-                             QStatusBar, QFrame)
-from PyQt5.QtCore import Qt
-from openpyxl import load_workbook
-from openpyxl.utils import column_index_from_string
+                             QStatusBar, QFrame, QListWidget, QInputDialog, QSpinBox)
+from PyQt5.QtCore import Qt, QFileSystemWatcher, QTimer, QThreadPool
+from common.latex_escape import escape_latex
+from common.reader import get_sheet_names
+from common.result_view import LatexResultView
+from common.used_range import bounding_range, range_string
+from table_latex import converter
+from table_latex.converter import RangeTooLargeError, TableConversionError
+from table_latex.emitters import FORMAT_EXTENSIONS, HEADER_ROW_FORMATS, convert_table
+from table_latex.preflight import FILE_LIMITS, ConversionLimits
+from table_latex.preview import SheetPreview
+from table_latex.watch import WatchJob, WatchList
+from table_latex.worker import STAGE_LABELS, ConversionWorker
+from table_latex.workbook_export import export_workbook
+
+WATCH_DEBOUNCE_MS = 500  # 保存直後は書き込みが続くので，少し待ってから読み直す
+OUTPUT_FORMAT_LABELS = [  # (出力形式, 表示名)
+    ('latex', 'LaTeX (tabular)'),
+    ('booktabs', 'LaTeX (booktabs)'),
+    ('markdown', 'Markdown'),
+    ('html', 'HTML'),
+    ('csv', 'CSV'),
+]
 
 class TableLatexTab(QWidget):
     """Excel to LaTeX table converter tab"""
@@ -17,6 +34,21 @@ class TableLatexTab(QWidget):
     def __init__(self):
         super().__init__()
         self.statusBar = None
+        self.worker = None  # 実行中の変換（バックグラウンド）
+        self.conversionOutput = None  # ファイルに直接出力する場合の出力先
+        self.exportOutputDir = None  # ブック全体の一括出力の出力先
+        self.conversionFormat = 'latex'  # 実行中の変換の出力形式
+        self.resultFormat = 'latex'  # 表示中のコードの出力形式
+        self.conversionLimits = ConversionLimits()  # 画面に表示する変換の規模の上限（超えたら読み込む前に止める）
+        self.watchList = WatchList()
+        self.watchWorker = None  # 実行中の監視リストの変換（バックグラウンド）
+        self.pendingWatchFiles = set()
+        self.fileWatcher = QFileSystemWatcher(self)
+        self.fileWatcher.fileChanged.connect(self.on_watched_file_changed)
+        self.watchTimer = QTimer(self)
+        self.watchTimer.setSingleShot(True)
+        self.watchTimer.setInterval(WATCH_DEBOUNCE_MS)
+        self.watchTimer.timeout.connect(self.regenerate_watched_jobs)
         self.initUI()
 
     def set_status_bar(self, status_bar):
@@ -73,6 +105,7 @@ class TableLatexTab(QWidget):
         self.sheetCombobox = QComboBox()
         sheetLayout.addWidget(sheetLabel)
         sheetLayout.addWidget(self.sheetCombobox)
+        self.sheetCombobox.currentTextChanged.connect(self.refresh_preview)
         
         rangeLayout = QHBoxLayout()
         rangeLabel = QLabel('セル範囲:')
@@ -90,8 +123,13 @@ class TableLatexTab(QWidget):
             "（結合セルを一部だけ選択すると、正しく値が表示されない場合があります）"
         ))
 
+        autoRangeButton = QPushButton('自動検出')
+        autoRangeButton.setToolTip("シート内の値のある範囲（表ブロック）を検出して入力します")
+        autoRangeButton.clicked.connect(self.detect_range)
+
         rangeLayout.addWidget(rangeLabel)
         rangeLayout.addWidget(self.rangeEntry)
+        rangeLayout.addWidget(autoRangeButton)
         rangeLayout.addWidget(rangeHelpButton)
         
         optionsGroup = QGroupBox("オプション")
@@ -120,17 +158,50 @@ class TableLatexTab(QWidget):
         self.addBordersCheck = QCheckBox('罫線を追加')
         self.addBordersCheck.setChecked(True)
         optionsLayout.addWidget(self.addBordersCheck, 3, 1)
+
+        self.longtableCheck = QCheckBox('longtable形式で.texファイルに直接出力（大きな表向け，画面には先頭のみ表示）')
+        optionsLayout.addWidget(self.longtableCheck, 4, 0, 1, 2)
+
+        formatLabel = QLabel('出力形式:')
+        self.formatCombo = QComboBox()
+        for output_format, text in OUTPUT_FORMAT_LABELS:
+            self.formatCombo.addItem(text, output_format)
+        self.formatCombo.setToolTip("読み込んだ表は保持されるので，形式を切り替えて再変換してもファイルは読み直しません")
+        optionsLayout.addWidget(formatLabel, 5, 0)
+        optionsLayout.addWidget(self.formatCombo, 5, 1)
+
+        headerRowsLabel = QLabel('見出しの行数:')
+        self.headerRowsSpin = QSpinBox()
+        self.headerRowsSpin.setRange(0, 99)
+        self.headerRowsSpin.setValue(1)
+        self.headerRowsSpin.setToolTip("booktabsでは見出しの下に\\midrule（見出し内の横方向の結合セルの下に\\cmidrule），"
+                                       "HTMLではこの行数を<thead>にする")
+        optionsLayout.addWidget(headerRowsLabel, 6, 0)
+        optionsLayout.addWidget(self.headerRowsSpin, 6, 1)
+        self.formatCombo.currentIndexChanged.connect(self.update_header_rows_enabled)
+        self.update_header_rows_enabled()
         
         optionsGroup.setLayout(optionsLayout)
 
-        convertWarningLabel = QLabel("※ コードの生成には時間がかかる場合があります")
+        convertWarningLabel = QLabel("※ コードの生成には時間がかかる場合があります（変換中も操作でき，「中止」で中断できます）")
         convertWarningLabel.setStyleSheet("color: gray; font-size: 16px; font-weight: bold;")
         convertWarningLabel.setWordWrap(True)
         
-        convertButton = QPushButton('LaTeXコードに変換')
-        convertButton.clicked.connect(self.convert_to_latex)
-        convertButton.setStyleSheet('background-color: #4CAF50; color: white; font-size: 14px; padding: 12px;')
-        convertButton.setMinimumHeight(40)
+        convertLayout = QHBoxLayout()
+        self.convertButton = QPushButton('LaTeXコードに変換')
+        self.convertButton.clicked.connect(self.convert_to_latex)
+        self.convertButton.setStyleSheet('background-color: #4CAF50; color: white; font-size: 14px; padding: 12px;')
+        self.convertButton.setMinimumHeight(40)
+        self.cancelButton = QPushButton('中止')
+        self.cancelButton.clicked.connect(self.cancel_conversion)
+        self.cancelButton.setMinimumHeight(40)
+        self.cancelButton.setEnabled(False)
+        convertLayout.addWidget(self.convertButton, 1)
+        convertLayout.addWidget(self.cancelButton)
+
+        exportAllButton = QPushButton('ブック全体を一括出力...')
+        exportAllButton.setToolTip("全シート・名前の定義・テーブルをそれぞれ.texファイルに書き出します")
+        exportAllButton.clicked.connect(self.export_whole_workbook)
 
         
         
@@ -140,16 +211,34 @@ class TableLatexTab(QWidget):
         settingsLayout.addLayout(rangeLayout)
         settingsLayout.addWidget(optionsGroup)
         settingsLayout.addWidget(convertWarningLabel)
-        settingsLayout.addWidget(convertButton)
-        
+        settingsLayout.addLayout(convertLayout)
+        settingsLayout.addWidget(exportAllButton)
+        
+        # --- 監視リスト：ファイルが更新されたら内容が変わった表だけを再生成 ---
+        watchGroup = QGroupBox("監視リスト（ファイル更新時に自動で再生成）")
+        watchLayout = QVBoxLayout()
+        self.watchListWidget = QListWidget()
+        self.watchListWidget.setMaximumHeight(90)
+        self.watchListWidget.itemDoubleClicked.connect(self.show_watch_job)
+        watchButtonLayout = QHBoxLayout()
+        addWatchButton = QPushButton('現在の設定を監視リストに追加...')
+        addWatchButton.clicked.connect(self.add_watch_job)
+        removeWatchButton = QPushButton('監視を解除')
+        removeWatchButton.clicked.connect(self.remove_watch_job)
+        watchButtonLayout.addWidget(addWatchButton)
+        watchButtonLayout.addWidget(removeWatchButton)
+        watchLayout.addWidget(self.watchListWidget)
+        watchLayout.addLayout(watchButtonLayout)
+        watchGroup.setLayout(watchLayout)
+        settingsLayout.addWidget(watchGroup)
+
         # --- 下部：結果表示部分 ---
         resultWidget = QWidget()
         resultLayout = QVBoxLayout()
         resultWidget.setLayout(resultLayout)
         
         resultLabel = QLabel("LaTeX コード:")
-        self.resultText = QTextEdit()
-        self.resultText.setReadOnly(True)
+        self.resultText = LatexResultView()
         self.resultText.setMinimumHeight(200)
         
         # Windows環境限定で結果表示エリアの高さを増加
@@ -161,13 +250,34 @@ class TableLatexTab(QWidget):
         copyButton.clicked.connect(self.copy_to_clipboard)
         copyButton.setStyleSheet("background-color: #007BFF; color: white; font-size: 16px; padding: 15px; font-weight: bold; border-radius: 8px;")
         
+        saveButton = QPushButton("ファイルに保存...")
+        saveButton.clicked.connect(self.save_result)
+        saveButton.setStyleSheet("font-size: 16px; padding: 15px; font-weight: bold; border-radius: 8px;")
+
+        resultButtonLayout = QHBoxLayout()
+        resultButtonLayout.addWidget(copyButton, 1)
+        resultButtonLayout.addWidget(saveButton)
+
         resultLayout.addWidget(resultLabel)
         resultLayout.addWidget(self.resultText)
-        resultLayout.addWidget(copyButton)
-        
+        resultLayout.addLayout(resultButtonLayout)
+        
+        # --- 中部：シートのプレビュー（見えている部分だけを読み込む） ---
+        previewGroup = QGroupBox("シートのプレビュー（ドラッグで範囲を選択）")
+        previewLayout = QVBoxLayout()
+        self.sheetPreview = SheetPreview()
+        self.sheetPreview.rangeSelected.connect(self.rangeEntry.setText)
+        self.previewStatusLabel = QLabel("ファイルとシートを選択するとプレビューを表示します")
+        self.previewStatusLabel.setStyleSheet("color: #666666;")
+        self.sheetPreview.statusChanged.connect(self.previewStatusLabel.setText)
+        previewLayout.addWidget(self.sheetPreview)
+        previewLayout.addWidget(self.previewStatusLabel)
+        previewGroup.setLayout(previewLayout)
+
         splitter.addWidget(settingsWidget)
+        splitter.addWidget(previewGroup)
         splitter.addWidget(resultWidget)
-        splitter.setSizes([300, 300])  
+        splitter.setSizes([300, 250, 300])
         
         mainLayout.addWidget(splitter)
         
@@ -176,16 +286,16 @@ class TableLatexTab(QWidget):
 
     def browse_excel_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "Excelファイルを選択", "", "Excel Files (*.xlsx *.xls)")
+            self, "Excelファイルを選択", "", "表計算ファイル (*.xlsx *.xlsm *.xls *.ods *.csv *.tsv);;All Files (*)")
         if file_path:
             self.fileEntry.setText(file_path)
             self.update_sheet_names(file_path)
 
     def update_sheet_names(self, file_path):
         try:
-            xls = ExcelFile(file_path)
+            sheet_names = get_sheet_names(file_path)
             self.sheetCombobox.clear()
-            self.sheetCombobox.addItems(xls.sheet_names)
+            self.sheetCombobox.addItems(sheet_names)
             if self.statusBar:
                 self.statusBar.showMessage(f"ファイル '{os.path.basename(file_path)}' を読み込みました")
         except Exception as e:
@@ -193,40 +303,372 @@ class TableLatexTab(QWidget):
             if self.statusBar:
                 self.statusBar.showMessage("ファイル読み込みエラー")
 
+    def refresh_preview(self, *_):
+        """選択中のファイル・シートをプレビューに表示する（読み込みはプレビュー側のワーカースレッドで行う）"""
+        excel_file = self.fileEntry.text()
+        sheet_name = self.sheetCombobox.currentText()
+        if excel_file and sheet_name and os.path.exists(excel_file):
+            self.sheetPreview.load(excel_file, sheet_name)
+        else:
+            self.sheetPreview.clear_preview()
+            self.previewStatusLabel.setText("ファイルとシートを選択するとプレビューを表示します")
+
+    def detect_range(self):
+        """
+        シートの使用範囲と表ブロックを検出してセル範囲に入力する\n
+        - 表ブロックが複数ある場合は，全体またはいずれかのブロックを選択させる\n
+        """
+        excel_file = self.fileEntry.text()
+        if not excel_file or not os.path.exists(excel_file):
+            QMessageBox.critical(self, "エラー", "有効なExcelファイルを選択してください")
+            return
+
+        if self.worker is not None:
+            return
+
+        # 大きなシートでは検出に時間がかかるので，変換と同じワーカーで実行する
+        worker = ConversionWorker(excel_file, self.sheetCombobox.currentText(), target=converter.load_table_blocks)
+        worker.signals.progress.connect(self.on_conversion_progress)
+        worker.signals.finished.connect(self.on_range_detected)
+        worker.signals.failed.connect(self.on_conversion_failed)
+        worker.signals.cancelled.connect(self.on_conversion_cancelled)
+        worker.signals.crashed.connect(self.on_conversion_crashed)
+        self.worker = worker
+        self.convertButton.setEnabled(False)
+        self.cancelButton.setEnabled(True)
+        if self.statusBar:
+            self.statusBar.showMessage("セル範囲を検出しています...")
+        QThreadPool.globalInstance().start(worker)
+
+    def on_range_detected(self, blocks):
+        """検出した表ブロックからセル範囲を入力する（複数あれば選択させる）"""
+        if not self._finish_conversion():
+            return
+        if not blocks:
+            QMessageBox.warning(self, "警告", "シートに値のあるセルが見つかりませんでした")
+            return
+        cell_range = range_string(*bounding_range(blocks))
+        if len(blocks) > 1:
+            items = [f"{cell_range}（全体）"] + [
+                f"{range_string(*block)}（{block[1] - block[0] + 1}行 × {block[3] - block[2] + 1}列）"
+                for block in blocks]
+            item, ok = QInputDialog.getItem(self, "表の選択", f"{len(blocks)} 個の表が見つかりました:", items, 0, False)
+            if not ok:
+                return
+            cell_range = item.split('（')[0]
+        self.rangeEntry.setText(cell_range)
+        if self.statusBar:
+            self.statusBar.showMessage(f"セル範囲を検出しました: {cell_range}", 3000)
+
+    def update_header_rows_enabled(self, *_):
+        """見出しの行数はbooktabs・HTMLでだけ使う"""
+        self.headerRowsSpin.setEnabled(self.formatCombo.currentData() in HEADER_ROW_FORMATS)
+
     def convert_to_latex(self):
+        """変換をバックグラウンドで開始する（結果はシグナルで受け取る）"""
         excel_file = self.fileEntry.text()
         if not excel_file or not os.path.exists(excel_file):
             QMessageBox.critical(self, "エラー", "有効なExcelファイルを選択してください")
             return
+        if self.worker is not None:
+            return
 
-        sheet_name = self.sheetCombobox.currentText()
-        cell_range = self.rangeEntry.text()
-        caption = self.captionEntry.text()
-        label = self.labelEntry.text()
-        position = self.positionCombo.currentText()
-        show_value = self.showValueCheck.isChecked()
-        add_borders = self.addBordersCheck.isChecked()
+        args = (excel_file, self.sheetCombobox.currentText(), self.rangeEntry.text(),
+                self.captionEntry.text(), self.labelEntry.text(), self.positionCombo.currentText(),
+                self.showValueCheck.isChecked(), self.addBordersCheck.isChecked())
+        self.conversionOutput = None
+        self.conversionFormat = 'latex'
+        if self.longtableCheck.isChecked():
+            # 大きな表は画面に全体を載せず，1行ずつファイルへ書き出す
+            output, _ = QFileDialog.getSaveFileName(self, "出力先の.texファイル", "", "TeX Files (*.tex)")
+            if not output:
+                return
+            self.conversionOutput = output
+            worker = ConversionWorker(*args, output, target=converter.excel_to_latex_file, limits=FILE_LIMITS)
+        elif self.formatCombo.currentData() != 'latex':
+            self.conversionFormat = self.formatCombo.currentData()
+            worker = ConversionWorker(*args, target=convert_table, output_format=self.conversionFormat,
+                                      header_rows=self.headerRowsSpin.value(), limits=self.conversionLimits)
+        else:
+            worker = ConversionWorker(*args, limits=self.conversionLimits)
+        worker.signals.progress.connect(self.on_conversion_progress)
+        worker.signals.finished.connect(self.on_conversion_finished)
+        worker.signals.failed.connect(self.on_conversion_failed)
+        worker.signals.cancelled.connect(self.on_conversion_cancelled)
+        worker.signals.crashed.connect(self.on_conversion_crashed)
+        self.worker = worker
+        self.convertButton.setEnabled(False)
+        self.cancelButton.setEnabled(True)
+        QThreadPool.globalInstance().start(worker)
+
+    def cancel_conversion(self):
+        """実行中の変換を中止する（ワーカーは次の区切りで終了し，結果は破棄される）"""
+        if self.worker is None:
+            return
+        self.worker.cancel()
+        self.worker = None
+        self.convertButton.setEnabled(True)
+        self.cancelButton.setEnabled(False)
+        if self.statusBar:
+            self.statusBar.showMessage("変換を中止しました", 3000)
+
+    def _finish_conversion(self):
+        """変換終了時の後始末．中止済みのワーカーからの通知ならFalse"""
+        worker = self.worker
+        if worker is None or worker.signals is not self.sender():
+            return False
+        self.worker = None
+        self.convertButton.setEnabled(True)
+        self.cancelButton.setEnabled(False)
+        return True
+
+    def on_conversion_progress(self, stage, percent):
+        if self.worker is None or self.worker.signals is not self.sender():
+            return
+        if self.statusBar:
+            label = STAGE_LABELS.get(stage, stage)
+            self.statusBar.showMessage(f"{label} ({percent}%)" if stage == 'emit' or (stage == 'load' and percent) else label)
+
+    def on_conversion_finished(self, latex_code):
+        if not self._finish_conversion():
+            return
+        latex_lines = latex_code.split('\n')
+        filtered_lines = [line for line in latex_lines if not (line.startswith('% 注意:') or line.startswith('% \\usepackage'))]
+        if filtered_lines and filtered_lines[0] == '':
+            filtered_lines.pop(0)
+
+        self.resultText.setPlainText('\n'.join(filtered_lines))
+        self.resultFormat = self.conversionFormat
+        if self.statusBar:
+            if self.conversionOutput:
+                self.statusBar.showMessage(f"LaTeXコードを {self.conversionOutput} に出力しました（先頭のみ表示）")
+            else:
+                self.statusBar.showMessage("LaTeXコードが生成されました" if self.resultFormat == 'latex' else
+                                           f"{dict(OUTPUT_FORMAT_LABELS)[self.resultFormat]} のコードが生成されました")
+
+    def on_conversion_failed(self, error):
+        if not self._finish_conversion():
+            return
+        if isinstance(error, RangeTooLargeError):
+            self.offer_smaller_conversion(error)
+            return
+        if error.severity == 'warning':
+            QMessageBox.warning(self, error.title, error.message)
+        else:
+            QMessageBox.critical(self, error.title, error.message)
+        if self.statusBar:
+            self.statusBar.showMessage("変換エラー")
+
+    def offer_smaller_conversion(self, error):
+        """範囲が大きすぎる場合に，使用範囲への切り詰めかlongtableでのファイル出力を選ばせる"""
+        if self.statusBar:
+            self.statusBar.showMessage("範囲が大きすぎるため変換を中止しました")
+        estimate = error.estimate
+        box = QMessageBox(self)
+        box.setIcon(QMessageBox.Warning)
+        box.setWindowTitle(error.title)
+        box.setText(error.message)
+        box.setInformativeText(estimate.summary())
+        clipButton = None
+        if estimate.used_range is not None:
+            clipButton = box.addButton(f"使用範囲 {range_string(*estimate.used_range)} に切り詰める",
+                                       QMessageBox.AcceptRole)
+        fileButton = None
+        if not self.longtableCheck.isChecked():
+            fileButton = box.addButton("longtableでファイルに出力", QMessageBox.AcceptRole)
+        box.addButton("キャンセル", QMessageBox.RejectRole)
+        box.exec_()
+
+        clicked = box.clickedButton()
+        if clipButton is not None and clicked is clipButton:
+            self.rangeEntry.setText(range_string(*estimate.used_range))
+            self.convert_to_latex()
+        elif fileButton is not None and clicked is fileButton:
+            self.longtableCheck.setChecked(True)
+            self.convert_to_latex()
+
+    def on_conversion_crashed(self, trace):
+        if not self._finish_conversion():
+            return
+        QMessageBox.critical(self, "エラー", f"変換中にエラーが発生しました\n\n{trace}")
+        if self.statusBar:
+            self.statusBar.showMessage("変換エラー")
+
+    def on_conversion_cancelled(self):
+        if self._finish_conversion() and self.statusBar:
+            self.statusBar.showMessage("変換を中止しました", 3000)
+
+    def export_whole_workbook(self):
+        """ブック内のシート・名前の定義・テーブルをすべて.texファイルに書き出す"""
+        excel_file = self.fileEntry.text()
+        if not excel_file or not os.path.exists(excel_file):
+            QMessageBox.critical(self, "エラー", "有効なExcelファイルを選択してください")
+            return
+
+        output_dir = QFileDialog.getExistingDirectory(self, "出力先のフォルダを選択",
+                                                      os.path.dirname(os.path.abspath(excel_file)))
+        if not output_dir:
+            return
 
+        if self.worker is not None:
+            return
+
+        # 表変換と同じワーカーで実行し，画面を止めずに進捗の表示・中止をできるようにする
+        self.exportOutputDir = output_dir
+        worker = ConversionWorker(excel_file, output_dir, self.positionCombo.currentText(),
+                                  self.showValueCheck.isChecked(), self.addBordersCheck.isChecked(),
+                                  target=export_workbook)
+        worker.signals.progress.connect(self.on_conversion_progress)
+        worker.signals.finished.connect(self.on_export_finished)
+        worker.signals.failed.connect(self.on_conversion_failed)
+        worker.signals.cancelled.connect(self.on_conversion_cancelled)
+        worker.signals.crashed.connect(self.on_conversion_crashed)
+        self.worker = worker
+        self.convertButton.setEnabled(False)
+        self.cancelButton.setEnabled(True)
+        if self.statusBar:
+            self.statusBar.showMessage("ブック全体を変換しています...")
+        QThreadPool.globalInstance().start(worker)
+
+    def on_export_finished(self, results):
+        if not self._finish_conversion():
+            return
+        output_dir = self.exportOutputDir
+        failed = [result for result in results if not result['ok']]
+        summary = f"{len(results) - len(failed)}/{len(results)} 件の表を書き出しました\n出力先: {output_dir}"
+        if failed:
+            details = "\n".join(f"{result['kind']} {result['name']}: {result['error']['message']}" for result in failed)
+            QMessageBox.warning(self, "警告", f"{summary}\n\n失敗:\n{details}")
+        else:
+            QMessageBox.information(self, "一括出力", summary)
+        if self.statusBar:
+            self.statusBar.showMessage(f"{len(results) - len(failed)} 件の表を書き出しました")
+
+    def add_watch_job(self):
+        """現在のファイル・シート・範囲・オプションを監視リストに追加する（初回の変換はワーカーで行う）"""
+        excel_file = self.fileEntry.text()
+        if not excel_file or not os.path.exists(excel_file):
+            QMessageBox.critical(self, "エラー", "有効なExcelファイルを選択してください")
+            return
+        if self.watchWorker is not None:
+            if self.statusBar:
+                self.statusBar.showMessage("監視中の表を変換しています．終わってから追加してください", 3000)
+            return
+
+        # 出力先を選ばなかった場合は，結果をこのタブに表示するだけ
+        output, _ = QFileDialog.getSaveFileName(self, "出力先の.texファイル（キャンセルで画面表示のみ）", "",
+                                                "TeX Files (*.tex)")
         try:
-            latex_code = self.excel_to_latex_universal(
-                excel_file, sheet_name, cell_range, caption, label, position,
-                show_value, add_borders
+            job = WatchJob(
+                excel_file, self.sheetCombobox.currentText(), self.rangeEntry.text(),
+                self.captionEntry.text(), self.labelEntry.text(), self.positionCombo.currentText(),
+                self.showValueCheck.isChecked(), self.addBordersCheck.isChecked(), output or None,
+                limits=self.conversionLimits
             )
-            if latex_code:  # エラー発生時は空文字列が返る
-                latex_lines = latex_code.split('\n')
-                filtered_lines = [line for line in latex_lines if not (line.startswith('% 注意:') or line.startswith('% \\usepackage'))]
-                if filtered_lines and filtered_lines[0] == '':
-                    filtered_lines.pop(0)
-                
-                self.resultText.setPlainText('\n'.join(filtered_lines))
-                if self.statusBar:
-                    self.statusBar.showMessage("LaTeXコードが生成されました")
+        except TableConversionError as e:
+            QMessageBox.warning(self, e.title, e.message)
+            return
+        if self.statusBar:
+            self.statusBar.showMessage(f"監視する表を変換しています: {job.describe()}")
+        self._start_watch_worker(ConversionWorker(job, target=self.watchList.add), self.on_watch_job_added)
 
-        except Exception as e:
-            import traceback
-            QMessageBox.critical(self, "エラー", f"変換中にエラーが発生しました: {str(e)}\n\n{traceback.format_exc()}")
+    def on_watch_job_added(self, job):
+        if not self._finish_watch_worker():
+            return
+        if job.error is not None:
+            if job.error.severity == 'warning':
+                QMessageBox.warning(self, job.error.title, job.error.message)
+            else:
+                QMessageBox.critical(self, job.error.title, job.error.message)
             if self.statusBar:
-                self.statusBar.showMessage("変換エラー")
+                self.statusBar.showMessage("監視を開始できませんでした")
+            return
+
+        if job.file_path not in self.fileWatcher.files():
+            self.fileWatcher.addPath(job.file_path)
+        self.watchListWidget.addItem(job.describe())
+        self.resultText.setPlainText(job.latex)
+        self.resultFormat = 'latex'
+        if self.statusBar:
+            self.statusBar.showMessage(f"監視を開始しました: {job.describe()}")
+
+    def _start_watch_worker(self, worker, on_finished):
+        """監視リストの変換をワーカーで実行する（表の変換とは別に，監視リストの処理は1つずつ行う）"""
+        worker.signals.finished.connect(on_finished)
+        worker.signals.failed.connect(self.on_watch_worker_failed)
+        worker.signals.crashed.connect(self.on_watch_worker_failed)
+        self.watchWorker = worker
+        QThreadPool.globalInstance().start(worker)
+
+    def _finish_watch_worker(self):
+        """監視リストの変換の終了時の後始末．別のワーカーからの通知ならFalse"""
+        worker = self.watchWorker
+        if worker is None or worker.signals is not self.sender():
+            return False
+        self.watchWorker = None
+        return True
+
+    def on_watch_worker_failed(self, error):
+        if not self._finish_watch_worker():
+            return
+        if isinstance(error, TableConversionError):
+            QMessageBox.critical(self, error.title, error.message)
+        else:
+            QMessageBox.critical(self, "エラー", f"監視中の表の変換中にエラーが発生しました\n\n{error}")
+        if self.statusBar:
+            self.statusBar.showMessage("変換エラー")
+
+    def remove_watch_job(self):
+        row = self.watchListWidget.currentRow()
+        if row < 0:
+            return
+        job = self.watchList.jobs[row]
+        self.watchList.remove(job)
+        self.watchListWidget.takeItem(row)
+        if not self.watchList.jobs_for_file(job.file_path):
+            self.fileWatcher.removePath(job.file_path)
+
+    def show_watch_job(self, item):
+        job = self.watchList.jobs[self.watchListWidget.row(item)]
+        self.resultText.setPlainText(job.latex)
+        self.resultFormat = 'latex'
+
+    def on_watched_file_changed(self, file_path):
+        self.pendingWatchFiles.add(file_path)
+        self.watchTimer.start()  # 連続した更新通知はまとめて処理する
+
+    def regenerate_watched_jobs(self):
+        """更新されたファイルのジョブのうち，範囲の内容が変わったものだけをワーカーで再生成する"""
+        if self.watchWorker is not None:
+            self.watchTimer.start()  # 実行中の変換が終わってから処理する
+            return
+        files, self.pendingWatchFiles = self.pendingWatchFiles, set()
+        for file_path in files:
+            # 一時ファイルへの保存→置き換えでは監視が外れるので，付け直す
+            if os.path.exists(file_path) and file_path not in self.fileWatcher.files():
+                self.fileWatcher.addPath(file_path)
+        if self.fileEntry.text() in files:
+            self.refresh_preview()
+        self._start_watch_worker(ConversionWorker(sorted(files), target=self.watchList.files_changed),
+                                 self.on_watched_jobs_regenerated)
+
+    def on_watched_jobs_regenerated(self, result):
+        if not self._finish_watch_worker():
+            return
+        changed, failed = result
+        for job in changed:
+            if not job.output:
+                self.resultText.setPlainText(job.latex)
+                self.resultFormat = 'latex'
+        if self.statusBar:
+            if failed:
+                self.statusBar.showMessage(f"{len(failed)} 件の表を再生成できませんでした（次の保存時に再試行します）: "
+                                           + failed[0].error.message.splitlines()[0])
+            elif changed:
+                self.statusBar.showMessage(f"{len(changed)} 件の表を再生成しました: "
+                                           + ", ".join(job.describe() for job in changed))
+            else:
+                self.statusBar.showMessage("監視中の範囲に変更はありません", 3000)
 
     def copy_to_clipboard(self):
         latex_code = self.resultText.toPlainText()
@@ -238,248 +680,42 @@ class TableLatexTab(QWidget):
         else:
             QMessageBox.warning(self, "警告", "コピーするコードがありません")
 
+    def save_result(self):
+        """表示中のコードを出力形式の拡張子で保存する（表示欄ではなくバッファから書き出す）"""
+        if not self.resultText.toPlainText():
+            QMessageBox.warning(self, "警告", "保存するコードがありません")
+            return
+        format_name = dict(OUTPUT_FORMAT_LABELS)[self.resultFormat]
+        file_path, _ = QFileDialog.getSaveFileName(self, "コードを保存", "",
+                                                   f"{format_name} (*{FORMAT_EXTENSIONS[self.resultFormat]})")
+        if not file_path:
+            return
+        try:
+            self.resultText.save_to_file(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "エラー", f"保存に失敗しました: {e}")
+            return
+        if self.statusBar:
+            self.statusBar.showMessage(f"コードを {file_path} に保存しました", 3000)
+
     def excel_to_latex_universal(self, excel_file, sheet_name, cell_range, caption, label,
                                 position, show_value, add_borders=True):
-        """ExcelをLaTeXの表形式に変換する"""
+        """ExcelをLaTeXの表形式に変換する（変換本体はconverter、ここではエラーをダイアログ表示）"""
         try:
-            wb = load_workbook(excel_file, data_only=show_value)
-            ws = wb[sheet_name]
-        except Exception as e:
-            QMessageBox.critical(self, "エラー", f"Excelファイルの読み込みに失敗しました: {e}")
-            return ""
-
-        if cell_range:
-            try:
-                start_cell, end_cell = cell_range.split(':')
-                start_col_letter = ''.join(filter(str.isalpha, start_cell))
-                start_row = int(''.join(filter(str.isdigit, start_cell)))
-                end_col_letter = ''.join(filter(str.isalpha, end_cell))
-                end_row = int(''.join(filter(str.isdigit, end_cell)))
-                start_col = column_index_from_string(start_col_letter)
-                end_col = column_index_from_string(end_col_letter)
-                min_row, max_row = start_row, end_row
-                min_col, max_col = start_col, end_col
-            except Exception as e:
-                QMessageBox.warning(self, "警告", f"範囲の形式が正しくありません: {cell_range}\nエラー: {e}\n表にしたい範囲の左上のセルと右下のセルを指定してください.\n例: A1:E6")
-                return ""
-        else:
-            QMessageBox.warning(self, "警告", "セル範囲を指定してください")
+            return converter.excel_to_latex_universal(
+                excel_file, sheet_name, cell_range, caption, label, position,
+                show_value, add_borders
+            )
+        except TableConversionError as e:
+            if e.severity == 'warning':
+                QMessageBox.warning(self, e.title, e.message)
+            else:
+                QMessageBox.critical(self, e.title, e.message)
             return ""
 
-        merged_cells_map = {}
-        merged_cells_data = [] # 結合セルのデータ
-        for merged_range in ws.merged_cells.ranges:
-            min_r_m, max_r_m = merged_range.min_row, merged_range.max_row
-            min_c_m, max_c_m = merged_range.min_col, merged_range.max_col
-
-            if not (max_r_m < min_row or min_r_m > max_row or max_c_m < min_col or min_c_m > max_col):
-                eff_min_r = max(min_r_m, min_row)
-                eff_max_r = min(max_r_m, max_row)
-                eff_min_c = max(min_c_m, min_col)
-                eff_max_c = min(max_c_m, max_col)
-
-                cell_value = ws.cell(row=merged_range.min_row, column=merged_range.min_col).value
-                if cell_value is None: cell_value = ""
-                elif isinstance(cell_value, (int, float)) and cell_value == int(cell_value): cell_value = int(cell_value)
-                cell_value = str(cell_value)
-                for char in ['&', '%', '$', '#', '_', '{', '}', '~', '^', '\\']:
-                    if char in cell_value: cell_value = cell_value.replace(char, '\\' + char)
-
-                data = {
-                    'min_row': eff_min_r, 'max_row': eff_max_r, # セル範囲とmerge範囲の重なり
-                    'min_col': eff_min_c, 'max_col': eff_max_c,
-                    'rowspan': eff_max_r - eff_min_r + 1,
-                    'colspan': eff_max_c - eff_min_c + 1,
-                    'value': cell_value,
-                    'origin_min_row': merged_range.min_row, 
-                    'origin_min_col': merged_range.min_col,
-                    'origin_max_row': merged_range.max_row, 
-                    'origin_max_col': merged_range.max_col,
-                }
-                merged_cells_data.append(data)
-                merged_cells_map[(merged_range.min_row, merged_range.min_col)] = data # 絶座 -> 結合セルのデータ
-
-
-        # セルステータスと値の初期化
-        num_rows = max_row - min_row + 1
-        num_cols = max_col - min_col + 1
-        cell_status = [[0] * num_cols for _ in range(num_rows)] # 相対座標のステータス(0:通常, 1:結合左上, -1:結合続き)
-        cell_values = [[''] * num_cols for _ in range(num_rows)]
-        cell_origin = {} # (rel_r, rel_c) -> (origin_abs_r, origin_abs_c) of merged cell
-
-            # status -1含め全てにorigin_r, origin_cを設定
-        for data in merged_cells_data:
-            origin_r, origin_c = data['origin_min_row'], data['origin_min_col']
-            # Iterate through the *original* merge range to correctly identify status
-            for r_abs in range(data['origin_min_row'], data['origin_max_row'] + 1):
-                 for c_abs in range(data['origin_min_col'], data['origin_max_col'] + 1):
-                     if min_row <= r_abs <= max_row and min_col <= c_abs <= max_col: # 範囲内であれば
-                         rel_r, rel_c = r_abs - min_row, c_abs - min_col # 左上から見て何行目，何列目か（今後相対座標と呼ぶ）
-                         if r_abs == origin_r and c_abs == origin_c:
-                             cell_status[rel_r][rel_c] = 1 
-                         elif cell_status[rel_r][rel_c] == 0:
-                             cell_status[rel_r][rel_c] = -1
-                         cell_origin[(rel_r, rel_c)] = (origin_r, origin_c) #　相対座標->origin座標のマッピング
-
-
-        # status 0, 1のセルの値を抽出
-        for r_idx in range(num_rows):
-            for c_idx in range(num_cols):
-                if cell_status[r_idx][c_idx] >= 0: # 通常セル or 結合左上
-                    cell = ws.cell(row=r_idx + min_row, column=c_idx + min_col)
-                    value = cell.value
-                    if value is None: value = ""
-                    elif isinstance(value, (int, float)) and value == int(value): value = int(value) # valueErrorをinstanceで避ける
-                    value = str(value)
-                    for char in ['&', '%', '$', '#', '_', '{', '}', '~', '^', '\\']:
-                        if char in value: value = value.replace(char, '\\' + char)
-                    cell_values[r_idx][c_idx] = value # 相対座標の値
-
-        # LaTeX表の生成
-        latex = []
-        
-        latex.append(f"\\begin{{table}}[{position}]")
-        latex.append("    \\centering")
-        latex.append(f"    \\caption{{{caption}}}")
-        latex.append(f"    \\label{{{label}}}")
-
-        col_count = num_cols
-        col_format = "|" + "|".join(["c"] * col_count) + "|" if add_borders else "c" * col_count
-        latex.append(f"    \\begin{{tabular}}{{{col_format}}}")
-        if add_borders: 
-            latex.append("      \\hline")
-
-        # 各行のLaTeXコード生成
-        for r in range(num_rows):
-            cells_in_row = [] #cline,hline含め1行ずつ処理
-            col = 0
-            while col < num_cols:
-                if cell_status[r][col] == 1: # 結合セルの左上
-                    origin_r_abs, origin_c_abs = cell_origin.get((r, col), (r + min_row, col + min_col)) # 相座 -> 絶座(防御のためのgetであり通常は呼び出されないはず……
-                    cell_info = merged_cells_map.get((origin_r_abs, origin_c_abs)) # 絶座 -> 結合セルのデータ
-
-                    if cell_info:
-                        value = cell_info['value']
-                        # Calculate effective span based on *original* merge range adjusted to selection bounds
-                        eff_rowspan = min(cell_info['origin_max_row'], max_row) - (r + min_row) + 1
-                        eff_colspan = min(cell_info['origin_max_col'], max_col) - (col + min_col) + 1
-                        border_str = "{|c|}" if add_borders else "{c}"
-
-                        row_cmd = f"\\multirow{{{eff_rowspan}}}{{*}}" if eff_rowspan > 1 else ""
-                        col_cmd_start = f"\\multicolumn{{{eff_colspan}}}{border_str}" if eff_colspan > 1 else "" #ex) \multicolumn{3}{|c|}
-
-                        content = f"{row_cmd}{{{value}}}" if row_cmd else value #ex) \multirow{3}{*}{値}
-                        full_cmd = f"{col_cmd_start}{{{content}}}" if col_cmd_start else content
-                        cells_in_row.append(full_cmd)
-
-                        col += eff_colspan # スパン分列カウントを進める
-                    else: # Map error
-                        cells_in_row.append(cell_values[r][col])
-                        col += 1
-                elif cell_status[r][col] == -1: # 結合セルの他の部分
-                    origin_r_abs, origin_c_abs = cell_origin.get((r, col), (None, None))
-                    cell_info = merged_cells_map.get((origin_r_abs, origin_c_abs)) # status -1でもoriginなので参照可
-
-                    if cell_info:
-                        # 現座標がorigin_cか
-                        is_segment_start_col = (col + min_col == cell_info['min_col']) 
-                        # 現座標とlast_col含むセルのスパン
-                        segment_colspan = min(cell_info['max_col'], max_col) - (col + min_col) + 1
-
-                        if is_segment_start_col:
-                            # 末colじゃなければ
-                            if segment_colspan > 1:
-                                border_str = "{|c|}" if add_borders else "{c}"
-                                cells_in_row.append(f"\\multicolumn{{{segment_colspan}}}{border_str}{{}}")
-                                col += segment_colspan
-                            else:
-                                cells_in_row.append("") 
-                                col += 1
-                        else:
-                            col += 1
-                    else: # Map error
-                        cells_in_row.append("")
-                        col += 1
-                else: # 通常のセル(status 0)
-                    cells_in_row.append(cell_values[r][col])
-                    col += 1
-
-            row_str = f"      {' & '.join(cells_in_row)} \\\\" # 一行分のLaTeXコード最終
-
-            # \cline，\hline処理
-            line_command = ""
-            if add_borders:
-                # 末行
-                if r == num_rows - 1: 
-                    line_command = "\\hline"
-                else:
-                    needs_hline = True
-                    for c_next in range(num_cols):
-                        if cell_status[r + 1][c_next] == -1: # どっかにstatus -1があるか
-                            origin_r_abs, origin_c_abs = cell_origin.get((r + 1, c_next), (None, None))
-                            if origin_r_abs is not None and origin_r_abs <= r + min_row: # 結合セルの最終行の場合を弾く
-                                needs_hline = False
-                                break
-
-                    if needs_hline:
-                        line_command = "\\hline"
-                    else:
-                        # cline処理
-                        clines = []
-                        current_cline_start = -1
-                        for c in range(num_cols):
-                            is_continuation_below = False
-                            if cell_status[r + 1][c] == -1:
-                                origin_r_abs, origin_c_abs = cell_origin.get((r + 1, c), (None, None))
-                                if origin_r_abs is not None and origin_r_abs <= r + min_row:
-                                    is_continuation_below = True
-
-                            if not is_continuation_below: # 下線を引いて良い
-                                if current_cline_start == -1:
-                                    current_cline_start = c + 1 # 初回なので下線スタート列
-                            else: #下線を引いてはいけない
-                                if current_cline_start != -1:
-                                    clines.append(f"\\cline{{{current_cline_start}-{c}}}") # 現在の列まで（LaTeX換算では列は1から始まる）
-                                    current_cline_start = -1 # 次の下線スタート列のためにリセット
-
-                        # 末列まで下線ひいてはいけない
-                        if current_cline_start != -1:
-                            clines.append(f"\\cline{{{current_cline_start}-{num_cols}}}") # End at last col (1-based)
-
-                        if clines:
-                            line_command = " ".join(clines)
-
-            if line_command:
-                row_str += f" {line_command}"
-
-            latex.append(row_str)
-            # --- 罫線処理終了 ---
-
-        # 表の終了 (最後のhlineはループ内で処理される)
-        latex.append("    \\end{tabular}")
-        latex.append("\\end{table}")
-
-        return "\n".join(latex)
-
     def escape_latex_special_chars(self, text):
         """LaTeX特殊文字をエスケープ"""
-        special_chars = {
-            '&': '\\&',
-            '%': '\\%',
-            '$': '\\$',
-            '#': '\\#',
-            '^': '\\textasciicircum{}',
-            '_': '\\_',
-            '{': '\\{',
-            '}': '\\}',
-            '~': '\\textasciitilde{}',
-            '\\': '\\textbackslash{}',
-        }
-        
-        for char, escaped in special_chars.items():
-            text = text.replace(char, escaped)
-        
-        return text
+        return escape_latex(text)
 
 
 # For standalone execution
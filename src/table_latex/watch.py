@@ -0,0 +1,136 @@
+"""
+変換ジョブの監視リスト（ファイル更新時の差分再生成）\n
+- (ファイル, シート, 範囲, オプション) のジョブごとに，範囲の内容ハッシュを保持する\n
+- ファイルが更新されたら範囲を読み直し，ハッシュが変わったジョブだけを再変換する\n
+- Qtに依存しない（ファイルの監視はTableLatexTabのQFileSystemWatcherが行い，再生成はConversionWorkerで実行する）\n
+"""
+import hashlib
+import os
+
+from table_latex.converter import (ConversionCancelled, TableConversionError, load_grid, parse_cell_range,
+                                  render_grid)
+
+
+def range_content_hash(grid):
+    """範囲のセル値・結合セル・表示形式から求めたハッシュ（値の型も区別する）"""
+    digest = hashlib.blake2b(digest_size=16)
+    for row in grid.rows:
+        digest.update(repr([(type(value).__name__, value) for value in row]).encode('utf-8'))
+        digest.update(b'\n')
+    digest.update(repr(grid.merged_ranges).encode('utf-8'))
+    digest.update(repr(sorted(grid.formats.items())).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class WatchJob:
+    """
+    監視する変換ジョブ\n
+    - output: 書き出し先の.texファイル（Noneの場合はlatexに保持するだけ）\n
+    - content_hash: 最後に変換したときの範囲の内容ハッシュ\n
+    - limits: 読み込む前に確認する変換の規模の上限（ConversionLimits，Noneなら見積もらない）\n
+    """
+
+    def __init__(self, file_path, sheet_name, cell_range, caption, label, position,
+                 show_value, add_borders=True, output=None, limits=None):
+        self.file_path = os.path.abspath(file_path)
+        self.sheet_name = sheet_name
+        self.cell_range = cell_range
+        self.bounds = parse_cell_range(cell_range)
+        self.caption = caption
+        self.label = label
+        self.position = position
+        self.show_value = show_value
+        self.add_borders = add_borders
+        self.output = output
+        self.limits = limits
+        self.content_hash = None
+        self.latex = ""
+        self.error = None
+
+    def describe(self):
+        name = os.path.basename(self.file_path)
+        target = f" -> {os.path.basename(self.output)}" if self.output else ""
+        return f"{name}:{self.sheet_name}!{self.cell_range}{target}"
+
+    def refresh(self, progress=None):
+        """
+        -> 再変換したらTrue\n
+        - 範囲を読み直し，内容ハッシュが変わっていなければ再変換しない\n
+        - 読み込み・書き出しに失敗した場合や上限を超えた場合はerrorに設定してFalse\n
+        """
+        try:
+            grid = load_grid(self.file_path, self.sheet_name, self.cell_range, self.show_value, progress,
+                             self.limits)
+        except ConversionCancelled:
+            raise
+        except TableConversionError as e:
+            # 保存途中のファイルは読めないことがある（次の更新で再試行する）
+            self.error = e
+            return False
+        self.error = None
+
+        content_hash = range_content_hash(grid)
+        if content_hash == self.content_hash:
+            return False
+        self.latex = render_grid(grid, self.caption, self.label, self.position, self.add_borders, progress)
+        if self.output:
+            try:
+                with open(self.output, 'w', encoding='utf-8') as f:
+                    f.write(self.latex + '\n')
+            except OSError as e:
+                self.error = TableConversionError(f"出力ファイルに書き込めません: {e}")
+                return False
+        self.content_hash = content_hash
+        return True
+
+
+class WatchList:
+    """監視中のジョブの一覧（ファイルごとに引ける）"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def add(self, job, progress=None):
+        """
+        -> job\n
+        - 初回の変換を行い，成功したらジョブを追加する（失敗した場合はjob.errorを設定して追加しない）\n
+        """
+        job.refresh(progress)
+        if job.error is None:
+            self.jobs.append(job)
+        return job
+
+    def remove(self, job):
+        self.jobs.remove(job)
+
+    def files(self):
+        """監視が必要なファイルの一覧（重複なし）"""
+        return sorted({job.file_path for job in self.jobs})
+
+    def jobs_for_file(self, file_path):
+        file_path = os.path.abspath(file_path)
+        return [job for job in self.jobs if job.file_path == file_path]
+
+    def file_changed(self, file_path, progress=None):
+        """
+        -> (再変換したジョブ, 読み込みに失敗したジョブ)\n
+        - 更新されたファイルのジョブのうち，範囲の内容が変わったものだけを再変換する\n
+        """
+        return self.files_changed([file_path], progress)
+
+    def files_changed(self, file_paths, progress=None):
+        """
+        -> (再変換したジョブ, 失敗したジョブ)\n
+        - 複数のファイルの更新をまとめて処理する（画面側はこれをConversionWorkerで実行する）\n
+        """
+        changed, failed = [], []
+        for file_path in file_paths:
+            for job in self.jobs_for_file(file_path):
+                if job.refresh(progress):
+                    changed.append(job)
+                elif job.error is not None:
+                    failed.append(job)
+        return changed, failed
@@ -0,0 +1,232 @@
+"""
+ブック全体の一括出力\n
+- シート・名前の定義・Excelのテーブルをすべて探し，それぞれを1つの.texファイルに変換する\n
+- ブックの解析は各シート1回だけ行い，LaTeXの生成はプロセスプールで並列に行う\n
+"""
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from openpyxl.utils.cell import range_to_tuple
+
+from common.backends import open_workbook
+from common.formula import evaluate_cells
+from common.latex_escape import escape_latex
+from common.merges import MergeIndex
+from common.reader import SheetGrid
+from common.used_range import range_string
+from table_latex.converter import ConversionCancelled, TableConversionError, WorkbookLoadError, _report, render_grid
+
+TARGET_KINDS = ('sheet', 'name', 'table')
+_UNSAFE_CHARS_RE = re.compile(r'[^\w\-]+')
+
+
+class SheetData:
+    """
+    1シート分の解析結果\n
+    - cells: {行: {列: 値}}（値のあるセルのみ）\n
+    - merge_index: シート全体の結合セルのインデックス\n
+    - formats: {(行, 列): 表示形式}（General以外のセルのみ）\n
+    """
+
+    def __init__(self, cells, merged_ranges, formats=None):
+        self.cells = cells
+        self.merge_index = MergeIndex(merged_ranges)
+        self.formats = formats if formats is not None else {}
+
+    def used_range(self):
+        """
+        -> (min_row, max_row, min_col, max_col)，空のシートはNone\n
+        - 値のあるセルと結合セルを囲む最小の範囲\n
+        """
+        rows = [row for row, values in self.cells.items() if values]
+        cols = [col for values in self.cells.values() for col in values]
+        for m_min_r, m_min_c, m_max_r, m_max_c in self.merge_index.ranges:
+            rows += (m_min_r, m_max_r)
+            cols += (m_min_c, m_max_c)
+        if not rows:
+            return None
+        return min(rows), max(rows), min(cols), max(cols)
+
+    def grid(self, min_row, max_row, min_col, max_col):
+        """範囲を切り出したSheetGrid"""
+        rows = []
+        for row in range(min_row, max_row + 1):
+            values = self.cells.get(row, {})
+            rows.append([values.get(col) for col in range(min_col, max_col + 1)])
+        merged_ranges = self.merge_index.overlapping_ranges(min_row, max_row, min_col, max_col)
+        formats = {(row - min_row, col - min_col): number_format
+                   for (row, col), number_format in self.formats.items()
+                   if min_row <= row <= max_row and min_col <= col <= max_col}
+        return SheetGrid(min_row, max_row, min_col, max_col, rows, merged_ranges, formats)
+
+
+def read_sheet_data(book, sheet_name, data_only=True):
+    """シート全体を1回だけストリーム解析する"""
+    cells = {}
+    formats = {}
+    uncached = set() if data_only else None
+    for row, values in book.iter_rows(sheet_name, data_only=data_only, formats=formats, uncached=uncached):
+        values = {col: value for col, value in values.items() if value is not None and value != ''}
+        if values:
+            cells[row] = values
+    if uncached:  # キャッシュ値のない数式セルを計算する
+        for (row, col), value in evaluate_cells(book, sheet_name, uncached).items():
+            if value is not None and value != '':
+                cells.setdefault(row, {})[col] = value
+    return SheetData(cells, book.iter_merged_ranges(sheet_name), formats)
+
+
+def _clamp(bounds, used):
+    """
+    -> (min_row, max_row, min_col, max_col)，使用範囲と重ならなければNone\n
+    - 列全体(A:C)・行全体(1:3)の参照はシートの使用範囲に切り詰める\n
+    """
+    min_col, min_row, max_col, max_row = bounds
+    if used is None:
+        return None
+    u_min_r, u_max_r, u_min_c, u_max_c = used
+    min_row = u_min_r if min_row is None else min_row
+    max_row = u_max_r if max_row is None else min(max_row, u_max_r)
+    min_col = u_min_c if min_col is None else min_col
+    max_col = u_max_c if max_col is None else min(max_col, u_max_c)
+    if min_row > max_row or min_col > max_col:
+        return None
+    return min_row, max_row, min_col, max_col
+
+
+def find_targets(book, sheets, kinds=TARGET_KINDS):
+    """
+    -> [{'kind', 'name', 'sheet', 'bounds'}, ...]\n
+    - sheets: {シート名: SheetData}\n
+    - 非表示の名前(_xlnm._FilterDatabase など)・複数範囲・定数や数式の名前は対象外\n
+    """
+    targets = []
+    if 'sheet' in kinds:
+        for sheet_name in book.sheet_names:
+            used = sheets[sheet_name].used_range()
+            if used is not None:
+                targets.append({'kind': 'sheet', 'name': sheet_name, 'sheet': sheet_name, 'bounds': used})
+
+    if 'name' in kinds:
+        for defined in book.defined_names:
+            if defined['hidden'] or defined['name'].startswith('_xlnm.') or ',' in defined['value']:
+                continue
+            try:
+                sheet_name, bounds = range_to_tuple(defined['value'])
+            except (ValueError, TypeError):
+                continue  # セル範囲ではない名前
+            sheet_name = sheet_name.replace("''", "'")
+            if sheet_name not in sheets:
+                continue
+            clamped = _clamp(bounds, sheets[sheet_name].used_range())
+            if clamped is not None:
+                targets.append({'kind': 'name', 'name': defined['name'], 'sheet': sheet_name, 'bounds': clamped})
+
+    if 'table' in kinds:
+        for sheet_name in book.sheet_names:
+            for table in book.sheet_tables(sheet_name):
+                try:
+                    sheet_ref, bounds = range_to_tuple(f"'{sheet_name}'!{table['ref']}")
+                except (ValueError, TypeError):
+                    continue
+                min_col, min_row, max_col, max_row = bounds
+                targets.append({'kind': 'table', 'name': table['display_name'], 'sheet': sheet_name,
+                                'bounds': (min_row, max_row, min_col, max_col)})
+    return targets
+
+
+def safe_name(name):
+    """ファイル名・ラベルに使える名前（記号と空白は_に置き換える）"""
+    return _UNSAFE_CHARS_RE.sub('_', name).strip('_') or 'table'
+
+
+def _render_target(job):
+    """1つの対象をLaTeXに変換して書き出す（プロセスプールから呼ばれる）"""
+    result = {key: job[key] for key in ('index', 'kind', 'name', 'sheet', 'range', 'output')}
+    result.update(ok=False, elapsed=0.0, error=None)
+    start = time.perf_counter()
+    try:
+        latex_code = render_grid(job['grid'], job['caption'], job['label'], job['position'], job['add_borders'])
+        with open(job['output'], 'w', encoding='utf-8') as f:
+            f.write(latex_code + '\n')
+        result['ok'] = True
+    except TableConversionError as e:
+        result['error'] = e.to_dict()
+    except Exception as e:
+        result['error'] = {
+            'type': type(e).__name__,
+            'title': 'エラー',
+            'severity': 'critical',
+            'message': str(e),
+        }
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+
+def export_workbook(excel_file, output_dir, position='H', show_value=True, add_borders=True,
+                    kinds=TARGET_KINDS, max_workers=None, progress=None):
+    """
+    -> results\n
+    - ブック内のシート・名前の定義・テーブルを output_dir/<種別>_<名前>.tex に書き出す\n
+    - 各シートは1回だけ解析し，変換はプロセスプールで並列に行う（max_workers=1 の場合は逐次実行）\n
+    - 結果は対象ごとの辞書(index, kind, name, sheet, range, output, ok, elapsed, error)のリスト\n
+    - progress(stage, fraction): シートの読み込み('load')と書き出し('emit')の進捗（ConversionCancelledで中止）\n
+    """
+    try:
+        with open_workbook(excel_file) as book:
+            sheets = {}
+            sheet_names = book.sheet_names
+            for i, name in enumerate(sheet_names):
+                _report(progress, 'load', i / len(sheet_names))
+                sheets[name] = read_sheet_data(book, name, data_only=show_value)
+            targets = find_targets(book, sheets, kinds)
+    except ConversionCancelled:
+        raise
+    except Exception as e:
+        raise WorkbookLoadError(f"Excelファイルの読み込みに失敗しました: {e}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    used_names = set()
+    for index, target in enumerate(targets):
+        base = f"{target['kind']}_{safe_name(target['name'])}"
+        file_name, suffix = base, 2
+        while file_name in used_names:  # 記号の置き換えで名前が重なった場合
+            file_name = f"{base}_{suffix}"
+            suffix += 1
+        used_names.add(file_name)
+
+        jobs.append({
+            'index': index,
+            'kind': target['kind'],
+            'name': target['name'],
+            'sheet': target['sheet'],
+            'range': range_string(*target['bounds']),
+            'output': os.path.join(output_dir, file_name + '.tex'),
+            'grid': sheets[target['sheet']].grid(*target['bounds']),
+            'caption': escape_latex(target['name']),
+            'label': f"tab:{file_name}",
+            'position': position,
+            'add_borders': add_borders,
+        })
+
+    results = []
+    if max_workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            _report(progress, 'emit', len(results) / len(jobs))
+            results.append(_render_target(job))
+        return results
+    # GUIのワーカースレッドから呼ばれるので，スレッドの多いプロセスをforkせずspawnで起動する
+    # （凍結したWindows版と同じ起動方法．app.pyのfreeze_supportと対応）
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        for result in executor.map(_render_target, jobs):
+            results.append(result)
+            _report(progress, 'emit', len(results) / len(jobs))
+    finally:
+        # 中止された場合は，まだ始まっていない対象を実行せずに終える
+        executor.shutdown(cancel_futures=True)
+    return results
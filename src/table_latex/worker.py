@@ -0,0 +1,82 @@
+"""
+表変換のバックグラウンド実行（QThreadPool）\n
+- 読み込み・結合セルの解析・LaTeX生成の進捗をシグナルで通知する\n
+- cancel()を呼ぶと，次の進捗通知の時点で変換を中止する\n
+"""
+import threading
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from table_latex import converter
+from table_latex.converter import ConversionCancelled, TableConversionError
+
+STAGE_LABELS = {
+    'check': "変換の規模を見積もっています...",
+    'load': "Excelファイルを読み込んでいます...",
+    'merge': "結合セルを解析しています...",
+    'emit': "LaTeXコードを生成しています...",
+}
+
+
+class ConversionSignals(QObject):
+    """
+    ConversionWorkerのシグナル（QRunnableはシグナルを持てないため別クラス）\n
+    - progress(stage, percent)\n
+    - finished(結果): 変換関数の戻り値（LaTeXコード．一括出力ではexport_workbookの結果のリスト）\n
+    - failed(TableConversionError) / cancelled()\n
+    - crashed(traceback文字列): 想定外の例外\n
+    """
+    progress = pyqtSignal(str, int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    crashed = pyqtSignal(str)
+
+
+class ConversionWorker(QRunnable):
+    """
+    converter.excel_to_latex_universal をワーカースレッドで実行する\n
+    - target: 実行する変換関数（ファイルに直接出力する場合は converter.excel_to_latex_file）\n
+    """
+
+    def __init__(self, *args, target=None, **kwargs):
+        super().__init__()
+        self.target = target or converter.excel_to_latex_universal
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = ConversionSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _progress(self, stage, fraction):
+        if self._cancel_event.is_set():
+            raise ConversionCancelled()
+        self.signals.progress.emit(stage, int(fraction * 100))
+
+    def run(self):
+        try:
+            result = self.target(*self.args, progress=self._progress, **self.kwargs)
+        except ConversionCancelled:
+            self._emit('cancelled')
+        except TableConversionError as e:
+            self._emit('failed', e)
+        except Exception:
+            self._emit('crashed', traceback.format_exc())
+        else:
+            if self._cancel_event.is_set():
+                self._emit('cancelled')
+            else:
+                self._emit('finished', result)
+
+    def _emit(self, name, *args):
+        try:
+            getattr(self.signals, name).emit(*args)
+        except RuntimeError:
+            pass  # 中止後に画面側が参照を手放し，シグナルが破棄された後に終わった
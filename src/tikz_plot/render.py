@@ -0,0 +1,716 @@
+"""
+TikZ/pgfplotsのグラフの生成（Qt非依存）\n
+- グラフ全体の設定(PlotSpec)とデータセット(DatasetSpec)から，figure環境のLaTeXコードを生成する\n
+- 色はRGBのタプル(0〜255)で受け取り，警告は画面に出さずRenderResult.warningsに入れて返す\n
+- GUIを起動せずにスクリプトやワーカープロセスから呼び出せる（仕様はpickleできる）\n
+
+使用例::
+
+    spec = PlotSpec([DatasetSpec('測定値', x=[0, 1, 2], y=[0, 1, 4], color=(255, 0, 0))], x_label='$t$')
+    result = render_plot(spec)
+    print(result.latex, result.warnings)
+"""
+import math
+
+from common.latex_escape import escape_latex_text
+
+# TikZの色名で出力する色（それ以外の色はRGBで指定する）
+NAMED_COLORS = {
+    (255, 0, 0): 'red',
+    (0, 128, 0): 'green',
+    (0, 0, 255): 'blue',
+    (0, 0, 0): 'black',
+    (255, 255, 0): 'yellow',
+    (0, 255, 255): 'cyan',
+    (255, 0, 255): 'magenta',
+    (255, 165, 0): 'orange',
+    (128, 0, 128): 'purple',
+    (165, 42, 42): 'brown',
+    (128, 128, 128): 'gray',
+}
+COLOR_NAMES = {name: rgb for rgb, name in NAMED_COLORS.items()}
+
+PLOT_TYPES = ('line', 'scatter', 'line_scatter', 'bar')
+SCALE_TYPES = ('normal', 'logx', 'logy', 'loglog')
+TANGENT_STYLES = {'実線': '', '点線': 'dotted', '破線': 'dashed', '一点鎖線': 'dashdotted'}
+COORDINATES_PER_LINE = 20  # coordinatesの1行あたりの点の数
+
+
+def parse_color(value):
+    """
+    -> (r, g, b)（0〜255の整数）\n
+    - value: (r, g, b)・「#rrggbb」・NAMED_COLORSの色名（'red'など）\n
+    """
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in COLOR_NAMES:
+            return COLOR_NAMES[text]
+        if len(text) == 7 and text.startswith('#'):
+            try:
+                return tuple(int(text[i:i + 2], 16) for i in (1, 3, 5))
+            except ValueError:
+                pass
+        raise ValueError(f"色の指定が正しくありません: {value!r}（(r, g, b)・#rrggbb・色名で指定してください）")
+    try:
+        r, g, b = (int(component) for component in value)
+    except (TypeError, ValueError):
+        raise ValueError(f"色の指定が正しくありません: {value!r}（(r, g, b)・#rrggbb・色名で指定してください）")
+    if not all(0 <= component <= 255 for component in (r, g, b)):
+        raise ValueError(f"色の成分は0〜255で指定してください: {value!r}")
+    return r, g, b
+
+
+def color_to_tikz(rgb):
+    """(r, g, b) -> \\addplotのオプションに入れる色（'red' または 'color = {rgb,255:red,..;green,..;blue,..}'）"""
+    r, g, b = rgb
+    name = NAMED_COLORS.get((r, g, b))
+    if name is not None:
+        return name
+    return f"color = {{rgb,255:red,{r};green,{g};blue,{b}}}"
+
+
+class SpecialPoint:
+    """
+    特殊点（点をマークし，軸への垂線と座標値を描く）\n
+    - color: TikZの色名\n
+    - coord_display: 'なし'・'X座標'・'Y座標'・'X,Y座標'（「（値も表示）」を付けると目盛りにない座標値も書く）\n
+    """
+
+    def __init__(self, x, y, color='red', coord_display='なし'):
+        self.x = x
+        self.y = y
+        self.color = color
+        self.coord_display = coord_display
+
+
+class Annotation:
+    """
+    注釈（テキスト）\n
+    - color: TikZの色名，position: TikZのアンカー（'south west'など）\n
+    """
+
+    def __init__(self, x, y, text, color='black', position='south east'):
+        self.x = x
+        self.y = y
+        self.text = text
+        self.color = color
+        self.position = position
+
+
+class Tangent:
+    """
+    数式のデータセットに描く接線\n
+    - x: 接点のx座標，length: 接線を描くxの幅\n
+    - style: TANGENT_STYLESのキー（'実線'・'点線'・'破線'・'一点鎖線'）\n
+    - show_equation: 接線の方程式をグラフに書く\n
+    """
+
+    def __init__(self, x=1, length=2, color=(255, 0, 0), style='実線', show_equation=False):
+        self.x = x
+        self.length = length
+        self.color = parse_color(color)
+        self.style = style
+        self.show_equation = show_equation
+
+
+class DatasetSpec:
+    """
+    1つのデータセット\n
+    - source: 'measured'（x, yの点列）または 'formula'（equationをdomain_min〜domain_maxで描く）\n
+    - plot_type: PLOT_TYPESのいずれか（measuredのみ）\n
+    - color: (r, g, b)・#rrggbb・色名\n
+    - legend_label: Noneならnameを凡例に使う\n
+    - tangent: Tangent（formulaのみ．Noneなら描かない）\n
+    """
+
+    def __init__(self, name, x=(), y=(), source='measured', color=(0, 0, 255), line_width=1.0, marker_style='*',
+                 marker_size=2.0, plot_type='line', legend_label=None, show_legend=True, equation='',
+                 domain_min=0, domain_max=10, samples=200, special_points=(), annotations=(), tangent=None):
+        if source not in ('measured', 'formula'):
+            raise ValueError(f"データの種類は 'measured' または 'formula' で指定してください: {source!r}")
+        self.name = name
+        self.x = list(x)
+        self.y = list(y)
+        self.source = source
+        self.color = parse_color(color)
+        self.line_width = line_width
+        self.marker_style = marker_style
+        self.marker_size = marker_size
+        self.plot_type = plot_type
+        self.legend_label = name if legend_label is None else legend_label
+        self.show_legend = show_legend
+        self.equation = equation
+        self.domain_min = domain_min
+        self.domain_max = domain_max
+        self.samples = samples
+        self.special_points = list(special_points)
+        self.annotations = list(annotations)
+        self.tangent = tangent
+
+    @classmethod
+    def from_dict(cls, dataset):
+        """
+        GUIのデータセット(dict)から作る\n
+        - 色は (r, g, b)・#rrggbb・色名，特殊点・注釈はタプル (x, y, 色, 表示) / (x, y, テキスト, 色, 位置)\n
+        """
+        tangent = None
+        if dataset.get('show_tangent', False):
+            tangent = Tangent(dataset.get('tangent_x', 1), dataset.get('tangent_length', 2),
+                              dataset.get('tangent_color', 'red'), dataset.get('tangent_style', '実線'),
+                              dataset.get('show_tangent_equation', False))
+        return cls(
+            dataset.get('name', ''), dataset.get('data_x', []), dataset.get('data_y', []),
+            source=dataset.get('data_source_type', 'measured'),
+            color=dataset.get('color', 'blue'),
+            line_width=dataset.get('line_width', 1.0),
+            marker_style=dataset.get('marker_style', '*'),
+            marker_size=dataset.get('marker_size', 2.0),
+            plot_type=dataset.get('plot_type', 'line'),
+            legend_label=dataset.get('legend_label'),
+            show_legend=dataset.get('show_legend', True),
+            equation=dataset.get('equation', ''),
+            domain_min=dataset.get('domain_min', 0),
+            domain_max=dataset.get('domain_max', 10),
+            samples=dataset.get('samples', 200),
+            special_points=[SpecialPoint(*point) for point in dataset.get('special_points', [])],
+            annotations=[Annotation(*annotation) for annotation in dataset.get('annotations', [])],
+            tangent=tangent,
+        )
+
+    def is_empty(self):
+        """描くものがない（数式が空・点がない）"""
+        if self.source == 'formula':
+            return not self.equation
+        return not self.x or not self.y
+
+
+class PlotSpec:
+    """
+    グラフ全体の設定\n
+    - x_min〜x_max, y_min〜y_max: 軸の範囲（データがはみ出す場合は広げる）\n
+    - scale_type: SCALE_TYPESのいずれか（'logx'・'logy'・'loglog'は対数軸）\n
+    - x_tick_step, y_tick_step: 目盛りの間隔\n
+    - width, height: \\textwidthに対する幅・高さ\n
+    """
+
+    def __init__(self, datasets, x_label='x軸', y_label='y軸', x_min=0, x_max=10, y_min=0, y_max=10, grid=True,
+                 show_legend=True, legend_pos='north east', width=0.8, height=0.6, caption='グラフのキャプション',
+                 label='fig:tikz_plot', position='H', scale_type='normal', x_tick_step=1.0, y_tick_step=1.0):
+        if scale_type not in SCALE_TYPES:
+            raise ValueError(f"軸の種類は {', '.join(SCALE_TYPES)} のいずれかで指定してください: {scale_type!r}")
+        self.datasets = list(datasets)
+        self.x_label = x_label
+        self.y_label = y_label
+        self.x_min = x_min
+        self.x_max = x_max
+        self.y_min = y_min
+        self.y_max = y_max
+        self.grid = grid
+        self.show_legend = show_legend
+        self.legend_pos = legend_pos
+        self.width = width
+        self.height = height
+        self.caption = caption
+        self.label = label
+        self.position = position
+        self.scale_type = scale_type
+        self.x_tick_step = x_tick_step
+        self.y_tick_step = y_tick_step
+
+    @classmethod
+    def from_settings(cls, settings, datasets, x_tick_step=1.0, y_tick_step=1.0):
+        """GUIのグラフ全体の設定(dict)とデータセット(dictまたはDatasetSpec)のリストから作る"""
+        datasets = [dataset if isinstance(dataset, DatasetSpec) else DatasetSpec.from_dict(dataset)
+                    for dataset in datasets]
+        keys = ('x_label', 'y_label', 'x_min', 'x_max', 'y_min', 'y_max', 'grid', 'show_legend', 'legend_pos',
+                'width', 'height', 'caption', 'label', 'position', 'scale_type')
+        return cls(datasets, x_tick_step=x_tick_step, y_tick_step=y_tick_step,
+                   **{key: settings[key] for key in keys if key in settings})
+
+    @property
+    def is_xlog(self):
+        return self.scale_type in ('logx', 'loglog')
+
+    @property
+    def is_ylog(self):
+        return self.scale_type in ('logy', 'loglog')
+
+
+class RenderResult:
+    """
+    生成結果\n
+    - latex: figure環境のLaTeXコード\n
+    - warnings: 警告のリスト（対数軸で除外した点・範囲外の接点・接線の計算エラーなど）\n
+    """
+
+    def __init__(self, latex, warnings):
+        self.latex = latex
+        self.warnings = warnings
+
+
+def _evaluate(python_formula, x):
+    """数式（Pythonの式．mathだけを使える）のxに値を入れて計算する"""
+    return eval(python_formula.replace('x', str(x)), {"__builtins__": {}}, {"math": math})
+
+
+def _data_range(spec, all_x_values, all_y_values):
+    """-> (x_min, x_max, y_min, y_max)．データが軸の範囲からはみ出す場合は10%の余裕を持たせて広げる"""
+    x_min, x_max, y_min, y_max = spec.x_min, spec.x_max, spec.y_min, spec.y_max
+    if not (all_x_values and all_y_values):
+        return x_min, x_max, y_min, y_max
+
+    data_x_min = min(all_x_values)
+    data_x_max = max(all_x_values)
+    data_y_min = min(all_y_values)
+    data_y_max = max(all_y_values)
+
+    # データ数1
+    if abs(data_x_max - data_x_min) < 1e-10:
+        data_x_min -= 0.5 if abs(data_x_min) > 1 else 0.1
+        data_x_max += 0.5 if abs(data_x_max) > 1 else 0.1
+    if abs(data_y_max - data_y_min) < 1e-10:
+        data_y_min -= 0.5 if abs(data_y_min) > 1 else 0.1
+        data_y_max += 0.5 if abs(data_y_max) > 1 else 0.1
+
+    # 軸の範囲を越える時の調整(10%余裕持たせる)
+    if x_min > data_x_min:
+        x_min = data_x_min - abs(data_x_min) * 0.1 - 0.1
+    if x_max < data_x_max:
+        x_max = data_x_max + abs(data_x_max) * 0.1 + 0.1
+    if y_min > data_y_min:
+        y_min = data_y_min - abs(data_y_min) * 0.1 - 0.1
+    if y_max < data_y_max:
+        y_max = data_y_max + abs(data_y_max) * 0.1 + 0.1
+
+    # 小さすぎる値を補正
+    if abs(y_min) < 1e-10:
+        y_min = -0.1
+    if abs(y_max) < 1e-10:
+        y_max = 0.1
+    if abs(x_min) < 1e-10:
+        x_min = -0.1
+    if abs(x_max) < 1e-10:
+        x_max = 0.1
+
+    if abs(x_min - x_max) < 1e-10:
+        x_min -= 0.5
+        x_max += 0.5
+    if abs(y_min - y_max) < 1e-10:
+        y_min -= 0.5
+        y_max += 0.5
+
+    # 軸の範囲が小さい時
+    if abs(x_max - x_min) < 1e-3:
+        margin = abs(x_min) * 0.2 if abs(x_min) > 1e-10 else 0.1
+        x_min -= margin
+        x_max += margin
+    if abs(y_max - y_min) < 1e-3:
+        margin = abs(y_min) * 0.2 if abs(y_min) > 1e-10 else 0.1
+        y_min -= margin
+        y_max += margin
+    return x_min, x_max, y_min, y_max
+
+
+def _tick_values(axis_min, axis_max, tick_step):
+    """軸の範囲に入る目盛りの値"""
+    values = []
+    tick_min = math.ceil(axis_min / tick_step) * tick_step
+    tick_max = math.floor(axis_max / tick_step) * tick_step
+    current = tick_min
+    while current <= tick_max:
+        values.append(current)
+        current += tick_step
+    return values
+
+
+def _log_min(axis_min, values):
+    """対数軸の最小値（データの最小値の1桁下から始める）"""
+    positive = [value for value in values if value > 0]
+    if positive:
+        return 10 ** math.floor(math.log10(min(positive)))
+    return 0.1
+
+
+def _ticks(is_log, axis_min, axis_max, tick_values, tick_step):
+    """xtick / ytickに書く値の列"""
+    if is_log:
+        # 指数部分
+        log_min = math.floor(math.log10(max(axis_min, 1e-10)))
+        log_max = math.ceil(math.log10(max(axis_max, 1e-10)))
+        return ','.join(str(10**i) for i in range(log_min, log_max + 1))
+    if tick_values:
+        return ','.join(str(round(tick, 8)) for tick in tick_values)
+    if abs(axis_max - axis_min) < 1e-10 or tick_step < 1e-10:
+        return str(round(axis_min, 8))
+    steps = max(1, min(20, int((axis_max - axis_min) / tick_step) + 1))  # 最大20ステップに制限
+    return ','.join(str(round(axis_min + i * tick_step, 8)) for i in range(steps))
+
+
+def _is_tick_value(val, tick_min, tick_max, tick_step, tol=1e-6):
+    if tick_step is None or tick_step <= 0:
+        return False
+    n = round((val - tick_min) / tick_step)  # roundなので整数値になりnとtick_valは同じはず
+    tick_val = tick_min + n * tick_step
+    return abs(val - tick_val) < tol and tick_min <= val <= tick_max
+
+
+def _append_coordinates(latex, coordinates):
+    # 1行に20個ずつ
+    for i in range(0, len(coordinates), COORDINATES_PER_LINE):
+        chunk = coordinates[i:i + COORDINATES_PER_LINE]
+        latex.append(f"            {' '.join(chunk)}")
+
+
+def _append_measured(latex, dataset, index, data_x, data_y, show_legend, legend_label):
+    """実測値のデータセット（線・点・棒）"""
+    coordinates = [f"({round(x,3)}, {round(y,3)})" for x, y in zip(data_x, data_y)]
+    if not coordinates:
+        return
+
+    tikz_color = color_to_tikz(dataset.color)
+    plot_type = dataset.plot_type
+
+    # 線
+    if plot_type == "line" or plot_type == "line_scatter":
+        plot_options = [tikz_color, f"line width={dataset.line_width}pt", "thick"]
+        latex.append(f"        % データセット[ {dataset.name} ] （線）")
+        latex.append(f"        \\addplot[{', '.join(plot_options)}] coordinates {{")
+        _append_coordinates(latex, coordinates)
+        latex.append("        };")
+        if show_legend:
+            latex.append(f"        \\addlegendentry{{{legend_label}}}")
+
+    # 点
+    if plot_type == "scatter" or plot_type == "line_scatter":
+        scatter_options = ["only marks", f"mark={dataset.marker_style}", tikz_color,
+                           f"mark size={dataset.marker_size}"]
+        latex.append(f"        % データセット{index+1}: {dataset.name} （点）")
+        latex.append(f"        \\addplot[{', '.join(scatter_options)}] coordinates {{")
+        _append_coordinates(latex, coordinates)
+        latex.append("        };")
+        if show_legend and plot_type == "scatter":  # line_scatterの場合は既出
+            latex.append(f"        \\addlegendentry{{{legend_label}}}")
+
+    # 棒グラフ
+    if plot_type == "bar":
+        bar_options = ["ybar", tikz_color, f"fill={tikz_color.replace('color = ', '')}"]  # fill=color = ... ではなく fill=...
+        latex.append(f"        % データセット[ {dataset.name} ] （棒グラフ）")
+        latex.append(f"        \\addplot[{', '.join(bar_options)}] coordinates {{")
+        _append_coordinates(latex, coordinates)
+        latex.append("        };")
+        if show_legend:
+            latex.append(f"        \\addlegendentry{{{legend_label}}}")
+
+
+def _append_formula(latex, warnings, spec, dataset, show_legend, legend_label):
+    """数式のデータセット（理論曲線と接線）"""
+    equation = dataset.equation
+    domain_min = dataset.domain_min
+    domain_max = dataset.domain_max
+
+    if spec.is_xlog and domain_min <= 0:
+        latex.append("        % 警告: X軸が対数スケールのため、数式のxの範囲が調整されました")
+        domain_min = max(0.01, domain_min)
+
+    if not equation.strip():
+        return
+
+    # 理論曲線のオプション
+    theory_options = [f"domain={domain_min}:{domain_max}", f"samples={dataset.samples}", "smooth", "thick",
+                      color_to_tikz(dataset.color), f"line width={dataset.line_width}pt"]
+
+    latex.append(f"        % データセット[ {dataset.name} ] （数式: {equation}）")
+    latex.append(f"        \\addplot[{', '.join(theory_options)}] {{")
+    latex.append(f"            {equation}")
+    latex.append("        };")
+
+    if show_legend:
+        latex.append(f"        \\addlegendentry{{{legend_label}}}")
+
+    if dataset.tangent is not None:
+        _append_tangent(latex, warnings, spec, dataset, show_legend, legend_label)
+
+
+def _append_tangent(latex, warnings, spec, dataset, show_legend, legend_label):
+    tangent = dataset.tangent
+    tangent_x = tangent.x
+    tangent_length = tangent.length
+    tangent_color = color_to_tikz(tangent.color)
+
+    #*==========================接線===============================
+    tangent_options = []
+    line_style = TANGENT_STYLES.get(tangent.style, "")
+    if line_style:
+        tangent_options.append(line_style)
+    tangent_options.append("thick")
+    tangent_options.append(tangent_color)
+    tangent_options.append(f"line width={dataset.line_width}pt")
+
+    latex.append(f"        % 接線 [ {dataset.name} ]")
+
+    formula = dataset.equation
+    x_val = tangent_x
+    try:
+        python_formula = formula.replace('^', '**')
+
+        # 範囲の判定は，データに合わせて広げる前の設定値で行う
+        y_min = spec.y_min
+        y_max = spec.y_max
+
+        y_val = _evaluate(python_formula, x_val)
+
+        if y_val < y_min or y_val > y_max:
+            latex.append(f"        % 計算されたy値 ({round(y_val,3)}) がグラフ範囲外です．")
+            warnings.append(f"警告: 点 (x={round(x_val,3)}) の計算値 (y={round(y_val,3)}) がグラフ範囲外です")
+
+        # 接点
+        point_code = f"""        % 接点をマーク
+        \\addplot[only marks, mark=*, {tangent_color}, mark size=3] coordinates {{({x_val}, {y_val})}};\n"""
+        latex.append(point_code)
+
+        # 中心差分法で傾き計算
+        dx = 0.0001
+        left_x = x_val - dx
+        right_x = x_val + dx
+
+        try:
+            # y_1:左  y_2:右
+            y1 = _evaluate(python_formula, left_x)
+            y2 = _evaluate(python_formula, right_x)
+            slope = (y2 - y1) / (2 * dx)
+        except Exception as inner_e:
+            latex.append(f"        % 接線の微分計算でエラー: {str(inner_e)}. 中央差分法を使用できないため、前方差分法を試みます。")
+            # 前方差分法を試みる
+            try:
+                forward_x = x_val + dx
+                y_current = y_val
+                y_forward = _evaluate(python_formula, forward_x)
+                slope = (y_forward - y_current) / dx
+            except Exception as e2:
+                # 基本的に起こらない
+                latex.append(f"        % 前方差分も失敗。デフォルトの傾き 1 を使用します。エラー: {str(e2)}")
+                slope = 1.0
+
+        #  y = mx + b
+        slope_rounded = round(slope, 3)  # 傾き項(m)
+        intercept = round(y_val - slope * x_val, 3)  # 切片(b)
+        equation_text = f"y = {slope_rounded}x + {intercept}" if intercept >= 0 else f"y = {slope_rounded}x - {abs(intercept)}"
+
+        latex.append(f"        % x={round(x_val,3)}, y={round(y_val,3)}, 傾き={slope_rounded}, 切片={intercept}")
+
+        test_y = slope_rounded * x_val + intercept
+        if abs(test_y - y_val) > 0.1:  # 許容誤差
+            latex.append(f"        % 警告: 接線方程式が元の点を通りません。式による計算値: {test_y}, 元の点: {y_val}")
+
+        tangent_equation = f"{round(y_val,3)} + {round(slope,3)}*(x - {round(x_val,3)})"
+
+        # 接線のプロット
+        tangent_code = f"""        % 接線のプロット
+        \\addplot[{', '.join(tangent_options)}, domain={round(x_val-tangent_length/2,3)}:{round(x_val+tangent_length/2,3)}] {{
+            {tangent_equation}
+        }};\n"""
+        latex.append(tangent_code)
+
+        if tangent.show_equation:
+            equation_pos_x = x_val
+            # 表示位置を調整
+            if y_val < y_min:
+                equation_pos_y = y_min + 0.5  # 上
+            elif y_val > y_max:
+                equation_pos_y = y_max - 0.5  # 下
+            else:
+                equation_pos_y = y_val + 0.5  # 通常は点の少し上
+
+            # 接線ラベル
+            equation_display = f"""        % 接線の方程式を表示\n        %下の(axis cs:{{x座標の値}}，{{y座標の値}})の値を調整すると接線のラベルの表示位置を調整できます．
+        \\node[anchor=south, font=\\small, {tangent_color}] at (axis cs:{equation_pos_x}, {equation_pos_y}) {{{equation_text}}};\n"""
+            latex.append(equation_display)
+
+        # 凡例
+        latex.append(f"        \\addlegendimage{{{', '.join(tangent_options)}}};")
+
+        # 凡例エントリを追加
+        if show_legend:
+            latex.append(f"        \\addlegendentry{{{legend_label}の接線 (x={tangent_x})}}")
+    except Exception as e:
+        error_msg = f"接線の計算でエラーが発生しました。式: {formula}, エラー: {str(e)}"
+        warnings.append(f"警告: {error_msg}")
+
+        latex.append(f"        % {error_msg}")
+
+        try:
+            point_y = _evaluate(formula.replace('^', '**'), x_val)
+            latex.append(f"        \\addplot[only marks, mark=*, {tangent_color}, mark size=3] coordinates {{({tangent_x}, {point_y})}}; % 接線計算エラーだが点は表示")
+        except Exception as point_error:
+            # それでも失敗したら原点にプロット
+            latex.append(f"        % 点の計算も失敗: {str(point_error)}")
+            latex.append(f"        \\addplot[only marks, mark=*, {tangent_color}, mark size=3] coordinates {{({tangent_x}, 0)}}; % エラーのため原点にプロット")
+
+        latex.append(f"        \\addplot[{', '.join(tangent_options)}, dashed] coordinates {{({tangent_x-0.5}, 0) ({tangent_x+0.5}, 0)}}; % エラーのため水平線を表示")
+
+        latex.append(f"        \\addlegendimage{{{', '.join(tangent_options)}, dashed}};")
+        if show_legend:
+            latex.append(f"        \\addlegendentry{{{legend_label}の接線 (計算エラー)}}")
+
+
+def _append_special_points(latex, spec, dataset, x_min, x_max, y_min, y_max):
+    """特殊点 -> 垂線 -> 座標値"""
+    for point in dataset.special_points:
+        x, y, point_color, coord_display = point.x, point.y, point.color, point.coord_display
+        latex.append(f"        % 特殊点 [ {dataset.name} ]")
+        latex.append(f"        \\addplot[only marks, mark=*, {point_color}] coordinates {{")
+        latex.append(f"            ({x}, {y})")
+        latex.append("        };")
+
+        if coord_display.startswith('X座標') or coord_display.startswith('X,Y座標'):
+            latex.append("        % X軸への垂線")
+            latex.append(f"        \\draw[{point_color}, dashed] (axis cs:{x},{y}) -- (axis cs:{x},{y_min});")
+            if '値も表示' in coord_display and not _is_tick_value(x, x_min, x_max, spec.x_tick_step):
+                formatted_x = '{:g}'.format(x)
+                latex.append("        % X座標値を表示")
+                latex.append(f"        \\node[{point_color}, below, yshift=-2pt, font=\\small] at (axis cs:{x},{y_min}) {{{formatted_x}}};")
+
+        if coord_display.startswith('Y座標') or coord_display.startswith('X,Y座標'):
+            latex.append("        % Y軸への垂線")
+            latex.append(f"        \\draw[{point_color}, dashed] (axis cs:{x},{y}) -- (axis cs:{x_min},{y});")
+            if '値も表示' in coord_display and not _is_tick_value(y, y_min, y_max, spec.y_tick_step):
+                formatted_y = '{:g}'.format(y)
+                latex.append("        % Y座標値を表示")
+                latex.append(f"        \\node[{point_color}, left, xshift=-2pt, font=\\small] at (axis cs:{x_min},{y}) {{{formatted_y}}};")
+
+
+def render_plot(spec):
+    """
+    -> RenderResult（figure環境のLaTeXコードと警告のリスト）\n
+    - spec: PlotSpec\n
+    """
+    latex = []
+    warnings = []
+    is_xlog, is_ylog = spec.is_xlog, spec.is_ylog
+
+    latex.append("\\begin{figure}[" + spec.position + "]")
+    latex.append("  \\centering")
+    latex.append("  \\begin{tikzpicture}")
+
+    # 軸の設定
+    all_x_values = []
+    all_y_values = []
+    for dataset in spec.datasets:
+        if dataset.x and dataset.y:
+            all_x_values.extend(dataset.x)
+            all_y_values.extend(dataset.y)
+    x_min, x_max, y_min, y_max = _data_range(spec, all_x_values, all_y_values)
+
+    # 軸の表示点
+    xtick_values = _tick_values(x_min, x_max, spec.x_tick_step)
+    ytick_values = _tick_values(y_min, y_max, spec.y_tick_step)
+
+    axis_options = []
+    axis_options.append(f"width={spec.width}\\textwidth")
+    axis_options.append(f"height={spec.height}\\textwidth")
+    axis_options.append(f"xlabel={{{escape_latex_text(spec.x_label)}}}")
+    axis_options.append(f"ylabel={{{escape_latex_text(spec.y_label)}}}")
+
+    # 原則起こらない
+    if x_min != x_max:
+        axis_options.append(f"xmin={x_min}, xmax={x_max}")
+    if y_min != y_max:
+        axis_options.append(f"ymin={y_min}, ymax={y_max}")
+
+    if is_xlog and x_min <= 0:
+        warnings.append("X軸の対数スケールには正の値のみ有効です。X軸の最小値を0.1に自動調整しました。")
+        x_min = _log_min(x_min, all_x_values)
+    if is_ylog and y_min <= 0:
+        warnings.append("Y軸の対数スケールには正の値のみ有効です。Y軸の最小値を0.1に自動調整しました。")
+        y_min = _log_min(y_min, all_y_values)
+
+    # データの最大値の1桁上まで表示
+    positive_x = [x for x in all_x_values if x > 0] if is_xlog else []
+    if positive_x:
+        x_max = 10 ** math.ceil(math.log10(max(positive_x)))
+    positive_y = [y for y in all_y_values if y > 0] if is_ylog else []
+    if positive_y:
+        y_max = 10 ** math.ceil(math.log10(max(positive_y)))
+
+    if is_xlog:
+        axis_options.append("xmode=log")
+        axis_options.append("log basis x=10")
+    if is_ylog:
+        axis_options.append("ymode=log")
+        axis_options.append("log basis y=10")
+
+    xticks = _ticks(is_xlog, x_min, x_max, xtick_values, spec.x_tick_step)
+    if is_xlog:
+        axis_options.append("xminorticks=true")
+    yticks = _ticks(is_ylog, y_min, y_max, ytick_values, spec.y_tick_step)
+    if is_ylog:
+        axis_options.append("yminorticks=true")
+
+    axis_options.append(f"xtick={{{xticks}}}")
+    axis_options.append(f"ytick={{{yticks}}}")
+
+    axis_options.append("tick align=outside")
+    axis_options.append("minor tick num=1")
+    axis_options.append("tick label style={font=\\small}")
+    axis_options.append("every node near coord/.style={font=\\footnotesize}")
+    axis_options.append("clip=true")
+
+    if spec.grid:
+        axis_options.append("grid=both")
+
+    if spec.show_legend:
+        axis_options.append(f"legend pos={spec.legend_pos}")
+
+    #* ========================axis開始====================================
+    latex.append("        \\begin{axis}[")
+    latex.append(f"            {','.join(axis_options)}")
+    latex.append("        ]")
+
+    for i, dataset in enumerate(spec.datasets):
+        if dataset.is_empty():
+            continue
+
+        show_legend = spec.show_legend and dataset.show_legend
+        legend_label = escape_latex_text(str(dataset.legend_label))
+
+        if dataset.source == 'formula':
+            _append_formula(latex, warnings, spec, dataset, show_legend, legend_label)
+        else:
+            data_x, data_y = dataset.x, dataset.y
+            # 対数かつ測定データ
+            if is_xlog or is_ylog:
+                points = [(x, y) for x, y in zip(data_x, data_y) if not ((is_xlog and x <= 0) or (is_ylog and y <= 0))]
+                invalid_points = min(len(data_x), len(data_y)) - len(points)
+                if invalid_points > 0:
+                    warning_msg = f"データセット '{dataset.name}' の {invalid_points}個の点が対数スケールに適さないため除外されました"
+                    latex.append(f"        % 警告: {warning_msg}")
+                    warnings.append(warning_msg)
+                if not points:
+                    latex.append(f"        % データセット名[ {dataset.name} ] - 対数スケールに適した点がありません")
+                    continue
+                data_x = [x for x, _ in points]
+                data_y = [y for _, y in points]
+            _append_measured(latex, dataset, i, data_x, data_y, show_legend, legend_label)
+
+        #*==========================特殊点の追加===============================
+        _append_special_points(latex, spec, dataset, x_min, x_max, y_min, y_max)
+
+    # 注釈の追加
+    for dataset in spec.datasets:
+        for ann in dataset.annotations:
+            latex.append(f"        % 注釈 [ {dataset.name} ]")
+            latex.append(f"        \\node at (axis cs:{ann.x},{ann.y}) [anchor={ann.position}, font=\\small, "
+                         f"text={ann.color}] {{{escape_latex_text(str(ann.text))}}};")
+
+    # axis終了
+    latex.append("        \\end{axis}")
+
+    # tikzpicture終了
+    latex.append("    \\end{tikzpicture}")
+
+    latex.append(f"    \\caption{{{escape_latex_text(spec.caption)}}}")
+    latex.append(f"    \\label{{{spec.label}}}")
+
+    latex.append("\\end{figure}")
+
+    return RenderResult('\n'.join(latex), warnings)
@@ -4,10 +4,9 @@ import pandas as pd
 import sys
 import math  # 数学関数を使用するためにインポート
 import traceback
-import openpyxl
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QLabel, QLineEdit, QPushButton,
-                            QFileDialog, QComboBox, QMessageBox, QTextEdit,
+                            QFileDialog, QComboBox, QMessageBox,
                             QCheckBox, QGridLayout, QGroupBox, QSplitter,
                             QStatusBar, QFrame, QTabWidget, QTableWidget,
                             QTableWidgetItem, QColorDialog, QSpinBox, 
@@ -19,6 +18,10 @@ from PyQt5.QtGui import QColor
 import re
 import platform
 
+from common.reader import get_sheet_names, load_workbook_cached
+from common.result_view import LatexResultView
+from tikz_plot.render import PlotSpec, render_plot
+
 
 class TikZPlotTab(QWidget):
     """TikZ plot converter tab"""
@@ -98,36 +101,6 @@ class TikZPlotTab(QWidget):
     def set_status_bar(self, status_bar):
         self.statusBar = status_bar
 
-    def color_to_tikz_rgb(self, color):
-        if color == QColor('red'):
-            return 'red'
-        elif color == QColor('green'):
-            return 'green'
-        elif color == QColor('blue'):
-            return 'blue'
-        elif color == QColor('black'):
-            return 'black'
-        elif color == QColor('yellow'):
-            return 'yellow'
-        elif color == QColor('cyan'):
-            return 'cyan'
-        elif color == QColor('magenta'):
-            return 'magenta'
-        elif color == QColor('orange'):
-            return 'orange'
-        elif color == QColor('purple'):
-            return 'purple'
-        elif color == QColor('brown'):
-            return 'brown'
-        elif color == QColor('gray'):
-            return 'gray'
-        else:
-            r = color.red() / 255.0
-            g = color.green() / 255.0
-            b = color.blue() / 255.0
-            return f"color = {{rgb,255:red,{color.red()};green,{color.green()};blue,{color.blue()}}}"
-            
-
     def initUI(self):
         self.setWindowTitle('TikZPlot Converter')
         
@@ -958,8 +931,7 @@ class TikZPlotTab(QWidget):
         resultLayout = QVBoxLayout(resultWidget)
         
         resultLabel = QLabel("LaTeX コード:")
-        self.resultText = QTextEdit()
-        self.resultText.setReadOnly(True)
+        self.resultText = LatexResultView()
         self.resultText.setMinimumHeight(100)  # 最小高さを設定
         self.resultText.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)  # 縦方向も拡大可能に
         
@@ -967,9 +939,17 @@ class TikZPlotTab(QWidget):
         copyButton.setStyleSheet("background-color: #007BFF; color: white; font-size: 16px; padding: 12px; font-weight: 900; border-radius: 8px; text-transform: uppercase; letter-spacing: 1px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);")
         copyButton.clicked.connect(self.copy_to_clipboard)
         
+        saveButton = QPushButton("ファイルに保存...")
+        saveButton.setStyleSheet("font-size: 16px; padding: 12px; font-weight: 900; border-radius: 8px;")
+        saveButton.clicked.connect(self.save_result)
+
+        resultButtonLayout = QHBoxLayout()
+        resultButtonLayout.addWidget(copyButton, 1)
+        resultButtonLayout.addWidget(saveButton)
+
         resultLayout.addWidget(resultLabel)
         resultLayout.addWidget(self.resultText)
-        resultLayout.addWidget(copyButton)
+        resultLayout.addLayout(resultButtonLayout)
         
         #* ======================main_Container============================================ 
         splitter.addWidget(settingsWidget)
@@ -1036,9 +1016,9 @@ class TikZPlotTab(QWidget):
 
     def update_sheet_names(self, file_path):
         try:
-            xls = pd.ExcelFile(file_path)
+            sheet_names = get_sheet_names(file_path)
             self.sheetCombobox.clear()
-            self.sheetCombobox.addItems(xls.sheet_names)
+            self.sheetCombobox.addItems(sheet_names)
             self.statusBar.showMessage(f"ファイル '{os.path.basename(file_path)}' を読み込みました")
         except Exception as e:
             QMessageBox.critical(self, "エラー", f"シート名の取得に失敗しました: {str(e)}")
@@ -1409,7 +1389,7 @@ class TikZPlotTab(QWidget):
         """
         
         try:
-            wb = openpyxl.load_workbook(file_path, data_only=True)
+            wb = load_workbook_cached(file_path, data_only=True)
             sheet = wb[sheet_name]
             
             try:
@@ -1680,6 +1660,21 @@ class TikZPlotTab(QWidget):
             clipboard.setText(latex_code)
             self.statusBar.showMessage("LaTeXコードをクリップボードにコピーしました", 3000)  # 3秒間表示
 
+    def save_result(self):
+        """表示中のLaTeXコードを.texファイルに保存する（表示欄ではなくバッファから書き出す）"""
+        if not self.resultText.toPlainText():
+            QMessageBox.warning(self, "警告", "保存するコードがありません")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "LaTeXコードを保存", "", "TeX Files (*.tex)")
+        if not file_path:
+            return
+        try:
+            self.resultText.save_to_file(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "エラー", f"保存に失敗しました: {e}")
+            return
+        self.statusBar.showMessage(f"LaTeXコードを {file_path} に保存しました", 3000)
+
     def update_global_settings(self):
         """
         グラフの全体設定の更新\n
@@ -1734,10 +1729,13 @@ class TikZPlotTab(QWidget):
         try:
             self.update_global_settings()
             
-            latex_code = self.generate_tikz_code_multi_datasets()
+            result = render_plot(self.plot_spec())
             
-            self.resultText.setPlainText(latex_code)
-            self.statusBar.showMessage("TikZコードが生成されました")
+            self.resultText.setPlainText(result.latex)
+            if result.warnings:
+                self.statusBar.showMessage(f"TikZコードが生成されました（{' / '.join(result.warnings)}）")
+            else:
+                self.statusBar.showMessage("TikZコードが生成されました")
                         
         except Exception as e:
             QMessageBox.critical(self, "エラー", f"変換中にエラーが発生しました: {str(e)}\n\n{traceback.format_exc()}")
@@ -2319,578 +2317,19 @@ class TikZPlotTab(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "エラー", f"データテーブル更新中にエラーが発生しました: {str(e)}\n\n{traceback.format_exc()}")
 
-    #* 重要
-    def generate_tikz_code_multi_datasets(self):
-        """最終的なLaTeXコードを生成する"""
-        latex = []
-        
-        latex.append("\\begin{figure}[" + self.global_settings['position'] + "]")
-        latex.append("  \\centering")
-        width = self.global_settings['width']
-        height = self.global_settings['height']
-        latex.append("  \\begin{tikzpicture}")
-        #軸の設定
-        x_min = self.global_settings['x_min']
-        x_max = self.global_settings['x_max']
-        y_min = self.global_settings['y_min']
-        y_max = self.global_settings['y_max']
-        
-        all_x_values = []
-        all_y_values = []
-        for dataset in self.datasets:
-            if dataset.get('data_x') and dataset.get('data_y'):
-                all_x_values.extend(dataset['data_x'])
-                all_y_values.extend(dataset['data_y'])
-        
-        if all_x_values and all_y_values:
-            data_x_min = min(all_x_values)
-            data_x_max = max(all_x_values)
-            data_y_min = min(all_y_values)
-            data_y_max = max(all_y_values)
-            
-            # データ数1
-            if abs(data_x_max - data_x_min) < 1e-10:
-                data_x_min -= 0.5 if abs(data_x_min) > 1 else 0.1
-                data_x_max += 0.5 if abs(data_x_max) > 1 else 0.1
-            
-            if abs(data_y_max - data_y_min) < 1e-10:
-                data_y_min -= 0.5 if abs(data_y_min) > 1 else 0.1
-                data_y_max += 0.5 if abs(data_y_max) > 1 else 0.1
-            
-            # 軸の範囲を越える時の調整(10%余裕持たせる)
-            if x_min > data_x_min :
-                x_min = data_x_min - abs(data_x_min) * 0.1 - 0.1
-            if x_max < data_x_max :
-                x_max = data_x_max + abs(data_x_max) * 0.1 + 0.1
-            if y_min > data_y_min :
-                y_min = data_y_min - abs(data_y_min) * 0.1 - 0.1
-            if y_max < data_y_max :
-                y_max = data_y_max + abs(data_y_max) * 0.1 + 0.1
-            
-            # 小さすぎる値を補正
-            if abs(y_min) < 1e-10:
-                y_min = -0.1
-            if abs(y_max) < 1e-10:
-                y_max = 0.1
-            if abs(x_min) < 1e-10:
-                x_min = -0.1
-            if abs(x_max) < 1e-10:
-                x_max = 0.1
-            
-            if abs(x_min - x_max) < 1e-10:
-                x_min -= 0.5
-                x_max += 0.5
-            if abs(y_min - y_max) < 1e-10:
-                y_min -= 0.5
-                y_max += 0.5
-                
-            # 軸の範囲が小さい時
-            if abs(x_max - x_min) < 1e-3:
-                margin = abs(x_min) * 0.2 if abs(x_min) > 1e-10 else 0.1
-                x_min -= margin
-                x_max += margin
-            if abs(y_max - y_min) < 1e-3:
-                margin = abs(y_min) * 0.2 if abs(y_min) > 1e-10 else 0.1
-                y_min -= margin
-                y_max += margin
-        
-        # 軸の表示点
-        xtick_values = []
-        ytick_values = []
-
-        tick_min = math.ceil(x_min / self.x_tick_step) * self.x_tick_step
-        tick_max = math.floor(x_max / self.x_tick_step) * self.x_tick_step
-        
-        current = tick_min
-        while current <= tick_max:
-            xtick_values.append(current)
-            current += self.x_tick_step
-    
-        tick_min = math.ceil(y_min / self.y_tick_step) * self.y_tick_step
-        tick_max = math.floor(y_max / self.y_tick_step) * self.y_tick_step
-        
-        current = tick_min
-        while current <= tick_max:
-            ytick_values.append(current)
-            current += self.y_tick_step
-    
-        axis_options = []
-        axis_options.append(f"width={width}\\textwidth")
-        axis_options.append(f"height={height}\\textwidth")
-        axis_options.append(f"xlabel={{{self.global_settings['x_label']}}}")
-        axis_options.append(f"ylabel={{{self.global_settings['y_label']}}}")
-        
-        #　原則起こらない
-        if x_min != x_max:
-            axis_options.append(f"xmin={x_min}, xmax={x_max}")
-        if y_min != y_max:
-            axis_options.append(f"ymin={y_min}, ymax={y_max}")
-        
-        scale_type = self.global_settings.get('scale_type', 'normal')
-        is_xlog = (scale_type == 'logx' or scale_type == 'loglog')
-        is_ylog = (scale_type == 'logy' or scale_type == 'loglog')
-        
-        if is_xlog and x_min <= 0:
-            self.statusBar.showMessage(f"X軸の対数スケールには正の値のみ有効です。X軸の最小値を0.1に自動調整しました。", 5000)
-            if all_x_values:
-                positive_x = [x for x in all_x_values if x > 0]
-                if positive_x:
-                    # 対数スケールでは、データの最小値の1桁下の値から始める
-                    min_data = min(positive_x)
-                    log_min = math.floor(math.log10(min_data))
-                    x_min = 10 ** log_min
-                else:
-                    x_min = 0.1  
-            else:
-                x_min = 0.1  
-        
-        if is_ylog and y_min <= 0:
-            self.statusBar.showMessage(f"Y軸の対数スケールには正の値のみ有効です。Y軸の最小値を0.1に自動調整しました。", 5000)
-            if all_y_values:
-                positive_y = [y for y in all_y_values if y > 0]
-                if positive_y:
-                    min_data = min(positive_y)
-                    log_min = math.floor(math.log10(min_data))
-                    y_min = 10 ** log_min
-                else:
-                    y_min = 0.1  
-            else:
-                y_min = 0.1  
-        
-        if is_xlog and all_x_values:
-            positive_x = [x for x in all_x_values if x > 0]
-            if positive_x:
-                # データの最大値の1桁上まで表示
-                max_data = max(positive_x)
-                log_max = math.ceil(math.log10(max_data))
-                x_max = 10 ** log_max
-        
-        if is_ylog and all_y_values:
-            positive_y = [y for y in all_y_values if y > 0]
-            if positive_y:
-                # データの最大値の1桁上まで表示
-                max_data = max(positive_y)
-                log_max = math.ceil(math.log10(max_data))
-                y_max = 10 ** log_max
-        
-        if is_xlog:
-            axis_options.append("xmode=log")
-            axis_options.append("log basis x=10")
-        if is_ylog:
-            axis_options.append("ymode=log")
-            axis_options.append("log basis y=10")
-        
-        if is_xlog:
-            # 指数部分
-            log_x_min = math.floor(math.log10(max(x_min, 1e-10)))
-            log_x_max = math.ceil(math.log10(max(x_max, 1e-10)))
-            xticks = ','.join(str(10**i) for i in range(log_x_min, log_x_max + 1))
-            axis_options.append("xminorticks=true")
-        else:
-            if xtick_values:
-                xticks = ','.join(str(round(tick, 8)) for tick in xtick_values)
-            else:
-                if abs(x_max - x_min) < 1e-10 or self.x_tick_step < 1e-10:
-                    xticks = str(round(x_min, 8))
-                else:
-                    steps = max(1, min(20, int((x_max - x_min) / self.x_tick_step) + 1))  
-                    xticks = ','.join(str(round(x_min + i * self.x_tick_step, 8)) for i in range(steps))
-        
-        if is_ylog:
-            log_y_min = math.floor(math.log10(max(y_min, 1e-10)))
-            log_y_max = math.ceil(math.log10(max(y_max, 1e-10)))
-            yticks = ','.join(str(10**i) for i in range(log_y_min, log_y_max + 1))
-            axis_options.append("yminorticks=true")
-        else:
-            if ytick_values:
-                yticks = ','.join(str(round(tick, 8)) for tick in ytick_values)
-            else:
-                if abs(y_max - y_min) < 1e-10 or self.y_tick_step < 1e-10:
-                    yticks = str(round(y_min, 8))
-                else:
-                    steps = max(1, min(20, int((y_max - y_min) / self.y_tick_step) + 1))  # 最大20ステップに制限
-                    yticks = ','.join(str(round(y_min + i * self.y_tick_step, 8)) for i in range(steps))
-        
-        axis_options.append(f"xtick={{{xticks}}}")
-        axis_options.append(f"ytick={{{yticks}}}")
-        
-        axis_options.append("tick align=outside")
-        axis_options.append("minor tick num=1")
-        axis_options.append("tick label style={font=\\small}")
-        axis_options.append("every node near coord/.style={font=\\footnotesize}")
-        axis_options.append("clip=true")  
-        
-        if self.global_settings['grid']:
-            axis_options.append("grid=both")
-        
-        if self.global_settings.get('show_legend', True):
-            axis_options.append(f"legend pos={self.global_settings['legend_pos']}")
-        
-        #* ========================axis開始====================================
-        latex.append(f"        \\begin{{axis}}[")
-        latex.append(f"            {','.join(axis_options)}")
-        latex.append("        ]")
-        
-        for i, dataset in enumerate(self.datasets):
-            if dataset.get('data_source_type') == 'formula' and not dataset.get('equation'):
-                continue  
-                
-            if dataset.get('data_source_type') == 'measured' and (not dataset.get('data_x') or not dataset.get('data_y')):
-                continue  
-            
-            # 個別設定
-            plot_type = dataset.get('plot_type', 'line')
-            color = dataset.get('color', QColor('blue')).name()
-            line_width = dataset.get('line_width', 1.0)
-            marker_style = dataset.get('marker_style', '*')
-            marker_size = dataset.get('marker_size', 2.0)
-            
-            show_legend = self.global_settings.get('show_legend', True) and dataset.get('show_legend', True)
-            legend_label = dataset.get('legend_label', dataset.get('name', ''))
-            
-            # 対数かつ測定データ
-            if (is_xlog or is_ylog) and dataset.get('data_source_type') == 'measured':
-                data_x = dataset.get('data_x', [])
-                data_y = dataset.get('data_y', [])
-                filtered_data_x = []
-                filtered_data_y = []
-                invalid_points = 0
-                
-                for x, y in zip(data_x, data_y):
-                    if (is_xlog and x <= 0) or (is_ylog and y <= 0):
-                        invalid_points += 1
-                        continue
-                    filtered_data_x.append(x)
-                    filtered_data_y.append(y)
-                
-                if invalid_points > 0:
-                    warning_msg = f"データセット '{dataset.get('name', '')}' の {invalid_points}個の点が対数スケールに適さないため除外されました"
-                    latex.append(f"        % 警告: {warning_msg}")
-                    self.statusBar.showMessage(warning_msg, 5000)
-                
-                if not filtered_data_x:
-                    latex.append(f"        % データセット名[ {dataset.get('name', '')} ] - 対数スケールに適した点がありません")
-                    continue
-                
-                filtered_dataset = dataset.copy()
-                filtered_dataset['data_x'] = filtered_data_x
-                filtered_dataset['data_y'] = filtered_data_y
-                
-                #* データセット
-                self.add_dataset_to_latex(latex, filtered_dataset, i, plot_type, color, line_width, 
-                                        marker_style, marker_size, show_legend, legend_label)
-            else:
-                # 通常のデータセットを処理
-                self.add_dataset_to_latex(latex, dataset, i, plot_type, color, line_width, 
-                                        marker_style, marker_size, show_legend, legend_label)
-            
-            #*==========================特殊点の追加===============================
-            #* 特殊点 -> 垂線 -> 注釈
-            special_points = dataset.get('special_points', [])
-            for point in special_points:
-                x, y, point_color, coord_display = point  
-                latex.append(f"        % 特殊点 [ {dataset.get('name', '')} ]")
-                latex.append(f"        \\addplot[only marks, mark=*, {point_color}] coordinates {{")
-                latex.append(f"            ({x}, {y})")
-                latex.append("        };")
-                
-                def is_tick_value(val, tick_min, tick_max, tick_step, tol=1e-6):
-                    if tick_step is None or tick_step <= 0:
-                        return False
-                    n = round((val - tick_min) / tick_step) # roundなので整数値になりnとtick_valは同じはず
-                    tick_val = tick_min + n * tick_step
-                    return abs(val - tick_val) < tol and tick_min <= val <= tick_max
-
-                if coord_display.startswith('X座標') or coord_display.startswith('X,Y座標'):
-                    latex.append(f"        % X軸への垂線")
-                    latex.append(f"        \\draw[{point_color}, dashed] (axis cs:{x},{y}) -- (axis cs:{x},{y_min});")
-                    if '値も表示' in coord_display and not is_tick_value(x, x_min, x_max, self.x_tick_step):
-                        formatted_x = '{:g}'.format(x)
-                        latex.append(f"        % X座標値を表示")
-                        latex.append(f"        \\node[{point_color}, below, yshift=-2pt, font=\\small] at (axis cs:{x},{y_min}) {{{formatted_x}}};")
-
-                if coord_display.startswith('Y座標') or coord_display.startswith('X,Y座標'):
-                    latex.append(f"        % Y軸への垂線")
-                    latex.append(f"        \\draw[{point_color}, dashed] (axis cs:{x},{y}) -- (axis cs:{x_min},{y});")
-                    if '値も表示' in coord_display and not is_tick_value(y, y_min, y_max, self.y_tick_step):
-                        formatted_y = '{:g}'.format(y)
-                        latex.append(f"        % Y座標値を表示")
-                        latex.append(f"        \\node[{point_color}, left, xshift=-2pt, font=\\small] at (axis cs:{x_min},{y}) {{{formatted_y}}};")
-        
-        # 注釈の追加
-        for i, dataset in enumerate(self.datasets):
-            annotations = dataset.get('annotations', [])
-            for ann in annotations:
-                x, y, text, color, pos = ann
-                latex.append(f"        % 注釈 [ {dataset.get('name', '')} ]")
-                latex.append(f"        \\node at (axis cs:{x},{y}) [anchor={pos}, font=\\small, text={color}] {{{text}}};")
-        
-        # axis終了
-        latex.append("        \\end{axis}")
-        
-        # tikzpicture終了
-        latex.append("    \\end{tikzpicture}")
-        
-        latex.append(f"    \\caption{{{self.global_settings['caption']}}}")
-        latex.append(f"    \\label{{{self.global_settings['label']}}}")
-        
-        latex.append("\\end{figure}")
-        
-        return '\n'.join(latex)
-    
-    def add_dataset_to_latex(self, latex, dataset, index, plot_type, color, line_width, 
-                             marker_style, marker_size, show_legend, legend_label):
+    def plot_spec(self):
         """
-        LaTeXコードにデータセットを追加する\n
-        latex引数は参照なので戻り値はいらない\n
-        formulaの場合は途中でreturn
+        -> 現在のグラフ全体の設定とデータセットのPlotSpec\n
+        - 色(QColor)は#rrggbbにして渡す（生成はQtに依存しないtikz_plot.renderで行う）\n
         """
-        data_source_type = dataset.get('data_source_type', 'measured')
-        
-        scale_type = self.global_settings.get('scale_type', 'normal')
-        is_xlog = scale_type == 'logx' or scale_type == 'loglog'
-        is_ylog = scale_type == 'logy' or scale_type == 'loglog'
-        
-        if data_source_type == 'formula':
-            equation = dataset.get('equation', 'x^2')
-            tikz_equation = equation
-            domain_min = dataset.get('domain_min', 0)
-            domain_max = dataset.get('domain_max', 10)
-            samples = dataset.get('samples', 200)
-            
-            if is_xlog and domain_min <= 0:
-                latex.append(f"        % 警告: X軸が対数スケールのため、数式のxの範囲が調整されました")
-                domain_min = max(0.01, domain_min)  
-            
-            if not equation.strip():
-                return
-            
-            tikz_color = self.color_to_tikz_rgb(dataset.get('color', QColor('blue')))
-            
-            # 理論曲線のオプション
-            theory_options = []
-            theory_options.append(f"domain={domain_min}:{domain_max}")
-            theory_options.append(f"samples={samples}")
-            theory_options.append("smooth")
-            theory_options.append("thick")
-            theory_options.append(tikz_color)  
-            theory_options.append(f"line width={dataset.get('line_width', 1.0)}pt")
-            
-            latex.append(f"        % データセット[ {dataset.get('name', '')} ] （数式: {equation}）")
-            latex.append(f"        \\addplot[{', '.join(theory_options)}] {{")
-            latex.append(f"            {tikz_equation}")
-            latex.append("        };")
-            
-            if show_legend:
-                latex.append(f"        \\addlegendentry{{{legend_label}}}")
-
-            if dataset.get('show_tangent', False):
-                tangent_x = dataset.get('tangent_x', 1)
-                tangent_length = dataset.get('tangent_length', 2)
-                
-                tangent_color = self.color_to_tikz_rgb(dataset.get('tangent_color', QColor('red')))
-                
-                line_style = ""
-                tangent_style = dataset.get('tangent_style', '実線')
-                if tangent_style == '点線':
-                    line_style = "dotted"
-                elif tangent_style == '破線':
-                    line_style = "dashed"
-                elif tangent_style == '一点鎖線':
-                    line_style = "dashdotted"
-                
-                #*==========================接線===============================
-                tangent_options = []
-                if line_style:
-                    tangent_options.append(line_style)
-                tangent_options.append("thick")
-                tangent_options.append(tangent_color)  
-                tangent_options.append(f"line width={dataset.get('line_width', 1.5)}pt")
-
-                latex.append(f"        % 接線 [ {dataset.get('name', '')} ]")
-                
-                try:
-                    x_val = tangent_x
-                    formula = dataset.get('equation', 'x^2') 
-                    
-                    python_formula = formula.replace('^', '**')
-                    
-                    y_min = self.global_settings['y_min']
-                    y_max = self.global_settings['y_max']
-                    
-                    #　math以外を封じる
-                    y_val = eval(python_formula.replace('x', str(x_val)), {"__builtins__": {}}, {"math": math})
-
-                    if y_val < y_min or y_val > y_max:
-                        latex.append(f"        % 計算されたy値 ({round(y_val,3)}) がグラフ範囲外です．")
-                        self.statusBar.showMessage(f"警告: 点 (x={round(x_val,3)}) の計算値 (y={round(y_val,3)}) がグラフ範囲外です", 5000)
-                    
-                    # 接点
-                    point_code = f"""        % 接点をマーク
-        \\addplot[only marks, mark=*, {tangent_color}, mark size=3] coordinates {{({x_val}, {y_val})}};\n"""
-                    latex.append(point_code)
-                    
-                    # 中心差分法で傾き計算
-                    dx = 0.0001
-                    globals_dict = {"__builtins__": {}}
-                    locals_dict = {"math": math}
-                    
-                    left_x = x_val - dx
-                    right_x = x_val + dx
-                    
-                    try:
-                        # y_1:左  y_2:右
-                        y1 = eval(python_formula.replace('x', str(left_x)), globals_dict, locals_dict)
-                        y2 = eval(python_formula.replace('x', str(right_x)), globals_dict, locals_dict)
-                        slope = (y2 - y1) / (2 * dx)
-                    except Exception as inner_e:
-                        latex.append(f"        % 接線の微分計算でエラー: {str(inner_e)}. 中央差分法を使用できないため、前方差分法を試みます。")
-                        # 前方差分法を試みる
-                        try:
-                            forward_x = x_val + dx
-                            y_current = y_val  
-                            y_forward = eval(python_formula.replace('x', str(forward_x)), globals_dict, locals_dict)
-                            slope = (y_forward - y_current) / dx
-                        except Exception as e2:
-                            # 基本的に起こらない
-                            latex.append(f"        % 前方差分も失敗。デフォルトの傾き 1 を使用します。エラー: {str(e2)}")
-                            slope = 1.0
-                            
-                    #  y = mx + b 
-                    slope_rounded = round(slope, 3) #傾き項(m)
-                    intercept = round(y_val - slope * x_val, 3) # 切片(b)
-                    equation_text = f"y = {slope_rounded}x + {intercept}" if intercept >= 0 else f"y = {slope_rounded}x - {abs(intercept)}"
-                    
-                    latex.append(f"        % x={round(x_val,3)}, y={round(y_val,3)}, 傾き={slope_rounded}, 切片={intercept}")
-                    
-                    test_y = slope_rounded * x_val + intercept
-                    if abs(test_y - y_val) > 0.1:  # 許容誤差
-                        latex.append(f"        % 警告: 接線方程式が元の点を通りません。式による計算値: {test_y}, 元の点: {y_val}")
-                    
-                    tangent_equation = f"{round(y_val,3)} + {round(slope,3)}*(x - {round(x_val,3)})"
-                    
-                    # 接線のプロット
-                    tangent_code = f"""        % 接線のプロット
-        \\addplot[{', '.join(tangent_options)}, domain={round(x_val-tangent_length/2,3)}:{round(x_val+tangent_length/2,3)}] {{
-            {tangent_equation}
-        }};\n"""
-                    latex.append(tangent_code)
-                    
-                    if dataset.get('show_tangent_equation', False):
-                        equation_pos_x = x_val
-                        # 表示位置を調整
-                        if y_val < y_min:
-                            equation_pos_y = y_min + 0.5  # 上
-                        elif y_val > y_max:
-                            equation_pos_y = y_max - 0.5  # 下
-                        else:
-                            equation_pos_y = y_val + 0.5  # 通常は点の少し上
-                        
-                        # 接線ラベル
-                        equation_display = f"""        % 接線の方程式を表示\n        %下の(axis cs:{{x座標の値}}，{{y座標の値}})の値を調整すると接線のラベルの表示位置を調整できます．
-        \\node[anchor=south, font=\\small, {tangent_color}] at (axis cs:{equation_pos_x}, {equation_pos_y}) {{{equation_text}}};\n"""
-                        latex.append(equation_display)
-                    
-                    # 凡例
-                    latex.append(f"        \\addlegendimage{{{', '.join(tangent_options)}}};")
-                    
-                    # 凡例エントリを追加
-                    if show_legend:
-                        latex.append(f"        \\addlegendentry{{{legend_label}の接線 (x={tangent_x})}}")
-                except Exception as e:
-                    error_msg = f"接線の計算でエラーが発生しました。式: {formula}, エラー: {str(e)}"
-                    self.statusBar.showMessage(f"警告: {error_msg}", 5000)
-                    
-                    latex.append(f"        % {error_msg}")
-                    
-                    try:
-                        python_formula = formula.replace('^', '**')
-                        point_y = eval(python_formula.replace('x', str(x_val)), {"__builtins__": {}}, {"math": math})
-                        latex.append(f"        \\addplot[only marks, mark=*, {tangent_color}, mark size=3] coordinates {{({tangent_x}, {point_y})}}; % 接線計算エラーだが点は表示")
-                    except Exception as point_error:
-                        # それでも失敗したら原点にプロット
-                        latex.append(f"        % 点の計算も失敗: {str(point_error)}")
-                        latex.append(f"        \\addplot[only marks, mark=*, {tangent_color}, mark size=3] coordinates {{({tangent_x}, 0)}}; % エラーのため原点にプロット")
-                    
-                    latex.append(f"        \\addplot[{', '.join(tangent_options)}, dashed] coordinates {{({tangent_x-0.5}, 0) ({tangent_x+0.5}, 0)}}; % エラーのため水平線を表示")
-                    
-                    latex.append(f"        \\addlegendimage{{{', '.join(tangent_options)}, dashed}};")
-                    if show_legend:
-                        latex.append(f"        \\addlegendentry{{{legend_label}の接線 (計算エラー)}}")
-            
-            # 理論曲線の場合はここで終了し脱出
-            return
-            
-        # 実測値
-        coordinates = []
-        for x, y in zip(dataset.get('data_x', []), dataset.get('data_y', [])):
-            coordinates.append(f"({round(x,3)}, {round(y,3)})")
-        
-        if not coordinates:
-            return
-        
-        tikz_color = self.color_to_tikz_rgb(QColor(color))
-        
-        # 線
-        if plot_type == "line" or plot_type == "line_scatter":
-            plot_options = []
-            plot_options.append(tikz_color)  
-            plot_options.append(f"line width={line_width}pt")
-            plot_options.append("thick")
-            
-            latex.append(f"        % データセット[ {dataset.get('name', '')} ] （線）")
-            latex.append(f"        \\addplot[{', '.join(plot_options)}] coordinates {{")
-            
-            # 1行に20個ずつ
-            for i in range(0, len(coordinates), 20):
-                chunk = coordinates[i:i+20]
-                latex.append(f"            {' '.join(chunk)}")
-            
-            latex.append("        };")
-            
-            if show_legend:
-                latex.append(f"        \\addlegendentry{{{legend_label}}}")
-        
-        # 点
-        if plot_type == "scatter" or plot_type == "line_scatter":
-            scatter_options = []
-            scatter_options.append("only marks")
-            scatter_options.append(f"mark={marker_style}")
-            scatter_options.append(tikz_color) 
-            scatter_options.append(f"mark size={marker_size}")
-            
-            latex.append(f"        % データセット{index+1}: {dataset.get('name', '')} （点）")
-            latex.append(f"        \\addplot[{', '.join(scatter_options)}] coordinates {{")
-            
-            # 1行に20個ずつ
-            for i in range(0, len(coordinates), 20):
-                chunk = coordinates[i:i+20]
-                latex.append(f"            {' '.join(chunk)}")
-            
-            latex.append("        };")
-            
-            if show_legend and plot_type == "scatter": # line_scatterの場合は既出
-                latex.append(f"        \\addlegendentry{{{legend_label}}}")
-                
-        # 棒グラフ
-        if plot_type == "bar":
-            bar_options = []
-            bar_options.append(f"ybar")
-            bar_options.append(tikz_color)  
-            bar_options.append(f"fill={tikz_color.replace('color = ','')}")  # fill=color = ... ではなく fill=...
-            
-            latex.append(f"        % データセット[ {dataset.get('name', '')} ] （棒グラフ）")
-            latex.append(f"        \\addplot[{', '.join(bar_options)}] coordinates {{")
-            
-            # 1行に20個ずつ
-            for i in range(0, len(coordinates), 20):
-                chunk = coordinates[i:i+20]
-                latex.append(f"            {' '.join(chunk)}")
-            
-            latex.append("        };")
-            
-            if show_legend:
-                latex.append(f"        \\addlegendentry{{{legend_label}}}")
+        datasets = []
+        for dataset in self.datasets:
+            plain = dict(dataset)
+            for key in ('color', 'tangent_color'):
+                if isinstance(plain.get(key), QColor):
+                    plain[key] = plain[key].name()
+            datasets.append(plain)
+        return PlotSpec.from_settings(self.global_settings, datasets, self.x_tick_step, self.y_tick_step)
 
     def assign_special_points_to_dataset(self):
         if self.current_dataset_index < 0: